@@ -0,0 +1,20 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import argparse
+import datetime
+
+from db.measurement_rollup_crud import backfill_rollups
+
+
+# Rebuilds the per-minute/hour/day rollups from raw Sensor_Measurement rows
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill Sensor_Measurement_Rollup from raw measurements.")
+    parser.add_argument("--start", type=datetime.datetime.fromisoformat, help="First day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--end", type=datetime.datetime.fromisoformat, help="Day after the last one to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    read = backfill_rollups(args.start, args.end, batch_size=args.batch_size)
+    print(f"Rollups rebuilt from {read} measurements")
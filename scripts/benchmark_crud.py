@@ -0,0 +1,265 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import argparse
+import datetime
+import json
+import random
+import time
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+
+from init_db import create_indexes, init_db, migrate_db
+from db.database_session import engine, get_db
+from db.measurement_rollup_crud import rebuild_rollup_buckets
+from db.models import PlantingArea, Sensor, SensorMeasurement, SensorMeasurementRollup
+from db.partitioning import ensure_measurement_partitions
+from db.planting_area_crud import create_planting_area
+from db.sensor_crud import create_sensor, get_sensors_by_area, get_sensors_by_channel
+from db.sensor_measurement_crud import (
+    MQTT_FIELD_SENSOR_TYPES,
+    bulk_create_sensor_measurements,
+    create_sensor_measurement,
+    delete_sensor_measurement,
+    get_sensor_measurement,
+    get_sensor_measurements_by_area,
+    get_sensor_measurements_by_sensor,
+    get_sensor_measurements_in_range,
+    get_sensor_measurements_page,
+    update_sensor_measurement,
+)
+from db.sensor_type_crud import create_sensor_type, get_sensor_type_by_name
+
+# Benchmark rows live in their own areas so they never mix with real data
+AREA_PREFIX = "Benchmark area"
+SEED_CHUNK_ROWS = 50000
+BULK_BATCH_ROWS = 500
+
+
+def _benchmark_areas():
+    with get_db() as db:
+        return db.scalars(
+            select(PlantingArea.id_area).where(PlantingArea.area_name.like(f"{AREA_PREFIX}%")).order_by(PlantingArea.id_area)
+        ).all()
+
+
+def seed_dataset(measurements, areas=20, channels_per_area=16, days=30, seed=0):
+    """Creates the benchmark areas and sensors and tops Sensor_Measurement up to ``measurements`` rows.
+
+    Rows already seeded by an earlier run are reused. Returns
+    ``(id_areas, id_sensors, start, end)``.
+    """
+    id_areas = _benchmark_areas()
+    for i in range(len(id_areas), areas):
+        id_areas.append(create_planting_area(f"{AREA_PREFIX} {i + 1}", 10.0, "2024-01-01").id_area)
+    id_areas = id_areas[:areas]
+
+    type_ids = []
+    for type_name in MQTT_FIELD_SENSOR_TYPES.values():
+        sensor_type = get_sensor_type_by_name(type_name) or create_sensor_type(type_name)
+        type_ids.append(sensor_type.id_type)
+
+    for number, id_area in enumerate(id_areas):
+        existing = {(sensor.channel, sensor.id_type) for sensor in get_sensors_by_area(id_area)}
+        for channel in range(channels_per_area):
+            topic = f"benchmark/a{number}/c{channel}"
+            for id_type in type_ids:
+                if (topic, id_type) not in existing:
+                    create_sensor(id_type, id_area, f"Benchmark {topic} {id_type}", topic)
+
+    with get_db() as db:
+        sensors = db.execute(select(Sensor.id_sensor, Sensor.id_area).where(Sensor.id_area.in_(id_areas))).all()
+        existing = db.scalar(select(func.count()).select_from(SensorMeasurement).where(SensorMeasurement.id_area.in_(id_areas)))
+
+    end = datetime.datetime.now().replace(microsecond=0)
+    start = end - datetime.timedelta(days=days)
+    ensure_measurement_partitions(months_back=days // 28 + 1, today=end)
+
+    missing = measurements - existing
+    if missing > 0:
+        print(f"Seeding {missing:,} measurements...")
+        rng = np.random.default_rng(seed)
+        sensor_ids = np.array([row[0] for row in sensors])
+        area_ids = np.array([row[1] for row in sensors])
+        span = int((end - start).total_seconds())
+        for offset in range(0, missing, SEED_CHUNK_ROWS):
+            count = min(SEED_CHUNK_ROWS, missing - offset)
+            picks = rng.integers(0, len(sensor_ids), count)
+            seconds = np.sort(rng.integers(0, span, count))
+            values = rng.uniform(0, 100, count).round(2)
+            rows = [
+                {
+                    "id_sensor": int(sensor_ids[pick]),
+                    "id_area": int(area_ids[pick]),
+                    "measurement": float(value),
+                    "datetime": start + datetime.timedelta(seconds=int(second)),
+                }
+                for pick, second, value in zip(picks, seconds, values)
+            ]
+            with get_db() as db:
+                db.execute(insert(SensorMeasurement), rows)
+                db.commit()
+    return id_areas, [row[0] for row in sensors], start, end
+
+
+def remove_dataset():
+    """Deletes every benchmark area with its sensors, measurements and rollups."""
+    id_areas = _benchmark_areas()
+    with get_db() as db:
+        for model in (SensorMeasurementRollup, SensorMeasurement, Sensor, PlantingArea):
+            db.execute(delete(model).where(model.id_area.in_(id_areas)))
+        db.commit()
+    return len(id_areas)
+
+
+def measure(operation, iterations):
+    """Calls ``operation(i)`` ``iterations`` times; returns ops/sec and latency percentiles in ms."""
+    latencies = np.empty(iterations)
+    started = time.perf_counter()
+    for i in range(iterations):
+        call_started = time.perf_counter()
+        operation(i)
+        latencies[i] = (time.perf_counter() - call_started) * 1000
+    elapsed = time.perf_counter() - started
+    return {
+        "iterations": iterations,
+        "ops_per_second": round(iterations / elapsed, 2),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "max_ms": round(float(latencies.max()), 3),
+    }
+
+
+def run_benchmarks(id_areas, id_sensors, start, end, iterations=500, query_iterations=20, seed=0):
+    """Times the CRUD functions against the seeded data; returns {operation: figures}."""
+    rng = random.Random(seed)
+    # Only rows of the benchmark areas are read and updated, never real measurements between them
+    with get_db() as db:
+        sample = db.scalars(
+            select(SensorMeasurement.id_measurement)
+            .where(SensorMeasurement.id_area.in_(id_areas))
+            .order_by(func.random())
+            .limit(iterations)
+        ).all()
+    sensor_areas = {sensor.id_sensor: sensor.id_area for id_area in id_areas for sensor in get_sensors_by_area(id_area)}
+    existing_ids = [sample[i % len(sample)] for i in range(iterations)]
+    sensors = [rng.choice(id_sensors) for _ in range(max(iterations, query_iterations))]
+    areas = [rng.choice(id_areas) for _ in range(max(iterations, query_iterations))]
+    windows = [start + (end - start) * rng.random() for _ in range(query_iterations)]
+    created = []
+
+    def create(i):
+        id_sensor = sensors[i]
+        created.append(create_sensor_measurement(id_sensor, sensor_areas[id_sensor], measurement=rng.uniform(0, 100)).id_measurement)
+
+    def bulk_create(i):
+        rows = [
+            {"id_sensor": id_sensor, "id_area": sensor_areas[id_sensor], "measurement": rng.uniform(0, 100), "datetime": end}
+            for id_sensor in rng.choices(id_sensors, k=BULK_BATCH_ROWS)
+        ]
+        bulk_create_sensor_measurements(rows)
+
+    results = {
+        "create": measure(create, iterations),
+        "get": measure(lambda i: get_sensor_measurement(existing_ids[i]), iterations),
+        "update": measure(lambda i: update_sensor_measurement(existing_ids[i], {"measurement": rng.uniform(0, 100)}), iterations),
+        "delete": measure(lambda i: delete_sensor_measurement(created[i]), iterations),
+        f"bulk_create_{BULK_BATCH_ROWS}": measure(bulk_create, max(1, iterations // 50)),
+        "by_sensor": measure(lambda i: get_sensor_measurements_by_sensor(sensors[i]), query_iterations),
+        "by_area": measure(lambda i: get_sensor_measurements_by_area(areas[i]), query_iterations),
+        "in_range_area_1h": measure(
+            lambda i: get_sensor_measurements_in_range(windows[i], windows[i] + datetime.timedelta(hours=1), id_area=areas[i]),
+            query_iterations,
+        ),
+        "page_sensor_1000": measure(
+            lambda i: get_sensor_measurements_page(start=windows[i], id_sensor=sensors[i], limit=1000), query_iterations
+        ),
+        "sensors_by_area": measure(lambda i: get_sensors_by_area(areas[i]), iterations),
+        "sensors_by_channel": measure(lambda i: get_sensors_by_channel(f"benchmark/a0/c{i % 16}"), iterations),
+    }
+    # The bulk rows are only there to be timed; their rollup buckets are recomputed without them
+    bulk_rows = (SensorMeasurement.id_area.in_(id_areas), SensorMeasurement.datetime == end)
+    with get_db() as db:
+        keys = db.execute(
+            select(SensorMeasurement.id_sensor, SensorMeasurement.id_area, SensorMeasurement.datetime).where(*bulk_rows).distinct()
+        ).all()
+        db.execute(delete(SensorMeasurement).where(*bulk_rows))
+        rebuild_rollup_buckets(db, [tuple(key) for key in keys])
+        db.commit()
+    return results
+
+
+def compare(results, baseline, max_regression):
+    """Prints the change against a baseline; returns the operations that slowed down more than allowed."""
+    regressions = []
+    for operation, result in results.items():
+        previous = baseline["results"].get(operation)
+        if previous is None:
+            continue
+        change = result["ops_per_second"] / previous["ops_per_second"] - 1
+        print(f"  {operation:<20} {previous['ops_per_second']:>12,.1f} -> {result['ops_per_second']:>12,.1f} ops/s ({change:+.1%})")
+        if change < -max_regression:
+            regressions.append(operation)
+    return regressions
+
+
+# Seeds a realistic Sensor_Measurement table and times the CRUD layer against it.
+# Point DATABASE_URL at a local Postgres, or at SQLite (e.g. sqlite:///benchmark.db) as a stand-in.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the CRUD functions in src/db.")
+    parser.add_argument("--measurements", type=int, default=1000000, help="Sensor_Measurement rows to benchmark against")
+    parser.add_argument("--areas", type=int, default=20)
+    parser.add_argument("--channels-per-area", type=int, default=16, help="Channels per area, each with one sensor per type")
+    parser.add_argument("--days", type=int, default=30, help="Time span of the seeded measurements")
+    parser.add_argument("--iterations", type=int, default=500, help="Calls per single-row operation")
+    parser.add_argument("--query-iterations", type=int, default=20, help="Calls per multi-row query")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Results file (default: benchmarks/crud-<dialect>-<timestamp>.json)")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Exit with status 1 if an operation is this much slower than the baseline")
+    parser.add_argument("--cleanup", action="store_true", help="Delete the benchmark data and exit")
+    args = parser.parse_args()
+
+    init_db()
+    migrate_db()
+    create_indexes()
+
+    if args.cleanup:
+        print(f"{remove_dataset()} benchmark areas removed")
+        sys.exit(0)
+
+    id_areas, id_sensors, start, end = seed_dataset(args.measurements, args.areas, args.channels_per_area, args.days, args.seed)
+    results = run_benchmarks(id_areas, id_sensors, start, end, args.iterations, args.query_iterations, args.seed)
+    for operation, result in results.items():
+        print(
+            f"{operation:<20} {result['ops_per_second']:>12,.1f} ops/s  "
+            f"p50 {result['p50_ms']:.2f} ms  p95 {result['p95_ms']:.2f} ms  p99 {result['p99_ms']:.2f} ms"
+        )
+
+    report = {
+        "dialect": engine.dialect.name,
+        "measurements": args.measurements,
+        "areas": args.areas,
+        "sensors": len(id_sensors),
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        "benchmarks", f"crud-{engine.dialect.name}-{datetime.datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        print(f"Compared with {args.baseline} ({baseline['dialect']}, {baseline['measurements']:,} measurements):")
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"Slower than the baseline by more than {args.max_regression:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
@@ -0,0 +1,349 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import argparse
+import json
+import queue
+import resource
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+
+import numpy as np
+import paho.mqtt.client as mqtt
+
+import app
+from anomaly_filter import AnomalyFilter
+from ingest_service import MeasurementIngestService
+from mqtt_buffer import MessageBuffer
+from payload_decoder import PayloadDecoder
+from record_log import RecordLog
+
+CHANNELS_PER_BOARD = 16
+# One board publishes its 16 mux channels 500 ms apart (Platformio/src/main.cpp)
+DEFAULT_RATE_PER_BOARD = 2.0
+GENERATOR_TICK_SECONDS = 0.005
+DRAIN_TIMEOUT_SECONDS = 30
+
+
+def board_topics(board):
+    """Board 0 uses the firmware topics; the others get their own so every channel is distinct."""
+    prefix = "chanel" if board == 0 else f"chanel/b{board}"
+    return [f"{prefix}/c{channel}" for channel in range(CHANNELS_PER_BOARD)]
+
+
+def make_payloads(count, seed):
+    """Pre-serializes ``count`` readings with the fields and ranges the ESP32 sends."""
+    rng = np.random.default_rng(seed)
+    values = np.column_stack(
+        [rng.uniform(0, 100, count), rng.uniform(0, 100, count), rng.uniform(15, 35, count), rng.uniform(20, 90, count)]
+    ).round(2)
+    states = rng.choice(["ON", "OFF"], count)
+    return [
+        '{"potassiumPercent":%s,"phosphorusPercent":%s,"temperature":%s,"humidity":%s,"state":"%s"}'
+        % (k, p, t, h, state)
+        for (k, p, t, h), state in zip(values.tolist(), states)
+    ]
+
+
+class LocalBroker:
+    """In-process stand-in for the broker.
+
+    Published messages are queued and delivered to ``on_message`` by a
+    single thread, like paho's network loop, so a slow ingest path shows up
+    as queue depth and lag instead of being hidden.
+    """
+
+    def __init__(self, on_message):
+        self.on_message = on_message
+        self.max_depth = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._deliver, name="local-broker", daemon=True)
+        self._thread.start()
+
+    def publish(self, topic, payload):
+        self._queue.put((topic, payload))
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    def _deliver(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            msg = mqtt.MQTTMessage(topic=item[0].encode())
+            msg.payload = item[1].encode()
+            self.on_message(None, None, msg)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+class RemoteBroker:
+    """Publishes through a real local broker (e.g. mosquitto) to a subscriber running app.on_message."""
+
+    def __init__(self, on_message, host, port):
+        subscribed = threading.Event()
+        self.max_depth = None
+
+        def on_connect(client, userdata, flags, rc):
+            client.subscribe("chanel/#")
+
+        self.subscriber = mqtt.Client()
+        self.subscriber.on_connect = on_connect
+        self.subscriber.on_subscribe = lambda *args: subscribed.set()
+        self.subscriber.on_message = on_message
+        self.subscriber.connect(host, port, 60)
+        self.subscriber.loop_start()
+
+        self.publisher = mqtt.Client()
+        self.publisher.max_queued_messages_set(0)
+        self.publisher.connect(host, port, 60)
+        self.publisher.loop_start()
+        if not subscribed.wait(10):
+            raise RuntimeError(f"Could not subscribe on {host}:{port}")
+
+    def publish(self, topic, payload):
+        self.publisher.publish(topic, payload)
+
+    def close(self):
+        self.publisher.loop_stop()
+        self.publisher.disconnect()
+        self.subscriber.loop_stop()
+        self.subscriber.disconnect()
+
+
+class SendTimes:
+    """Send time of every published message, queued per topic.
+
+    MQTT keeps the order of the messages of a topic, so the oldest sent time
+    of a topic belongs to the next message of that topic to arrive. On
+    delivery it is dropped if the reading was rejected or filtered, or kept
+    until the reading is written otherwise. The payloads stay exactly as the
+    firmware sends them.
+    """
+
+    def __init__(self):
+        self._sent = defaultdict(deque)
+        self._accepted = defaultdict(deque)
+
+    def sent(self, topic):
+        self._sent[topic].append(time.time())
+
+    def delivered(self, topic, accepted):
+        """Called for every message as it arrives, whether or not it will be written."""
+        if self._sent[topic]:
+            sent = self._sent[topic].popleft()
+            if accepted:
+                self._accepted[topic].append(sent)
+
+    def lags_ms(self, topics):
+        now = time.time()
+        return [(now - self._accepted[topic].popleft()) * 1000 for topic in topics if self._accepted[topic]]
+
+
+def _percentiles(lags, prefix):
+    lags = np.array(lags) if lags else np.zeros(1)
+    return {
+        f"{prefix}_p50_ms": round(float(np.percentile(lags, 50)), 2),
+        f"{prefix}_p95_ms": round(float(np.percentile(lags, 95)), 2),
+        f"{prefix}_p99_ms": round(float(np.percentile(lags, 99)), 2),
+        f"{prefix}_max_ms": round(float(lags.max()), 2),
+    }
+
+
+class TimedIngestService(MeasurementIngestService):
+    """MeasurementIngestService that records how long each reading took to reach the database."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.send_times = SendTimes()
+        self.lags = []
+
+    def _write(self, batch):
+        super()._write(batch)
+        lags = self.send_times.lags_ms([reading["chanel"] for reading in batch])
+        with self._stats_lock:
+            self.lags.extend(lags)
+
+
+def generate(broker, boards, rate_per_board, duration, send_times, seed=0):
+    """Publishes round-robin over every board's channels at ``boards * rate_per_board`` msg/s."""
+    topics = [topic for board in range(boards) for topic in board_topics(board)]
+    payloads = make_payloads(4096, seed)
+    rate = boards * rate_per_board
+    started = time.perf_counter()
+    sent = 0
+    while True:
+        elapsed = time.perf_counter() - started
+        if elapsed >= duration:
+            return sent
+        due = int(elapsed * rate) + 1
+        while sent < due:
+            topic = topics[sent % len(topics)]
+            for times in send_times:
+                times.sent(topic)
+            broker.publish(topic, payloads[sent % len(payloads)])
+            sent += 1
+        time.sleep(GENERATOR_TICK_SECONDS)
+
+
+def run_benchmark(
+    boards=1,
+    rate_per_board=DEFAULT_RATE_PER_BOARD,
+    duration=10.0,
+    broker_address=None,
+    db_sink=False,
+    max_batch=app.FLUSH_MAX_MESSAGES,
+    flush_interval=app.FLUSH_INTERVAL_SECONDS,
+    log_dir=None,
+):
+    """Drives app.on_message with simulated boards and returns the measured figures.
+
+    With ``db_sink`` every message is also delivered to a
+    MeasurementIngestService writing to Sensor_Measurement, as when
+    src/ingest_service.py runs next to the ingester.
+    """
+    lags = []
+    send_times = SendTimes()
+
+    def flush(batch):
+        app.flush_batch(batch)
+        lags.extend(send_times.lags_ms([reading.chanel for reading in batch]))
+
+    # The ingest globals are pointed at a scratch log and a buffer with the requested settings
+    temporary = None
+    if log_dir is None:
+        temporary = tempfile.TemporaryDirectory(prefix="benchmark_ingest_")
+        log_dir = temporary.name
+    app.BUFFERED_MODE = True
+    decoder = app.payload_decoder = PayloadDecoder()
+    anomaly_filter = app.anomaly_filter = AnomalyFilter()
+    app.record_log = RecordLog(log_dir)
+    app.message_buffer = MessageBuffer(flush, max_batch=max_batch, flush_interval=flush_interval, capacity=app.BUFFER_CAPACITY)
+    app.message_buffer.start()
+
+    # Each handler with its send times and a counter that grows when it accepts a message
+    handlers = [(app.on_message, send_times, lambda: app.message_buffer.received)]
+    service = None
+    if db_sink:
+        service = TimedIngestService()
+        service.start()
+        handlers.append((service.on_message, service.send_times, lambda: service.enqueued))
+    all_send_times = [times for _, times, _ in handlers]
+
+    def on_message(client, userdata, msg):
+        for handler, times, accepted in handlers:
+            before = accepted()
+            handler(client, userdata, msg)
+            times.delivered(msg.topic, accepted() != before)
+
+    if broker_address:
+        host, _, port = broker_address.partition(":")
+        broker = RemoteBroker(on_message, host, int(port or 1883))
+    else:
+        broker = LocalBroker(on_message)
+
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    sent = generate(broker, boards, rate_per_board, duration, all_send_times)
+    generated_seconds = time.perf_counter() - started
+
+    # Wait for the broker to deliver everything, then flush what is left
+    deadline = time.monotonic() + DRAIN_TIMEOUT_SECONDS
+    while decoder.decoded + sum(decoder.rejected.values()) < sent and time.monotonic() < deadline:
+        time.sleep(0.01)
+    app.message_buffer.stop()
+    elapsed = time.perf_counter() - started
+    if service is not None:
+        service.stop()
+    cpu_seconds = time.process_time() - cpu_started
+    wall_seconds = time.perf_counter() - started
+    broker.close()
+    app.record_log.close()
+
+    stats = app.message_buffer.stats()
+    decoder_stats = decoder.stats()
+    result = {
+        "boards": boards,
+        "channels": boards * CHANNELS_PER_BOARD,
+        "offered_rate": boards * rate_per_board,
+        "duration_s": round(generated_seconds, 3),
+        "sent": sent,
+        "received": stats["received"],
+        "flushed": stats["flushed"],
+        "dropped": stats["dropped"],
+        "rejected": decoder_stats["rejected"],
+        "filtered": anomaly_filter.counts["dropped"],
+        "lost": sent - stats["received"] - decoder_stats["rejected"] - anomaly_filter.counts["dropped"],
+        "decode_us_per_message": decoder_stats["us_per_message"],
+        "sustained_rate": round(stats["flushed"] / elapsed, 1),
+        **_percentiles(lags, "lag"),
+        "avg_flush_ms": round(stats["avg_flush_latency_ms"], 2),
+        "max_flush_ms": round(stats["max_flush_latency_ms"], 2),
+        "cpu_percent": round(cpu_seconds / wall_seconds * 100, 1),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "broker_max_depth": broker.max_depth,
+    }
+    if service is not None:
+        db_stats = service.stats()
+        result.update(
+            db_rows_written=db_stats["written"],
+            db_fields_rejected=db_stats["rejected"],
+            db_dropped=db_stats["dropped"],
+            db_failed_batches=db_stats["failed_batches"],
+            **_percentiles(service.lags, "db_lag"),
+        )
+    if temporary is not None:
+        temporary.cleanup()
+    return result
+
+
+# Simulates ESP32 boards publishing to the ingest path of src/app.py and reports
+# throughput, end-to-end lag (publish -> flushed to the log), CPU and memory
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the MQTT ingest path of src/app.py.")
+    parser.add_argument("--boards", type=int, nargs="+", default=[1], help="Simulated boards; several values run one step each")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE_PER_BOARD, help="Messages per second per board")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per step")
+    parser.add_argument("--broker", help="host[:port] of a local broker; by default an in-process stand-in is used")
+    parser.add_argument("--db-sink", action="store_true", help="Also run the Sensor_Measurement ingest service on every message")
+    parser.add_argument("--max-batch", type=int, default=app.FLUSH_MAX_MESSAGES)
+    parser.add_argument("--flush-interval", type=float, default=app.FLUSH_INTERVAL_SECONDS)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--max-lag-ms", type=float, help="Exit with status 1 if the p99 lag of any step exceeds this")
+    parser.add_argument("--min-ratio", type=float, default=0.99, help="Exit with status 1 if any step flushes less than this share of the messages sent")
+    args = parser.parse_args()
+
+    results = []
+    failed = False
+    for boards in args.boards:
+        result = run_benchmark(
+            boards, args.rate, args.duration, args.broker, args.db_sink, args.max_batch, args.flush_interval
+        )
+        results.append(result)
+        print(
+            f"{boards} boards ({result['channels']} channels, {result['offered_rate']:,.0f} msg/s offered): "
+            f"sustained {result['sustained_rate']:,.0f} msg/s, flushed {result['flushed']}/{result['sent']}, "
+            f"lag p50/p99/max {result['lag_p50_ms']:.1f}/{result['lag_p99_ms']:.1f}/{result['lag_max_ms']:.1f} ms, "
+            f"decode {result['decode_us_per_message']:.1f} us/msg, CPU {result['cpu_percent']:.0f}%, peak RSS {result['peak_rss_mib']:.0f} MiB"
+        )
+        if args.db_sink:
+            print(
+                f"  database: {result['db_rows_written']} rows written, {result['db_dropped']} readings dropped, "
+                f"lag p50/p99 {result['db_lag_p50_ms']:.1f}/{result['db_lag_p99_ms']:.1f} ms"
+            )
+        if result["flushed"] < args.min_ratio * result["sent"]:
+            print(f"  only {result['flushed'] / max(result['sent'], 1):.1%} of the messages were flushed")
+            failed = True
+        if args.max_lag_ms is not None and result["lag_p99_ms"] > args.max_lag_ms:
+            print(f"  p99 lag above {args.max_lag_ms} ms")
+            failed = True
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,181 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import argparse
+import datetime
+import gc
+import json
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+import psutil
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
+# Imported up front so the first model's load time doesn't include importing its estimator module
+import sklearn.ensemble  # noqa: F401
+import sklearn.linear_model  # noqa: F401
+import sklearn.naive_bayes  # noqa: F401
+import sklearn.neighbors  # noqa: F401
+import sklearn.neural_network  # noqa: F401
+import sklearn.svm  # noqa: F401
+
+from model_registry import MODELS_DIR, artifact_name
+from recommendation_engine import CROPS, FEATURE_COLUMNS, PHENOLOGICAL_STAGES, build_feature_matrix
+from db.ml_model_crud import get_all_ml_models, update_ml_model
+
+BATCH_SIZES = [1, 16, 256, 4096]
+# Each throughput measurement repeats the batch until at least this much time has passed
+MIN_MEASURE_SECONDS = 0.2
+
+
+def generate_dataset(num_samples=5000, noise_probability=0.1, seed=42):
+    """Vectorized version of generate_fake_irrigation_data from scripts/train_model.ipynb.
+
+    Returns ``(features, labels)``: the standardized feature frame in
+    FEATURE_COLUMNS order and the Irrigate labels.
+    """
+    rng = np.random.default_rng(seed)
+    crop = rng.choice(CROPS, num_samples)
+    stage = rng.choice(PHENOLOGICAL_STAGES, num_samples)
+    k = np.clip(rng.normal(200, 50, num_samples), 100, 350)
+    p = np.clip(rng.normal(100, 30, num_samples), 50, 180)
+    ph = np.clip(rng.normal(6.5, 0.5, num_samples), 5.5, 7.5)
+    moisture = np.clip(rng.normal(40, 15, num_samples), 10, 80)
+
+    corn = (crop == "Corn") & np.where(
+        np.isin(stage, ["R1", "R6"]),
+        (moisture < 30) | (k < 150) | (p < 75) | (ph < 6.0) | (ph > 7.0),
+        (moisture < 20) | (k < 100) | (p < 50),
+    )
+    soybean = (crop == "Soybean") & np.where(
+        stage == "Flowering",
+        (moisture < 40) | (k < 180) | (p < 80) | (ph < 6.2) | (ph > 7.2),
+        (moisture < 25) | (k < 120) | (p < 60),
+    )
+    wheat = (crop == "Wheat") & np.where(
+        stage == "Maturity",
+        (moisture < 35) | (k < 120) | (p < 70) | (ph < 5.8) | (ph > 6.8),
+        (moisture < 20) | (k < 100) | (p < 55),
+    )
+    labels = corn | soybean | wheat
+
+    near_boundary = (moisture < 25) | (k < 100) | (p < 50) | (ph < 5.8) | (ph > 7.2)
+    labels ^= near_boundary & (rng.random(num_samples) < noise_probability)
+
+    readings = pd.DataFrame({"K": k, "P": p, "pH": ph, "Moisture": moisture})
+    context = pd.DataFrame({"crop": crop, "phenological_stage": stage})
+    _, matrix = build_feature_matrix(readings, context)
+    return pd.DataFrame(matrix, columns=FEATURE_COLUMNS), labels
+
+
+def _rows_per_second(model, batch):
+    runs = 0
+    started = time.perf_counter()
+    while True:
+        model.predict(batch)
+        runs += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= MIN_MEASURE_SECONDS:
+            return runs * len(batch) / elapsed
+
+
+def benchmark_model(path, features, labels, batch_sizes=BATCH_SIZES, latency_samples=200):
+    """Measures load time, memory, latency, throughput and accuracy metrics of one pickle.
+
+    Memory is the growth of the process's resident set while unpickling, so
+    native buffers count too. Memory freed by an earlier model may be reused,
+    which can make the figure lower than the model's real footprint.
+    """
+    process = psutil.Process()
+    gc.collect()
+    rss_before = process.memory_info().rss
+    started = time.perf_counter()
+    with open(path, "rb") as file:
+        model = pickle.load(file)
+    load_time_ms = (time.perf_counter() - started) * 1000
+    memory_bytes = max(0, process.memory_info().rss - rss_before)
+
+    latencies = []
+    for i in range(latency_samples):
+        row = features.iloc[[i % len(features)]]
+        started = time.perf_counter()
+        model.predict(row)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    throughput = {size: _rows_per_second(model, features.iloc[:size]) for size in batch_sizes if size <= len(features)}
+
+    predictions = model.predict(features).astype(bool)
+    return {
+        "load_time_ms": load_time_ms,
+        "memory_bytes": memory_bytes,
+        "latency_ms": float(np.median(latencies)),
+        "latency_p99_ms": float(np.percentile(latencies, 99)),
+        "throughput": throughput,
+        "accuracy": accuracy_score(labels, predictions),
+        "precision": precision_score(labels, predictions, zero_division=0),
+        "recall": recall_score(labels, predictions, zero_division=0),
+        "f1_score": f1_score(labels, predictions, zero_division=0),
+    }
+
+
+# Benchmarks every ML_Model that has a pickle in src/models. The runtime cost is stored in ML_Model;
+# the metrics on the synthetic dataset only go to the results file, so the training metrics are kept.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the trained classifiers in src/models.")
+    parser.add_argument("--samples", type=int, default=5000, help="Rows in the synthetic dataset")
+    parser.add_argument("--noise", type=float, default=0.1, help="Label noise probability near the boundaries")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--output", help="Results file (default: benchmarks/models-<timestamp>.json)")
+    parser.add_argument("--no-write", action="store_true", help="Only print and save the results, don't update ML_Model")
+    args = parser.parse_args()
+
+    features, labels = generate_dataset(args.samples, args.noise, args.seed)
+    results = {}
+
+    for row in get_all_ml_models():
+        path = os.path.join(MODELS_DIR, artifact_name(row.model_name))
+        if not os.path.exists(path):
+            print(f"{row.model_name}: artifact not found, skipped")
+            continue
+
+        result = benchmark_model(path, features, labels, args.batch_sizes)
+        throughput = ", ".join(f"{size}: {rate:,.0f}/s" for size, rate in result["throughput"].items())
+        print(
+            f"{row.model_name}: load {result['load_time_ms']:.1f} ms, "
+            f"memory {result['memory_bytes'] / 1024:,.0f} KiB, "
+            f"latency p50 {result['latency_ms']:.3f} ms / p99 {result['latency_p99_ms']:.3f} ms, "
+            f"throughput [{throughput}], "
+            f"accuracy {result['accuracy']:.3f}, precision {result['precision']:.3f}, "
+            f"recall {result['recall']:.3f}, f1 {result['f1_score']:.3f}"
+        )
+
+        results[row.model_name] = result
+
+        if not args.no_write:
+            # Rows per second at the largest batch that fit in the dataset
+            largest = max(result["throughput"], default=None)
+            update_ml_model(
+                row.id_model,
+                {
+                    "load_time_ms": result["load_time_ms"],
+                    "memory_bytes": int(result["memory_bytes"]),
+                    "latency_ms": result["latency_ms"],
+                    "throughput": None if largest is None else result["throughput"][largest],
+                },
+            )
+
+    report = {
+        "samples": args.samples,
+        "noise": args.noise,
+        "seed": args.seed,
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "results": results,
+    }
+    output = args.output or os.path.join("benchmarks", f"models-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2, default=float)
+    print(f"Results saved to {output}")
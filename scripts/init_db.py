@@ -2,10 +2,13 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
+from sqlalchemy import inspect, text
+
 # from sqlalchemy.orm import declarative_base
 from db.database_session import get_db  # Import get_db function
 from db.models import *
 from db.database_session import Base
+from db.partitioning import create_partitioned_measurement_table, ensure_measurement_partitions
 
 # # Base class for SQLAlchemy ORM
 # Base = declarative_base()
@@ -14,9 +17,43 @@ from db.database_session import Base
 # Database initialization
 def init_db():
     with get_db() as db:
+        if db.bind.dialect.name == "postgresql":
+            # Sensor_Measurement is created partitioned by month, after the tables it references
+            Base.metadata.create_all(
+                db.bind,
+                tables=[t for t in Base.metadata.sorted_tables if t.name != SensorMeasurement.__tablename__],
+            )
+            create_partitioned_measurement_table(db)
         Base.metadata.create_all(db.bind)
 
 
+# Schema changes for databases created by an older version of this script
+def migrate_db():
+    with get_db() as db:
+        sensor_columns = {c["name"] for c in inspect(db.bind).get_columns("Sensor")}
+        if "channel" not in sensor_columns:
+            db.execute(text('ALTER TABLE "Sensor" ADD COLUMN channel VARCHAR'))
+            db.commit()
+
+        ml_model_columns = {c["name"] for c in inspect(db.bind).get_columns("ML_Model")}
+        for name, sql_type in [
+            ("load_time_ms", "FLOAT"),
+            ("memory_bytes", "INTEGER"),
+            ("latency_ms", "FLOAT"),
+            ("throughput", "FLOAT"),
+        ]:
+            if name not in ml_model_columns:
+                db.execute(text(f'ALTER TABLE "ML_Model" ADD COLUMN {name} {sql_type}'))
+        db.commit()
+
+
+# Indexes added to existing tables after they were first created
+def create_indexes():
+    with get_db() as db:
+        for index in SensorMeasurement.__table__.indexes:
+            index.create(db.bind, checkfirst=True)
+
+
 # Initial database population
 def populate_db():
     with get_db() as db:
@@ -64,22 +101,47 @@ def populate_db():
                 SensorType(
                     name="Moisture", description="Sensor to measure soil moisture"
                 ),
+                SensorType(
+                    name="Temperature", description="Sensor to measure air temperature"
+                ),
+                SensorType(
+                    name="Humidity", description="Sensor to measure air humidity"
+                ),
             ]
             db.add_all(sensor_types)
 
-            # Initial data for Sensor
+            # Initial data for Sensor (Sector A reports on chanel/c0, Sector B on chanel/c1)
             sensors = [
-                Sensor(id_type=1, id_area=1, sensor_name="Sensor K - Sector A"),
-                Sensor(id_type=2, id_area=1, sensor_name="Sensor P - Sector A"),
-                Sensor(id_type=3, id_area=1, sensor_name="Sensor pH - Sector A"),
-                Sensor(id_type=4, id_area=1, sensor_name="Sensor Moisture - Sector A"),
-                Sensor(id_type=1, id_area=2, sensor_name="Sensor K - Sector B"),
-                Sensor(id_type=2, id_area=2, sensor_name="Sensor P - Sector B"),
-                Sensor(id_type=3, id_area=2, sensor_name="Sensor pH - Sector B"),
-                Sensor(id_type=4, id_area=2, sensor_name="Sensor Moisture - Sector B"),
+                Sensor(id_type=1, id_area=1, sensor_name="Sensor K - Sector A", channel="chanel/c0"),
+                Sensor(id_type=2, id_area=1, sensor_name="Sensor P - Sector A", channel="chanel/c0"),
+                Sensor(id_type=3, id_area=1, sensor_name="Sensor pH - Sector A", channel="chanel/c0"),
+                Sensor(id_type=4, id_area=1, sensor_name="Sensor Moisture - Sector A", channel="chanel/c0"),
+                Sensor(id_type=5, id_area=1, sensor_name="Sensor Temperature - Sector A", channel="chanel/c0"),
+                Sensor(id_type=6, id_area=1, sensor_name="Sensor Humidity - Sector A", channel="chanel/c0"),
+                Sensor(id_type=1, id_area=2, sensor_name="Sensor K - Sector B", channel="chanel/c1"),
+                Sensor(id_type=2, id_area=2, sensor_name="Sensor P - Sector B", channel="chanel/c1"),
+                Sensor(id_type=3, id_area=2, sensor_name="Sensor pH - Sector B", channel="chanel/c1"),
+                Sensor(id_type=4, id_area=2, sensor_name="Sensor Moisture - Sector B", channel="chanel/c1"),
+                Sensor(id_type=5, id_area=2, sensor_name="Sensor Temperature - Sector B", channel="chanel/c1"),
+                Sensor(id_type=6, id_area=2, sensor_name="Sensor Humidity - Sector B", channel="chanel/c1"),
             ]
             db.add_all(sensors)
 
+            # Trained classifiers shipped in src/models, with the metrics from document/other/ml_training.md
+            ml_models = [
+                MLModel(model_name=name, model_type="Classification", ml_library="scikit-learn",
+                        accuracy=accuracy, precision=precision, recall=recall, f1_score=f1)
+                for name, accuracy, precision, recall, f1 in [
+                    ("Neural Network", 0.88, 0.84, 0.72, 0.78),
+                    ("Random Forest", 0.86, 0.78, 0.72, 0.75),
+                    ("Logistic Regression", 0.78, 0.68, 0.45, 0.54),
+                    ("K-Nearest Neighbors", 0.86, 0.86, 0.62, 0.72),
+                    ("Support Vector Machine", 0.77, 0.65, 0.45, 0.53),
+                    ("Naive Bayes", 0.78, 0.71, 0.41, 0.52),
+                ]
+            ]
+            db.add_all(ml_models)
+
             db.commit()
             print("Database populated successfully!")
         except Exception as e:
@@ -89,4 +151,7 @@ def populate_db():
 
 if __name__ == "__main__":
     init_db()
+    migrate_db()
+    create_indexes()
+    ensure_measurement_partitions()
     populate_db()
@@ -0,0 +1,33 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import argparse
+
+from db.partitioning import apply_retention, ensure_measurement_partitions
+
+
+# Archives old Sensor_Measurement months to Parquet and drops them.
+# Run it daily (e.g. from cron) so upcoming monthly partitions are also created in time.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply the Sensor_Measurement retention policy.")
+    parser.add_argument("--keep-months", type=int, default=6, help="Months of raw measurements to keep")
+    parser.add_argument("--archive-dir", default="archive", help="Directory for the Parquet exports")
+    parser.add_argument("--no-export", action="store_true", help="Drop expired data without exporting it")
+    parser.add_argument(
+        "--keep-minute-rollup-months", type=int, help="Months of minute rollups to keep (default: --keep-months)"
+    )
+    parser.add_argument("--no-downsample", action="store_true", help="Do not rebuild the rollups before dropping")
+    args = parser.parse_args()
+
+    created = ensure_measurement_partitions()
+    print(f"Partitions ensured: {created}")
+
+    archived = apply_retention(
+        keep_months=args.keep_months,
+        archive_dir=None if args.no_export else args.archive_dir,
+        downsample=not args.no_downsample,
+        keep_minute_rollup_months=args.keep_minute_rollup_months,
+    )
+    for month, rows in archived:
+        print(f"{month:%Y-%m}: {rows} measurements archived and dropped")
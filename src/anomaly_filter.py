@@ -0,0 +1,166 @@
+import os
+from collections import Counter, deque
+
+from payload_decoder import PAYLOAD_RANGES, Reading
+
+# Filter settings
+ANOMALY_ALPHA = float(os.getenv("ANOMALY_ALPHA", "0.1"))
+# Robust z-score above which a value is a spike
+ANOMALY_THRESHOLD = float(os.getenv("ANOMALY_THRESHOLD", "4.0"))
+# Readings per field before spikes are flagged
+ANOMALY_WARMUP = int(os.getenv("ANOMALY_WARMUP", "10"))
+# Consecutive outliers accepted as a real change of level
+ANOMALY_PERSISTENCE = int(os.getenv("ANOMALY_PERSISTENCE", "3"))
+# "drop": spikes are removed before storage; "tag": readings pass and anomalies are only counted
+ANOMALY_ACTION = os.getenv("ANOMALY_ACTION", "drop")
+ANOMALY_LOG_SIZE = 100
+
+# Smallest deviation assumed per field, so a flat signal does not flag sensor noise
+MIN_DEVIATION = {
+    "potassiumPercent": 1.0,
+    "phosphorusPercent": 1.0,
+    "temperature": 0.5,
+    "humidity": 1.0,
+}
+# Mean absolute deviation -> standard deviation for normally distributed noise
+_MAD_TO_STD = 1.2533
+_FIELDS = [(field, MIN_DEVIATION[field] * _MAD_TO_STD) for field in PAYLOAD_RANGES]
+_STATES = {1: "ON", 0: "OFF"}
+
+
+def as_payload(reading):
+    """Converts a Reading back into a payload dict with only the values that were reported."""
+    payload = {field: value for field, value in zip(PAYLOAD_RANGES, reading[2:6]) if value == value}
+    if reading.state in _STATES:
+        payload["state"] = _STATES[reading.state]
+    return payload
+
+
+class AnomalyFilter:
+    """Streaming spike and NaN filter for decoded readings.
+
+    Every channel keeps, per field, an exponentially weighted mean and mean
+    absolute deviation: a fixed handful of floats, updated in O(1) per
+    reading. After ``warmup`` readings, a value further than ``threshold``
+    robust deviations from the mean is a spike and does not update the
+    statistics; ``persistence`` spikes in a row are taken as a real change
+    of level and restart the mean there. With ``action="drop"`` spiking
+    values are blanked (NaN) and a reading with no value left is dropped.
+    """
+
+    def __init__(
+        self,
+        alpha=ANOMALY_ALPHA,
+        threshold=ANOMALY_THRESHOLD,
+        warmup=ANOMALY_WARMUP,
+        persistence=ANOMALY_PERSISTENCE,
+        action=ANOMALY_ACTION,
+        log_size=ANOMALY_LOG_SIZE,
+    ):
+        if action not in ("drop", "tag"):
+            raise ValueError(f"Unknown anomaly action {action}")
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.persistence = persistence
+        self.action = action
+
+        # chanel -> per field [mean, deviation, count, consecutive spikes]
+        self._state = {}
+        self.anomalies = deque(maxlen=log_size)
+
+        # Counters
+        self.checked = 0
+        self.counts = Counter()
+
+    def filter(self, reading):
+        """Returns the reading with spikes removed, the reading unchanged in "tag" mode, or None to drop it."""
+        self.checked += 1
+        state = self._state.get(reading.chanel)
+        if state is None:
+            state = self._state[reading.chanel] = [[0.0, 0.0, 0, 0] for _ in _FIELDS]
+
+        values = list(reading[2:6])
+        valid = 0
+        for i, (field, floor) in enumerate(_FIELDS):
+            value = values[i]
+            if value != value:
+                self.counts["nan_fields"] += 1
+                continue
+            stats = state[i]
+            mean, deviation, count, run = stats
+            if count == 0:
+                stats[0], stats[2] = value, 1
+                valid += 1
+                continue
+
+            difference = value - mean
+            if count >= self.warmup and abs(difference) > self.threshold * max(deviation * _MAD_TO_STD, floor):
+                run += 1
+                if run < self.persistence:
+                    stats[3] = run
+                    self.counts["spikes"] += 1
+                    self.anomalies.append((reading.chanel, field, value, mean))
+                    if self.action == "drop":
+                        values[i] = float("nan")
+                    else:
+                        valid += 1
+                    continue
+                # The new level held: start again from it
+                self.counts["level_shifts"] += 1
+                stats[:] = [value, deviation, count + 1, 0]
+                valid += 1
+                continue
+
+            stats[0] = mean + self.alpha * difference
+            stats[1] = deviation + self.alpha * (abs(difference) - deviation)
+            stats[2] = count + 1
+            stats[3] = 0
+            valid += 1
+
+        if self.action == "tag":
+            return reading
+        if valid == 0:
+            self.counts["dropped"] += 1
+            return None
+        return Reading(reading.chanel, reading.timestamp, *values, reading.state)
+
+    def stats(self):
+        """Returns the number of readings checked and the anomaly counters."""
+        return {
+            "checked": self.checked,
+            "spikes": self.counts["spikes"],
+            "nan_fields": self.counts["nan_fields"],
+            "level_shifts": self.counts["level_shifts"],
+            "dropped": self.counts["dropped"],
+            "channels": len(self._state),
+        }
+
+
+if __name__ == "__main__":
+    # Test the functions
+    import time
+
+    import numpy as np
+
+    anomaly_filter = AnomalyFilter()
+    rng = np.random.default_rng(0)
+    for i in range(200):
+        potassium = 40 + rng.normal(0, 0.5)
+        if i in (50, 120):
+            potassium = 95.0  # glitch
+        if i >= 150:
+            potassium += 20  # real change of level
+        temperature = float("nan") if i % 40 == 0 else 24 + rng.normal(0, 0.2)
+        result = anomaly_filter.filter(Reading("chanel/c0", time.time_ns(), potassium, 55.0, temperature, 60.0, 1))
+        if result is None or result.potassiumPercent != potassium:
+            print(f"{i}: {potassium:.1f} -> {result}")
+    print(f"Anomalies: {list(anomaly_filter.anomalies)}")
+    print(anomaly_filter.stats())
+
+    count = 100000
+    reading = Reading("chanel/c1", time.time_ns(), 40.0, 55.0, 24.0, 60.0, 1)
+    started = time.perf_counter()
+    for _ in range(count):
+        anomaly_filter.filter(reading)
+    print(f"Filter: {(time.perf_counter() - started) / count * 1e6:.2f} us/reading")
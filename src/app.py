@@ -1,13 +1,15 @@
 import paho.mqtt.client as mqtt
-import json
-import pandas as pd
-from datetime import datetime
 import time
 import os
-from filelock import FileLock
+from mqtt_buffer import MessageBuffer
+from live_feed import LiveFeed
+from latest_table import LatestTable
+from payload_decoder import PayloadDecoder
+from anomaly_filter import AnomalyFilter
+from record_log import MQTT_LOG_DIR, LatestIndexReader, RecordLog, to_records
 
-# Global DataFrame to store MQTT messages
-mqtt_data = pd.DataFrame(columns=["chanel", "potassiumPercent", "phosphorusPercent", "temperature", "humidity", "irrigation", "timestamp"])
+# Latest MQTT reading per channel, updated in place; mqtt_data.frame() is a DataFrame view
+mqtt_data = LatestTable()
 
 # MQTT Credentials
 MQTT_BROKER = "759d2f782c6f48d68eafab33492641f8.s1.eu.hivemq.cloud"
@@ -15,23 +17,44 @@ MQTT_PORT = 8883
 MQTT_USER = "sla"
 MQTT_PASSWORD = "sla"
 
-# CSV file name and lock file
-CSV_FILE = "mqtt_data.csv"
-LOCK_FILE = CSV_FILE + ".lock"
+# Append-only binary log of every reading, with a latest-value index read by the dashboard
+record_log = RecordLog(MQTT_LOG_DIR)
 
-# Function to save DataFrame to CSV
-def save_to_csv():
-    with FileLock(LOCK_FILE):
-        mqtt_data.to_csv(CSV_FILE, index=False)
-    print(f"Dados atualizados salvos em {CSV_FILE}")
+# Buffered ingest: messages are kept in memory and written in batches
+BUFFERED_MODE = os.getenv("MQTT_BUFFERED_MODE", "1") == "1"
+FLUSH_MAX_MESSAGES = int(os.getenv("MQTT_FLUSH_MAX_MESSAGES", "256"))
+FLUSH_INTERVAL_SECONDS = float(os.getenv("MQTT_FLUSH_INTERVAL_SECONDS", "2.0"))
+BUFFER_CAPACITY = int(os.getenv("MQTT_BUFFER_CAPACITY", "10000"))
+STATS_INTERVAL_SECONDS = 30
 
-# Function to load data from CSV
-def load_from_csv():
-    global mqtt_data
-    with FileLock(LOCK_FILE):
-        if os.path.exists(CSV_FILE):
-            mqtt_data = pd.read_csv(CSV_FILE)
-    print("Dados carregados do CSV")
+# Latest reading per channel, pushed to in-process consumers
+live_feed = LiveFeed()
+
+# Validates payloads into typed readings; rejected ones are counted, not printed
+payload_decoder = PayloadDecoder()
+
+# Per-channel spike and NaN filter, applied before a reading reaches the feed, the table or the log
+anomaly_filter = AnomalyFilter()
+
+# Function to load the latest reading per channel from the log index
+def load_from_log():
+    latest = LatestIndexReader(MQTT_LOG_DIR).read()
+    if latest is not None:
+        mqtt_data.update_records(latest[1])
+    print("Dados carregados do log")
+
+# Function to persist a batch of decoded readings, packed once for the table and the log
+def flush_batch(batch):
+    records = to_records(batch)
+    mqtt_data.update_records(records)
+    record_log.append(records)
+
+message_buffer = MessageBuffer(
+    flush_batch,
+    max_batch=FLUSH_MAX_MESSAGES,
+    flush_interval=FLUSH_INTERVAL_SECONDS,
+    capacity=BUFFER_CAPACITY,
+)
 
 # MQTT Callbacks
 def on_connect(client, userdata, flags, rc):
@@ -42,51 +65,84 @@ def on_connect(client, userdata, flags, rc):
         print(f"Failed to connect, return code {rc}")
 
 def on_message(client, userdata, msg):
-    global mqtt_data
-    payload = msg.payload.decode()
-    print(f"Dados recebidos do tópico {msg.topic}: {payload}")
-   
+    # Decode and validate the payload into a Reading tuple
+    reading = payload_decoder.decode(msg.topic, msg.payload)
+    if reading is None:
+        return
+    # Blank out spikes; a reading with nothing left is dropped
+    reading = anomaly_filter.filter(reading)
+    if reading is None:
+        return
+    live_feed.publish(msg.topic, reading)
+
+    if BUFFERED_MODE:
+        # Hand the reading to the flush thread
+        message_buffer.append(reading)
+        return
+
+    # Update the channel's row and append the reading to the log right away
+    flush_batch([reading])
+
+def print_buffer_stats():
+    stats = message_buffer.stats()
+    print(
+        f"Buffer: recebidas={stats['received']} gravadas={stats['flushed']} "
+        f"descartadas={stats['dropped']} pendentes={stats['backlog']} "
+        f"lotes={stats['flushes']} falhas={stats['failed_flushes']} "
+        f"latência última/média/máx={stats['last_flush_latency_ms']:.1f}/"
+        f"{stats['avg_flush_latency_ms']:.1f}/{stats['max_flush_latency_ms']:.1f} ms"
+    )
+
+def print_decoder_stats():
+    stats = payload_decoder.stats()
+    print(
+        f"Decodificador: válidas={stats['decoded']} rejeitadas={stats['rejected']} "
+        f"{stats['rejected_by_reason']} custo={stats['us_per_message']:.2f} µs/msg"
+    )
+
+def print_anomaly_stats():
+    stats = anomaly_filter.stats()
+    print(
+        f"Anomalias: verificadas={stats['checked']} picos={stats['spikes']} "
+        f"mudanças de nível={stats['level_shifts']} campos vazios={stats['nan_fields']} "
+        f"descartadas={stats['dropped']}"
+    )
+
+if __name__ == "__main__":
+    # Setup MQTT Client
+    client = mqtt.Client()
+    client.username_pw_set(MQTT_USER, MQTT_PASSWORD)  # Set username and password
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.tls_set()  # Enable TLS for secure communication
+    client.connect(MQTT_BROKER, MQTT_PORT, 60)
+
+    # Load the latest readings from the log before starting
+    load_from_log()
+
+    if BUFFERED_MODE:
+        message_buffer.start()
+
+    client.loop_start()
+
+    print("Script iniciado. Aguardando mensagens MQTT...")
     try:
-        # Parse JSON payload
-        data = json.loads(payload)
-        data["chanel"] = msg.topic  # Add channel name
-        data["timestamp"] = datetime.now()  # Add timestamp
-       
-        # Create a new DataFrame with the latest data
-        new_data = pd.DataFrame([data])
-       
-        # Update the mqtt_data DataFrame
-        with FileLock(LOCK_FILE):
-            mqtt_data = pd.concat([mqtt_data, new_data]).drop_duplicates(subset="chanel", keep="last").reset_index(drop=True)
-       
-        # Print the updated DataFrame
-        print("\nDataFrame atualizado:")
-        print(mqtt_data)
-
-        # Save to CSV after each update
-        save_to_csv()
-    except json.JSONDecodeError:
-        print(f"Erro ao decodificar JSON: {payload}")
-
-# Setup MQTT Client
-client = mqtt.Client()
-client.username_pw_set(MQTT_USER, MQTT_PASSWORD)  # Set username and password
-client.on_connect = on_connect
-client.on_message = on_message
-client.tls_set()  # Enable TLS for secure communication
-client.connect(MQTT_BROKER, MQTT_PORT, 60)
-
-# Load existing data from CSV before starting
-load_from_csv()
-
-client.loop_start()
-
-print("Script iniciado. Aguardando mensagens MQTT...")
-try:
-    while True:
-        time.sleep(1)  # Keep the script running
-except KeyboardInterrupt:
-    print("\nScript encerrado pelo usuário.")
-    save_to_csv()  # Final save before exiting
-    client.loop_stop()
-    client.disconnect()
\ No newline at end of file
+        last_stats = time.monotonic()
+        while True:
+            time.sleep(1)  # Keep the script running
+            if time.monotonic() - last_stats >= STATS_INTERVAL_SECONDS:
+                if BUFFERED_MODE:
+                    print_buffer_stats()
+                print_decoder_stats()
+                print_anomaly_stats()
+                last_stats = time.monotonic()
+    except KeyboardInterrupt:
+        print("\nScript encerrado pelo usuário.")
+        client.loop_stop()
+        if BUFFERED_MODE:
+            message_buffer.stop()
+            print_buffer_stats()
+        print_decoder_stats()
+        print_anomaly_stats()
+        record_log.close()
+        client.disconnect()
@@ -0,0 +1,191 @@
+from sqlalchemy import select
+from db.models import (
+    Harvest,
+    IrrigationHistory,
+    IrrigationRecommendation,
+    PlantingArea,
+    Sensor,
+    SensorMeasurement,
+    SensorMeasurementRollup,
+    SensorType,
+)
+from db.database_session import get_db
+import datetime
+
+import pandas as pd
+import pyarrow as pa
+
+# Columnar fetch path: these functions run a Core select() and stream the
+# result in chunks of FETCH_CHUNK_ROWS, converting each chunk to Arrow columns
+# as it arrives. Only one chunk of rows is held at a time and no ORM instances
+# are created.
+FETCH_CHUNK_ROWS = 10000
+
+# Python type of a column -> Arrow type, so every chunk and empty results share one schema
+_ARROW_TYPES = {
+    bool: pa.bool_(),
+    int: pa.int64(),
+    float: pa.float64(),
+    str: pa.string(),
+    datetime.datetime: pa.timestamp("us"),
+    datetime.date: pa.date32(),
+}
+
+
+def _arrow_type(column):
+    try:
+        return _ARROW_TYPES.get(column.type.python_type)
+    except NotImplementedError:
+        return None
+
+
+def _fetch(query, as_arrow: bool = False, chunk_rows: int = FETCH_CHUNK_ROWS):
+    names = list(query.selected_columns.keys())
+    types = [_arrow_type(column) for column in query.selected_columns]
+    chunks = []
+    with get_db() as db:
+        result = db.execute(query.execution_options(yield_per=chunk_rows))
+        for rows in result.partitions():
+            columns = zip(*rows)
+            chunks.append(
+                pa.table([pa.array(values, type=type_) for values, type_ in zip(columns, types)], names=names)
+            )
+
+    if chunks:
+        # Columns of unknown type are inferred per chunk and promoted to a common type
+        table = pa.concat_tables(chunks, promote_options="permissive")
+    else:
+        table = pa.schema([(name, type_ or pa.null()) for name, type_ in zip(names, types)]).empty_table()
+    return table if as_arrow else table.to_pandas()
+
+
+def fetch_measurements(
+    start: datetime.datetime = None,
+    end: datetime.datetime = None,
+    id_sensor: int = None,
+    id_area: int = None,
+    as_arrow: bool = False,
+):
+    """Fetches measurements with start <= datetime < end as a DataFrame or Arrow table."""
+    query = select(*SensorMeasurement.__table__.columns).order_by(
+        SensorMeasurement.datetime, SensorMeasurement.id_measurement
+    )
+    if start is not None:
+        query = query.where(SensorMeasurement.datetime >= start)
+    if end is not None:
+        query = query.where(SensorMeasurement.datetime < end)
+    if id_sensor is not None:
+        query = query.where(SensorMeasurement.id_sensor == id_sensor)
+    if id_area is not None:
+        query = query.where(SensorMeasurement.id_area == id_area)
+    return _fetch(query, as_arrow)
+
+
+def fetch_irrigation_recommendations(
+    start: datetime.datetime = None,
+    end: datetime.datetime = None,
+    id_area: int = None,
+    id_model: int = None,
+    as_arrow: bool = False,
+):
+    """Fetches irrigation recommendations as a DataFrame or Arrow table."""
+    query = select(*IrrigationRecommendation.__table__.columns).order_by(
+        IrrigationRecommendation.recommendation_date
+    )
+    if start is not None:
+        query = query.where(IrrigationRecommendation.recommendation_date >= start)
+    if end is not None:
+        query = query.where(IrrigationRecommendation.recommendation_date < end)
+    if id_area is not None:
+        query = query.where(IrrigationRecommendation.id_area == id_area)
+    if id_model is not None:
+        query = query.where(IrrigationRecommendation.id_model == id_model)
+    return _fetch(query, as_arrow)
+
+
+def fetch_irrigation_history(
+    start: datetime.datetime = None,
+    end: datetime.datetime = None,
+    id_area: int = None,
+    as_arrow: bool = False,
+):
+    """Fetches irrigation runs that started in [start, end) as a DataFrame or Arrow table."""
+    query = select(*IrrigationHistory.__table__.columns).order_by(IrrigationHistory.start_time)
+    if start is not None:
+        query = query.where(IrrigationHistory.start_time >= start)
+    if end is not None:
+        query = query.where(IrrigationHistory.start_time < end)
+    if id_area is not None:
+        query = query.where(IrrigationHistory.id_area == id_area)
+    return _fetch(query, as_arrow)
+
+
+def fetch_rollups(
+    granularity: str,
+    start: datetime.datetime = None,
+    end: datetime.datetime = None,
+    id_area: int = None,
+    type_name: str = None,
+    as_arrow: bool = False,
+):
+    """Fetches rollups of one granularity with their mean and sensor type name."""
+    rollup = SensorMeasurementRollup
+    query = (
+        select(
+            rollup.bucket_start,
+            rollup.id_sensor,
+            rollup.id_area,
+            SensorType.name.label("type_name"),
+            rollup.min_value,
+            rollup.max_value,
+            (rollup.sum_value / rollup.count).label("mean_value"),
+            rollup.count,
+            rollup.last_value,
+            rollup.last_datetime,
+        )
+        .join(Sensor, rollup.id_sensor == Sensor.id_sensor)
+        .join(SensorType, Sensor.id_type == SensorType.id_type)
+        .where(rollup.granularity == granularity)
+        .order_by(rollup.bucket_start, rollup.id_sensor)
+    )
+    if start is not None:
+        query = query.where(rollup.bucket_start >= start)
+    if end is not None:
+        query = query.where(rollup.bucket_start < end)
+    if id_area is not None:
+        query = query.where(rollup.id_area == id_area)
+    if type_name is not None:
+        query = query.where(SensorType.name == type_name)
+    return _fetch(query, as_arrow)
+
+
+def fetch_harvests(id_area: int = None, as_arrow: bool = False):
+    """Fetches harvests, oldest planting date first, as a DataFrame or Arrow table."""
+    query = select(*Harvest.__table__.columns).order_by(Harvest.planting_date, Harvest.id_harvest)
+    if id_area is not None:
+        query = query.where(Harvest.id_area == id_area)
+    return _fetch(query, as_arrow)
+
+
+def fetch_planting_areas(as_arrow: bool = False):
+    """Fetches all planting areas as a DataFrame or Arrow table."""
+    query = select(*PlantingArea.__table__.columns).order_by(PlantingArea.id_area)
+    return _fetch(query, as_arrow)
+
+
+if __name__ == "__main__":
+    # Test the functions
+    measurements = fetch_measurements(id_area=1)
+    print(f"Measurements for Area 1:\n{measurements}")
+
+    recommendations = fetch_irrigation_recommendations(as_arrow=True)
+    print(f"Irrigation Recommendations:\n{recommendations}")
+
+    history = fetch_irrigation_history(id_area=1)
+    print(f"Irrigation History for Area 1:\n{history}")
+
+    hourly = fetch_rollups("hour", id_area=1)
+    print(f"Hourly rollups for Area 1:\n{hourly}")
+
+    areas = fetch_planting_areas()
+    print(f"Planting Areas:\n{areas}")
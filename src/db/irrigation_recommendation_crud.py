@@ -1,4 +1,5 @@
 from typing import TypedDict
+from sqlalchemy import insert
 from sqlalchemy.exc import SQLAlchemyError
 from db.models import IrrigationRecommendation
 from db.database_session import get_db
@@ -42,6 +43,36 @@ def create_irrigation_recommendation(
             raise Exception(f"Error creating IrrigationRecommendation: {e}")
 
 
+def bulk_create_irrigation_recommendations(recommendations, recommendation_date: datetime.datetime = None):
+    """Creates many IrrigationRecommendation entries in a single transaction.
+
+    ``recommendations`` is an iterable of dicts with id_model, id_area and
+    irrigation_needed. Rows without a recommendation_date get
+    ``recommendation_date``, or the current time. Returns the number written.
+    """
+    recommendation_date = recommendation_date or datetime.datetime.now()
+    rows = [
+        {
+            "id_model": int(row["id_model"]),
+            "id_area": int(row["id_area"]),
+            "irrigation_needed": bool(row["irrigation_needed"]),
+            "recommendation_date": row.get("recommendation_date") or recommendation_date,
+        }
+        for row in recommendations
+    ]
+    if not rows:
+        return 0
+
+    with get_db() as db:
+        try:
+            db.execute(insert(IrrigationRecommendation), rows)
+            db.commit()
+            return len(rows)
+        except SQLAlchemyError as e:
+            db.rollback()
+            raise Exception(f"Error bulk creating IrrigationRecommendations: {e}")
+
+
 def get_irrigation_recommendation(id_recommendation: int):
     """Retrieves a IrrigationRecommendation entry by ID."""
     with get_db() as db:
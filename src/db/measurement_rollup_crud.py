@@ -0,0 +1,293 @@
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from db.models import SensorMeasurement, SensorMeasurementRollup
+from db.database_session import get_db
+import datetime
+
+import pandas as pd
+
+# Rollup granularity -> pandas frequency used to floor timestamps
+ROLLUP_GRANULARITIES = {"minute": "min", "hour": "h", "day": "D"}
+# Rollup granularity -> bucket length
+ROLLUP_BUCKETS = {
+    "minute": datetime.timedelta(minutes=1),
+    "hour": datetime.timedelta(hours=1),
+    "day": datetime.timedelta(days=1),
+}
+# Dialects with an INSERT ... ON CONFLICT DO UPDATE construct; others merge row by row
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+# Rollup rows are written in primary key order, so concurrent writers lock shared buckets in the same order
+_ROLLUP_KEY = ("granularity", "bucket_start", "id_sensor", "id_area")
+
+
+def aggregate_rollups(measurements):
+    """Aggregates measurement rows into per-bucket rollup rows.
+
+    ``measurements`` is an iterable of dicts or a DataFrame with id_sensor,
+    id_area, measurement and datetime. Rows without a measurement are skipped.
+    """
+    frame = pd.DataFrame(measurements, columns=["id_sensor", "id_area", "measurement", "datetime"])
+    frame = frame.dropna(subset=["measurement", "datetime"])
+    if frame.empty:
+        return []
+    frame["datetime"] = pd.to_datetime(frame["datetime"])
+    frame = frame.sort_values("datetime", kind="stable")
+
+    rollups = []
+    for granularity, freq in ROLLUP_GRANULARITIES.items():
+        grouped = frame.assign(bucket_start=frame["datetime"].dt.floor(freq)).groupby(
+            ["bucket_start", "id_sensor", "id_area"], sort=False
+        )
+        aggregated = grouped.agg(
+            min_value=("measurement", "min"),
+            max_value=("measurement", "max"),
+            sum_value=("measurement", "sum"),
+            count=("measurement", "count"),
+            last_value=("measurement", "last"),
+            last_datetime=("datetime", "last"),
+        ).reset_index()
+        aggregated["granularity"] = granularity
+        rollups.extend(aggregated.to_dict("records"))
+
+    for rollup in rollups:
+        rollup["bucket_start"] = rollup["bucket_start"].to_pydatetime()
+        rollup["last_datetime"] = rollup["last_datetime"].to_pydatetime()
+        rollup["id_sensor"] = int(rollup["id_sensor"])
+        rollup["id_area"] = int(rollup["id_area"])
+        rollup["count"] = int(rollup["count"])
+    rollups.sort(key=lambda rollup: tuple(rollup[column] for column in _ROLLUP_KEY))
+    return rollups
+
+
+def apply_rollups(db, measurements):
+    """Merges new measurements into the rollup table using the caller's session.
+
+    Existing buckets are updated in place (min, max, sum, count and last
+    value), so rollups stay correct when the same bucket is fed over several
+    batches. The caller is responsible for committing.
+    """
+    rollups = aggregate_rollups(measurements)
+    if not rollups:
+        return 0
+
+    dialect = db.get_bind().dialect.name
+    if dialect not in _UPSERT_INSERTS:
+        _merge_rollups(db, rollups)
+        return len(rollups)
+    table = SensorMeasurementRollup.__table__
+    statement = _UPSERT_INSERTS[dialect](table)
+    excluded = statement.excluded
+    statement = statement.on_conflict_do_update(
+        index_elements=[c.name for c in table.primary_key.columns],
+        set_={
+            "min_value": case(
+                (excluded.min_value < table.c.min_value, excluded.min_value),
+                else_=table.c.min_value,
+            ),
+            "max_value": case(
+                (excluded.max_value > table.c.max_value, excluded.max_value),
+                else_=table.c.max_value,
+            ),
+            "sum_value": table.c.sum_value + excluded.sum_value,
+            "count": table.c.count + excluded.count,
+            "last_value": case(
+                (excluded.last_datetime >= table.c.last_datetime, excluded.last_value),
+                else_=table.c.last_value,
+            ),
+            "last_datetime": case(
+                (excluded.last_datetime >= table.c.last_datetime, excluded.last_datetime),
+                else_=table.c.last_datetime,
+            ),
+        },
+    )
+    db.execute(statement, rollups)
+    return len(rollups)
+
+
+def _merge_rollups(db, rollups):
+    """Select-then-update/insert merge for dialects without an upsert construct."""
+    for rollup in rollups:
+        existing = db.get(
+            SensorMeasurementRollup,
+            {column: rollup[column] for column in _ROLLUP_KEY},
+            with_for_update=True,
+        )
+        if existing is None:
+            db.add(SensorMeasurementRollup(**rollup))
+            continue
+        existing.min_value = min(existing.min_value, rollup["min_value"])
+        existing.max_value = max(existing.max_value, rollup["max_value"])
+        existing.sum_value += rollup["sum_value"]
+        existing.count += rollup["count"]
+        if rollup["last_datetime"] >= existing.last_datetime:
+            existing.last_value = rollup["last_value"]
+            existing.last_datetime = rollup["last_datetime"]
+    db.flush()
+
+
+def _bucket_start(moment, granularity):
+    if granularity == "minute":
+        return moment.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def rebuild_rollup_buckets(db, keys):
+    """Recomputes the rollup buckets holding ``keys`` from the raw measurements, using the caller's session.
+
+    ``keys`` are (id_sensor, id_area, datetime) tuples. Min and max cannot
+    be undone incrementally, so after an update or delete every minute, hour
+    and day bucket of each key is aggregated again from Sensor_Measurement.
+    The caller is responsible for flushing its changes first and committing.
+    """
+    buckets = sorted(
+        {
+            (granularity, _bucket_start(moment, granularity), id_sensor, id_area)
+            for id_sensor, id_area, moment in keys
+            if moment is not None
+            for granularity in ROLLUP_BUCKETS
+        }
+    )
+    for granularity, bucket_start, id_sensor, id_area in buckets:
+        db.execute(
+            delete(SensorMeasurementRollup).where(
+                SensorMeasurementRollup.granularity == granularity,
+                SensorMeasurementRollup.bucket_start == bucket_start,
+                SensorMeasurementRollup.id_sensor == id_sensor,
+                SensorMeasurementRollup.id_area == id_area,
+            )
+        )
+        filters = (
+            SensorMeasurement.id_sensor == id_sensor,
+            SensorMeasurement.id_area == id_area,
+            SensorMeasurement.datetime >= bucket_start,
+            SensorMeasurement.datetime < bucket_start + ROLLUP_BUCKETS[granularity],
+            SensorMeasurement.measurement.is_not(None),
+        )
+        min_value, max_value, sum_value, count = db.execute(
+            select(
+                func.min(SensorMeasurement.measurement),
+                func.max(SensorMeasurement.measurement),
+                func.sum(SensorMeasurement.measurement),
+                func.count(SensorMeasurement.measurement),
+            ).where(*filters)
+        ).one()
+        if not count:
+            continue
+        last_value, last_datetime = db.execute(
+            select(SensorMeasurement.measurement, SensorMeasurement.datetime)
+            .where(*filters)
+            .order_by(SensorMeasurement.datetime.desc(), SensorMeasurement.id_measurement.desc())
+            .limit(1)
+        ).one()
+        db.execute(
+            insert(SensorMeasurementRollup).values(
+                granularity=granularity,
+                bucket_start=bucket_start,
+                id_sensor=id_sensor,
+                id_area=id_area,
+                min_value=min_value,
+                max_value=max_value,
+                sum_value=sum_value,
+                count=count,
+                last_value=last_value,
+                last_datetime=last_datetime,
+            )
+        )
+    return len(buckets)
+
+
+def update_rollups(measurements):
+    """Merges new measurements into the rollup table in its own transaction."""
+    with get_db() as db:
+        try:
+            count = apply_rollups(db, measurements)
+            db.commit()
+            return count
+        except SQLAlchemyError as e:
+            db.rollback()
+            raise Exception(f"Error updating SensorMeasurementRollup: {e}")
+
+
+def backfill_rollups(
+    start: datetime.datetime = None,
+    end: datetime.datetime = None,
+    batch_size: int = 10000,
+):
+    """Rebuilds the rollups from raw measurements between start and end.
+
+    The range is widened to whole days so every bucket it touches is rebuilt
+    from scratch. Without ``start`` it begins at the oldest raw measurement,
+    so rollups of data already removed by the retention job are kept.
+    Returns the number of measurements read.
+    """
+    if start is None:
+        with get_db() as db:
+            start = db.execute(select(func.min(SensorMeasurement.datetime))).scalar()
+        if start is None:
+            return 0
+    start = datetime.datetime.combine(start.date(), datetime.time())
+    if end is not None and end != datetime.datetime.combine(end.date(), datetime.time()):
+        end = datetime.datetime.combine(end.date() + datetime.timedelta(days=1), datetime.time())
+
+    query = (
+        select(
+            SensorMeasurement.id_sensor,
+            SensorMeasurement.id_area,
+            SensorMeasurement.measurement,
+            SensorMeasurement.datetime,
+        )
+        .where(SensorMeasurement.datetime >= start)
+        .order_by(SensorMeasurement.datetime, SensorMeasurement.id_measurement)
+    )
+    clear = delete(SensorMeasurementRollup).where(SensorMeasurementRollup.bucket_start >= start)
+    if end is not None:
+        query = query.where(SensorMeasurement.datetime < end)
+        clear = clear.where(SensorMeasurementRollup.bucket_start < end)
+
+    read = 0
+    with get_db() as db:
+        try:
+            db.execute(clear)
+            for chunk in db.execute(query.execution_options(yield_per=batch_size)).partitions():
+                apply_rollups(db, [row._asdict() for row in chunk])
+                read += len(chunk)
+            db.commit()
+            return read
+        except SQLAlchemyError as e:
+            db.rollback()
+            raise Exception(f"Error backfilling SensorMeasurementRollup: {e}")
+
+
+def get_rollups(
+    granularity: str,
+    start: datetime.datetime = None,
+    end: datetime.datetime = None,
+    id_sensor: int = None,
+    id_area: int = None,
+):
+    """Retrieves rollup rows of one granularity, oldest bucket first."""
+    with get_db() as db:
+        query = db.query(SensorMeasurementRollup).filter(
+            SensorMeasurementRollup.granularity == granularity
+        )
+        if start is not None:
+            query = query.filter(SensorMeasurementRollup.bucket_start >= start)
+        if end is not None:
+            query = query.filter(SensorMeasurementRollup.bucket_start < end)
+        if id_sensor is not None:
+            query = query.filter(SensorMeasurementRollup.id_sensor == id_sensor)
+        if id_area is not None:
+            query = query.filter(SensorMeasurementRollup.id_area == id_area)
+        return query.order_by(SensorMeasurementRollup.bucket_start).all()
+
+
+if __name__ == "__main__":
+    # Test the functions
+    read = backfill_rollups()
+    print(f"Rollups rebuilt from {read} measurements")
+
+    hourly_area_1 = get_rollups("hour", id_area=1)
+    print(f"Hourly rollups for Area 1: {hourly_area_1}")
@@ -15,6 +15,10 @@ class MLModelUpdate(TypedDict, total=False):
     precision: float
     recall: float
     f1_score: float
+    load_time_ms: float
+    memory_bytes: int
+    latency_ms: float
+    throughput: float
 
 
 def create_ml_model(
@@ -7,6 +7,7 @@ from sqlalchemy import (
     Boolean,
     Text,
     ForeignKey,
+    Index,
     TIMESTAMP,
 )
 from sqlalchemy.sql import func
@@ -57,11 +58,12 @@ class Sensor(Base):
     id_type = Column(Integer, ForeignKey("Sensor_Type.id_type"), nullable=False)
     id_area = Column(Integer, ForeignKey("Planting_Area.id_area"), nullable=False)
     sensor_name = Column(String, nullable=False)
+    channel = Column(String)  # MQTT topic the sensor reports on, e.g. 'chanel/c0'
     sensor_type = relationship("SensorType")
     planting_area = relationship("PlantingArea")
 
     def __repr__(self):
-        return f"<Sensor(id_sensor={self.id_sensor}, id_type={self.id_type}, id_area={self.id_area}, sensor_name={self.sensor_name})>"
+        return f"<Sensor(id_sensor={self.id_sensor}, id_type={self.id_type}, id_area={self.id_area}, sensor_name={self.sensor_name}, channel={self.channel})>"
 
 
 class SensorMeasurement(Base):
@@ -77,10 +79,48 @@ class SensorMeasurement(Base):
     area = relationship("PlantingArea")
     harvest = relationship("Harvest")
 
+    # Composite indexes for time-range and keyset-paginated queries
+    __table_args__ = (
+        Index("ix_sensor_measurement_datetime", "datetime", "id_measurement"),
+        Index("ix_sensor_measurement_sensor_datetime", "id_sensor", "datetime", "id_measurement"),
+        Index("ix_sensor_measurement_area_datetime", "id_area", "datetime", "id_measurement"),
+    )
+    # Matches the (id_measurement, datetime) primary key of the partitioned table
+    # (db/partitioning.py). Unpartitioned tables keep id_measurement alone as
+    # their key, so it still autoincrements on SQLite.
+    __mapper_args__ = {"primary_key": [id_measurement, datetime]}
+
     def __repr__(self):
         return f"<SensorMeasurement(id_measurement={self.id_measurement}, id_sensor={self.id_sensor}, id_area={self.id_area}, id_harvest={self.id_harvest}, measurement={self.measurement}, datetime={self.datetime}, environmental_conditions={self.environmental_conditions})>"
 
 
+class SensorMeasurementRollup(Base):
+    __tablename__ = "Sensor_Measurement_Rollup"
+    granularity = Column(String, primary_key=True)  # 'minute', 'hour' or 'day'
+    bucket_start = Column(TIMESTAMP, primary_key=True)
+    id_sensor = Column(Integer, ForeignKey("Sensor.id_sensor"), primary_key=True)
+    id_area = Column(Integer, ForeignKey("Planting_Area.id_area"), primary_key=True)
+    min_value = Column(Float)
+    max_value = Column(Float)
+    sum_value = Column(Float)
+    count = Column(Integer)
+    last_value = Column(Float)
+    last_datetime = Column(TIMESTAMP)
+    sensor = relationship("Sensor")
+    area = relationship("PlantingArea")
+
+    __table_args__ = (
+        Index("ix_sensor_measurement_rollup_area", "granularity", "id_area", "bucket_start"),
+    )
+
+    @property
+    def mean_value(self):
+        return self.sum_value / self.count if self.count else None
+
+    def __repr__(self):
+        return f"<SensorMeasurementRollup(granularity={self.granularity}, bucket_start={self.bucket_start}, id_sensor={self.id_sensor}, id_area={self.id_area}, min_value={self.min_value}, max_value={self.max_value}, mean_value={self.mean_value}, count={self.count}, last_value={self.last_value})>"
+
+
 class MLModel(Base):
     __tablename__ = "ML_Model"
     id_model = Column(Integer, primary_key=True, autoincrement=True)
@@ -93,9 +133,14 @@ class MLModel(Base):
     precision = Column(Float)
     recall = Column(Float)
     f1_score = Column(Float)
+    # Runtime cost measured by scripts/benchmark_models.py
+    load_time_ms = Column(Float)
+    memory_bytes = Column(Integer)
+    latency_ms = Column(Float)  # single-row predict
+    throughput = Column(Float)  # rows per second at the largest benchmarked batch
 
     def __repr__(self):
-        return f"<MLModel(id_model={self.id_model}, model_name={self.model_name}, model_type={self.model_type}, training_date={self.training_date}, model_parameters={self.model_parameters}, ml_library={self.ml_library}, accuracy={self.accuracy}, precision={self.precision}, recall={self.recall}, f1_score={self.f1_score})>"
+        return f"<MLModel(id_model={self.id_model}, model_name={self.model_name}, model_type={self.model_type}, training_date={self.training_date}, model_parameters={self.model_parameters}, ml_library={self.ml_library}, accuracy={self.accuracy}, precision={self.precision}, recall={self.recall}, f1_score={self.f1_score}, latency_ms={self.latency_ms}, throughput={self.throughput})>"
 
 
 class IrrigationRecommendation(Base):
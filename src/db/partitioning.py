@@ -0,0 +1,273 @@
+from sqlalchemy import delete, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from db.models import SensorMeasurement, SensorMeasurementRollup
+from db.database_session import get_db
+from db.measurement_rollup_crud import backfill_rollups
+import datetime
+import os
+import re
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Sensor_Measurement is range-partitioned by month on PostgreSQL. Rows outside
+# every monthly partition land in the default partition.
+MEASUREMENT_TABLE = SensorMeasurement.__tablename__
+DEFAULT_PARTITION = f"{MEASUREMENT_TABLE}_default"
+PARTITION_NAME_PATTERN = re.compile(rf"^{MEASUREMENT_TABLE}_(\d{{4}})_(\d{{2}})$")
+
+PARTITIONED_MEASUREMENT_DDL = f"""
+CREATE TABLE IF NOT EXISTS "{MEASUREMENT_TABLE}" (
+    id_measurement SERIAL,
+    id_sensor INTEGER NOT NULL REFERENCES "Sensor" (id_sensor),
+    id_area INTEGER NOT NULL REFERENCES "Planting_Area" (id_area),
+    id_harvest INTEGER REFERENCES "Harvest" (id_harvest),
+    measurement DOUBLE PRECISION,
+    datetime TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    environmental_conditions VARCHAR,
+    PRIMARY KEY (id_measurement, datetime)
+) PARTITION BY RANGE (datetime)
+"""
+
+MEASUREMENT_COLUMNS = [column.name for column in SensorMeasurement.__table__.columns]
+
+
+def _month_start(day):
+    return datetime.datetime(day.year, day.month, 1)
+
+
+def _add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime.datetime):
+    """Returns the name of the monthly partition holding ``month``."""
+    return f"{MEASUREMENT_TABLE}_{month.year:04d}_{month.month:02d}"
+
+
+def is_partitioned(db):
+    """Tells whether Sensor_Measurement is a partitioned table."""
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return bool(
+        db.execute(
+            text(
+                "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+                "WHERE c.relname = :name"
+            ),
+            {"name": MEASUREMENT_TABLE},
+        ).first()
+    )
+
+
+def create_partitioned_measurement_table(db):
+    """Creates Sensor_Measurement as a partitioned table on PostgreSQL.
+
+    Does nothing on other databases or if the table already exists, so an
+    existing unpartitioned table is left untouched.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    try:
+        db.execute(text(PARTITIONED_MEASUREMENT_DDL))
+        db.execute(
+            text(f'CREATE TABLE IF NOT EXISTS "{DEFAULT_PARTITION}" PARTITION OF "{MEASUREMENT_TABLE}" DEFAULT')
+        )
+        db.commit()
+        return True
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise Exception(f"Error creating partitioned {MEASUREMENT_TABLE}: {e}")
+
+
+def _create_partition(db, month):
+    """Creates the partition of a month, moving its rows out of the default partition first.
+
+    PostgreSQL refuses to create a partition for a range the default
+    partition already holds rows of, which happens when the job did not run
+    for longer than ``months_ahead``. Those rows are moved into a new table
+    that is then attached as the month's partition.
+    """
+    name = partition_name(month)
+    bounds = f"FROM ('{month:%Y-%m-%d}') TO ('{_add_months(month, 1):%Y-%m-%d}')"
+    if db.execute(text("SELECT to_regclass(:name)"), {"name": f'"{name}"'}).scalar() is not None:
+        return 0
+    in_range = f"datetime >= '{month:%Y-%m-%d}' AND datetime < '{_add_months(month, 1):%Y-%m-%d}'"
+    if db.execute(text(f'SELECT 1 FROM "{DEFAULT_PARTITION}" WHERE {in_range} LIMIT 1')).first() is None:
+        db.execute(text(f'CREATE TABLE "{name}" PARTITION OF "{MEASUREMENT_TABLE}" FOR VALUES {bounds}'))
+        return 0
+    db.execute(text(f'CREATE TABLE "{name}" (LIKE "{MEASUREMENT_TABLE}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    moved = db.execute(
+        text(
+            f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" WHERE {in_range} RETURNING *) '
+            f'INSERT INTO "{name}" SELECT * FROM moved'
+        )
+    ).rowcount
+    db.execute(text(f'ALTER TABLE "{MEASUREMENT_TABLE}" ATTACH PARTITION "{name}" FOR VALUES {bounds}'))
+    return moved
+
+
+def ensure_measurement_partitions(months_back: int = 1, months_ahead: int = 3, today=None):
+    """Creates the monthly partitions around today that do not exist yet.
+
+    Rows of those months already in the default partition are moved into
+    the new partitions.
+    """
+    current = _month_start(today or datetime.datetime.now())
+    created = []
+    with get_db() as db:
+        if not is_partitioned(db):
+            return created
+        try:
+            for offset in range(-months_back, months_ahead + 1):
+                month = _add_months(current, offset)
+                moved = _create_partition(db, month)
+                if moved:
+                    print(f"{moved} measurements of {month:%Y-%m} moved out of {DEFAULT_PARTITION}")
+                created.append(partition_name(month))
+            db.commit()
+            return created
+        except SQLAlchemyError as e:
+            db.rollback()
+            raise Exception(f"Error creating {MEASUREMENT_TABLE} partitions: {e}")
+
+
+def list_measurement_partitions():
+    """Returns (name, month) for every monthly partition, oldest first."""
+    with get_db() as db:
+        if not is_partitioned(db):
+            return []
+        names = db.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE parent.relname = :name"
+            ),
+            {"name": MEASUREMENT_TABLE},
+        ).scalars()
+        partitions = []
+        for name in names:
+            match = PARTITION_NAME_PATTERN.match(name)
+            if match:
+                partitions.append((name, datetime.datetime(int(match.group(1)), int(match.group(2)), 1)))
+        return sorted(partitions, key=lambda partition: partition[1])
+
+
+def export_measurements_to_parquet(start, end, path, batch_size: int = 50000):
+    """Streams measurements with start <= datetime < end into a Parquet file."""
+    query = (
+        select(*SensorMeasurement.__table__.columns)
+        .where(SensorMeasurement.datetime >= start, SensorMeasurement.datetime < end)
+        .order_by(SensorMeasurement.datetime, SensorMeasurement.id_measurement)
+        .execution_options(yield_per=batch_size)
+    )
+    schema = pa.schema(
+        [
+            ("id_measurement", pa.int64()),
+            ("id_sensor", pa.int64()),
+            ("id_area", pa.int64()),
+            ("id_harvest", pa.int64()),
+            ("measurement", pa.float64()),
+            ("datetime", pa.timestamp("us")),
+            ("environmental_conditions", pa.string()),
+        ]
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    written = 0
+    with get_db() as db, pq.ParquetWriter(path, schema) as writer:
+        for chunk in db.execute(query).partitions():
+            columns = list(zip(*chunk))
+            writer.write_table(pa.table(dict(zip(MEASUREMENT_COLUMNS, columns)), schema=schema))
+            written += len(chunk)
+    if not written:
+        os.remove(path)
+    return written
+
+
+def apply_retention(
+    keep_months: int = 6,
+    archive_dir: str = None,
+    downsample: bool = True,
+    today=None,
+    keep_minute_rollup_months: int = None,
+):
+    """Archives and removes measurements older than ``keep_months`` months.
+
+    Each expired month is optionally rebuilt into the rollup tables, exported
+    to ``archive_dir`` as Parquet, and then dropped: months with their own
+    partition are detached and dropped, other rows (on the default partition
+    or an unpartitioned table) are deleted. Minute rollups older than
+    ``keep_minute_rollup_months`` (``keep_months`` by default) are deleted
+    too; hour and day rollups are kept. Returns a list of
+    (month, rows archived) pairs.
+    """
+    current = _month_start(today or datetime.datetime.now())
+    cutoff = _add_months(current, -keep_months)
+
+    partitions = {month: name for name, month in list_measurement_partitions()}
+    months = {month for month in partitions if month < cutoff}
+    with get_db() as db:
+        oldest = db.execute(
+            select(SensorMeasurement.datetime).order_by(SensorMeasurement.datetime).limit(1)
+        ).scalar()
+    month = _month_start(oldest) if oldest is not None else cutoff
+    while month < cutoff:
+        months.add(month)
+        month = _add_months(month, 1)
+
+    archived = []
+    for month in sorted(months):
+        end = _add_months(month, 1)
+        if downsample:
+            backfill_rollups(month, end)
+        rows = 0
+        if archive_dir:
+            rows = export_measurements_to_parquet(
+                month, end, os.path.join(archive_dir, f"{partition_name(month)}.parquet")
+            )
+
+        with get_db() as db:
+            try:
+                if month in partitions:
+                    name = partitions[month]
+                    db.execute(text(f'ALTER TABLE "{MEASUREMENT_TABLE}" DETACH PARTITION "{name}"'))
+                    db.execute(text(f'DROP TABLE "{name}"'))
+                else:
+                    db.execute(
+                        delete(SensorMeasurement).where(
+                            SensorMeasurement.datetime >= month, SensorMeasurement.datetime < end
+                        )
+                    )
+                db.commit()
+            except SQLAlchemyError as e:
+                db.rollback()
+                raise Exception(f"Error dropping {MEASUREMENT_TABLE} data for {month:%Y-%m}: {e}")
+        archived.append((month, rows))
+
+    if keep_minute_rollup_months is None:
+        keep_minute_rollup_months = keep_months
+    minute_cutoff = _add_months(current, -keep_minute_rollup_months)
+    with get_db() as db:
+        try:
+            db.execute(
+                delete(SensorMeasurementRollup).where(
+                    SensorMeasurementRollup.granularity == "minute",
+                    SensorMeasurementRollup.bucket_start < minute_cutoff,
+                )
+            )
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            raise Exception(f"Error pruning minute rollups before {minute_cutoff:%Y-%m}: {e}")
+    return archived
+
+
+if __name__ == "__main__":
+    # Test the functions
+    created = ensure_measurement_partitions()
+    print(f"Ensured partitions: {created}")
+
+    partitions = list_measurement_partitions()
+    print(f"Partitions: {partitions}")
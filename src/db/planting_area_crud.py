@@ -2,6 +2,7 @@ from typing import TypedDict
 from sqlalchemy.exc import SQLAlchemyError
 from db.models import PlantingArea
 from db.database_session import get_db
+from db.sensor_index import invalidate_sensor_index
 import datetime
 
 
@@ -54,6 +55,7 @@ def update_planting_area(id_area: int, updates: PlantingAreaUpdate):
                 for key, value in updates.items():
                     setattr(area, key, value)
                 db.commit()
+                invalidate_sensor_index(db)
                 return area
             else:
                 return None
@@ -70,6 +72,7 @@ def delete_planting_area(id_area: int):
             if area:
                 db.delete(area)
                 db.commit()
+                invalidate_sensor_index(db)
                 return True
             else:
                 return False
@@ -1,24 +1,27 @@
 from typing import TypedDict
 from sqlalchemy.exc import SQLAlchemyError
-from db.models import Sensor
+from db.models import Sensor, SensorType
 from db.database_session import get_db
+from db.sensor_index import invalidate_sensor_index
 
 
 class SensorUpdate(TypedDict, total=False):
     id_type: int
     id_area: int
     sensor_name: str
+    channel: str
 
 
-def create_sensor(id_type: int, id_area: int, sensor_name: str):
+def create_sensor(id_type: int, id_area: int, sensor_name: str, channel: str = None):
     """Creates a new Sensor entry."""
     with get_db() as db:
         try:
             new_sensor = Sensor(
-                id_type=id_type, id_area=id_area, sensor_name=sensor_name
+                id_type=id_type, id_area=id_area, sensor_name=sensor_name, channel=channel
             )
             db.add(new_sensor)
             db.commit()
+            invalidate_sensor_index(db)
             db.refresh(new_sensor)
             return new_sensor
         except SQLAlchemyError as e:
@@ -50,6 +53,23 @@ def get_sensors_by_type(id_type: int):
         return db.query(Sensor).filter(Sensor.id_type == id_type).all()
 
 
+def get_sensors_by_channel(channel: str):
+    """Retrieves all sensors reporting on a specific MQTT channel."""
+    with get_db() as db:
+        return db.query(Sensor).filter(Sensor.channel == channel).all()
+
+
+def get_sensor_by_channel_and_type(channel: str, type_name: str):
+    """Retrieves the sensor of a given SensorType name on an MQTT channel."""
+    with get_db() as db:
+        return (
+            db.query(Sensor)
+            .join(SensorType)
+            .filter(Sensor.channel == channel, SensorType.name == type_name)
+            .first()
+        )
+
+
 def update_sensor(id_sensor: int, updates: SensorUpdate):
     """Updates a Sensor entry."""
     with get_db() as db:
@@ -59,6 +79,7 @@ def update_sensor(id_sensor: int, updates: SensorUpdate):
                 for key, value in updates.items():
                     setattr(sensor, key, value)
                 db.commit()
+                invalidate_sensor_index(db)
                 return sensor
             else:
                 return None
@@ -75,6 +96,7 @@ def delete_sensor(id_sensor: int):
             if sensor:
                 db.delete(sensor)
                 db.commit()
+                invalidate_sensor_index(db)
                 return True
             else:
                 return False
@@ -85,7 +107,9 @@ def delete_sensor(id_sensor: int):
 
 if __name__ == "__main__":
     # Test the functions
-    new_sensor = create_sensor(id_type=1, id_area=1, sensor_name="Sensor K - Test")
+    new_sensor = create_sensor(
+        id_type=1, id_area=1, sensor_name="Sensor K - Test", channel="chanel/c15"
+    )
     print(f"Created Sensor: {new_sensor}")
 
     retrieved_sensor = get_sensor(new_sensor.id_sensor)
@@ -100,6 +124,9 @@ if __name__ == "__main__":
     sensors_type_1 = get_sensors_by_type(1)
     print(f"Sensors of Type 1: {sensors_type_1}")
 
+    sensors_channel_15 = get_sensors_by_channel("chanel/c15")
+    print(f"Sensors on chanel/c15: {sensors_channel_15}")
+
     updated_sensor = update_sensor(
         new_sensor.id_sensor, {"sensor_name": "Updated Sensor Name"}
     )
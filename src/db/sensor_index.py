@@ -0,0 +1,177 @@
+from typing import NamedTuple
+from sqlalchemy import select
+from db.models import PlantingArea, Sensor, SensorType
+from db.database_session import after_commit, get_db
+import os
+import threading
+import time
+
+SENSOR_INDEX_TTL_SECONDS = float(os.getenv("SENSOR_INDEX_TTL_SECONDS", "300"))
+# Wait before a failed background reload is tried again
+SENSOR_INDEX_RETRY_SECONDS = 5
+
+
+class SensorEntry(NamedTuple):
+    id_sensor: int
+    id_area: int
+    id_type: int
+    type_name: str
+    area_name: str
+    channel: str
+
+
+class SensorIndex:
+    """In-process lookup index of the sensor registry.
+
+    The Sensor, SensorType and PlantingArea tables are read with a single
+    query and kept in dicts keyed by channel and sensor type, so resolving a
+    reading is a dict lookup. The index reloads itself after ``ttl`` seconds
+    or on the next lookup after ``invalidate()`` is called. Only the first
+    load runs on the caller's thread; later reloads run on a background
+    thread while lookups keep answering from the previous registry, so the
+    MQTT network thread never waits for the database.
+    """
+
+    def __init__(self, ttl: float = SENSOR_INDEX_TTL_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._generation = 0  # bumped by invalidate(), so a load that overlaps it is not taken as fresh
+        self._ready = False
+        self._refreshing = threading.Lock()  # held while a background reload runs
+        self._retry_at = 0.0
+        self._by_channel_type = {}
+        self._by_channel = {}
+        self._by_type = {}
+        self._by_area = {}
+
+    def load(self):
+        """Reads the sensor registry from the database."""
+        generation = self._generation
+        query = (
+            select(
+                Sensor.id_sensor,
+                Sensor.id_area,
+                Sensor.id_type,
+                SensorType.name,
+                PlantingArea.area_name,
+                Sensor.channel,
+            )
+            .join(SensorType, Sensor.id_type == SensorType.id_type)
+            .join(PlantingArea, Sensor.id_area == PlantingArea.id_area)
+        )
+        with get_db() as db:
+            entries = [SensorEntry(*row) for row in db.execute(query)]
+
+        by_channel_type = {}
+        by_channel = {}
+        by_type = {}
+        by_area = {}
+        for entry in entries:
+            if entry.channel is not None:
+                by_channel_type.setdefault((entry.channel, entry.type_name), entry)
+                by_channel.setdefault(entry.channel, []).append(entry)
+            by_type.setdefault(entry.type_name, []).append(entry)
+            by_area.setdefault(entry.id_area, []).append(entry)
+
+        # Swap the dicts in one go so lookups never see a half-built index
+        self._by_channel_type, self._by_channel, self._by_type, self._by_area = (
+            by_channel_type,
+            by_channel,
+            by_type,
+            by_area,
+        )
+        self._ready = True
+        self._loaded_at = time.monotonic()
+        if self._generation != generation:
+            # invalidate() ran while the query was in flight, so these rows may already be outdated
+            self._loaded_at = None
+
+    def invalidate(self):
+        """Marks the index as stale so the next lookup reloads it."""
+        self._generation += 1
+        self._loaded_at = None
+
+    def _is_stale(self):
+        loaded_at = self._loaded_at
+        return loaded_at is None or time.monotonic() - loaded_at >= self.ttl
+
+    def _ensure_fresh(self):
+        if not self._is_stale():
+            return
+        if self._ready:
+            self._refresh_in_background()
+            return
+        with self._lock:
+            if self._is_stale():
+                self.load()
+
+    def _refresh_in_background(self):
+        if time.monotonic() < self._retry_at or not self._refreshing.acquire(blocking=False):
+            return
+        threading.Thread(target=self._refresh, name="sensor-index-refresh", daemon=True).start()
+
+    def _refresh(self):
+        try:
+            with self._lock:
+                if self._is_stale():
+                    self.load()
+        except Exception as e:
+            self._retry_at = time.monotonic() + SENSOR_INDEX_RETRY_SECONDS
+            print(f"Error reloading the sensor index: {e}")
+        finally:
+            self._refreshing.release()
+
+    def get(self, channel: str, type_name: str):
+        """Returns the SensorEntry for a channel/SensorType pair, or None."""
+        self._ensure_fresh()
+        return self._by_channel_type.get((channel, type_name))
+
+    def resolve(self, channel: str, type_name: str):
+        """Returns (id_sensor, id_area) for a channel/SensorType pair, or None."""
+        entry = self.get(channel, type_name)
+        if entry is None:
+            return None
+        return entry.id_sensor, entry.id_area
+
+    def sensors_by_channel(self, channel: str):
+        """Returns every SensorEntry reporting on a channel."""
+        self._ensure_fresh()
+        return self._by_channel.get(channel, [])
+
+    def sensors_by_type(self, type_name: str):
+        """Returns every SensorEntry of a SensorType name."""
+        self._ensure_fresh()
+        return self._by_type.get(type_name, [])
+
+    def sensors_by_area(self, id_area: int):
+        """Returns every SensorEntry installed in an area."""
+        self._ensure_fresh()
+        return self._by_area.get(id_area, [])
+
+    def area_for_channel(self, channel: str):
+        """Returns the id_area a channel belongs to, or None."""
+        sensors = self.sensors_by_channel(channel)
+        return sensors[0].id_area if sensors else None
+
+
+sensor_index = SensorIndex()
+
+
+def invalidate_sensor_index(db=None):
+    """Drops the cached registry after a Sensor is created, updated or deleted.
+
+    With ``db`` the index is only invalidated once that session's transaction
+    is really committed, so a transaction() block that rolls back leaves it alone.
+    """
+    if db is None:
+        sensor_index.invalidate()
+    else:
+        after_commit(db, sensor_index.invalidate)
+
+
+if __name__ == "__main__":
+    # Test the functions
+    print(f"Sensors on chanel/c0: {sensor_index.sensors_by_channel('chanel/c0')}")
+    print(f"K sensor on chanel/c0: {sensor_index.resolve('chanel/c0', 'K')}")
+    print(f"Area for chanel/c1: {sensor_index.area_for_channel('chanel/c1')}")
@@ -1,8 +1,39 @@
 from typing import TypedDict
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import and_, insert, or_, select
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
 from db.models import SensorMeasurement
 from db.database_session import get_db
+from db.measurement_rollup_crud import apply_rollups, rebuild_rollup_buckets
+import csv
 import datetime
+import io
+import math
+import time
+
+import pandas as pd
+
+# Payload fields published by the ESP32 and the SensorType name they map to
+MQTT_FIELD_SENSOR_TYPES = {
+    "potassiumPercent": "K",
+    "phosphorusPercent": "P",
+    "temperature": "Temperature",
+    "humidity": "Humidity",
+}
+
+MEASUREMENT_COLUMNS = (
+    "id_sensor",
+    "id_area",
+    "id_harvest",
+    "measurement",
+    "datetime",
+    "environmental_conditions",
+)
+
+
+class BulkIngestResult(TypedDict):
+    written: int
+    rejected: int
+    retried: int
 
 
 class SensorMeasurementUpdate(TypedDict, total=False):
@@ -40,6 +71,17 @@ def create_sensor_measurement(
                 environmental_conditions=environmental_conditions,
             )
             db.add(new_measurement)
+            apply_rollups(
+                db,
+                [
+                    {
+                        "id_sensor": id_sensor,
+                        "id_area": id_area,
+                        "measurement": measurement,
+                        "datetime": measurement_datetime,
+                    }
+                ],
+            )
             db.commit()
             db.refresh(new_measurement)
             return new_measurement
@@ -48,10 +90,167 @@ def create_sensor_measurement(
             raise Exception(f"Error creating SensorMeasurement: {e}")
 
 
+def _to_datetime(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return datetime.datetime.now()
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, datetime.datetime):
+        return value
+    return pd.Timestamp(value).to_pydatetime()
+
+
+def _expand_mqtt_reading(reading, resolve_sensor):
+    """Turns one ``mqtt_data`` row into one measurement row per known field."""
+    rows = []
+    rejected = 0
+    for field, type_name in MQTT_FIELD_SENSOR_TYPES.items():
+        # A field sent as null counts the same as a field left out
+        if reading.get(field) is None:
+            continue
+        ids = resolve_sensor(reading["chanel"], type_name) if resolve_sensor else None
+        if ids is None:
+            rejected += 1
+            continue
+        id_sensor, id_area = ids
+        rows.append(
+            {
+                "id_sensor": id_sensor,
+                "id_area": id_area,
+                "measurement": reading[field],
+                "datetime": reading.get("timestamp"),
+            }
+        )
+    return rows, rejected
+
+
+def _validate_row(row):
+    """Returns a clean measurement row, or None if it cannot be stored."""
+    try:
+        id_sensor = int(row["id_sensor"])
+        id_area = int(row["id_area"])
+        measurement = row.get("measurement")
+        if measurement is not None:
+            measurement = float(measurement)
+            if not math.isfinite(measurement):
+                return None
+        id_harvest = row.get("id_harvest")
+        if id_harvest is not None and not pd.isna(id_harvest):
+            id_harvest = int(id_harvest)
+        else:
+            id_harvest = None
+        return {
+            "id_sensor": id_sensor,
+            "id_area": id_area,
+            "id_harvest": id_harvest,
+            "measurement": measurement,
+            "datetime": _to_datetime(row.get("datetime")),
+            "environmental_conditions": row.get("environmental_conditions"),
+        }
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _prepare_rows(readings, resolve_sensor):
+    if isinstance(readings, pd.DataFrame):
+        readings = readings.to_dict("records")
+
+    rows = []
+    rejected = 0
+    for reading in readings:
+        if "chanel" in reading and "id_sensor" not in reading:
+            expanded, expanded_rejected = _expand_mqtt_reading(reading, resolve_sensor)
+            rejected += expanded_rejected
+        else:
+            expanded = [reading]
+        for row in expanded:
+            clean = _validate_row(row)
+            if clean is None:
+                rejected += 1
+            else:
+                rows.append(clean)
+    return rows, rejected
+
+
+def _is_transient_error(error):
+    """Tells whether a failed bulk write is worth retrying."""
+    if isinstance(error, OperationalError):
+        return True
+    # SQLSTATE classes 08 (connection exception) and 40 (transaction rollback)
+    pgcode = getattr(getattr(error, "orig", error), "pgcode", None) or ""
+    return pgcode[:2] in ("08", "40")
+
+
+def _copy_rows(db, rows):
+    """Streams rows into Sensor_Measurement with PostgreSQL COPY."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(
+            ["" if row[column] is None else row[column] for column in MEASUREMENT_COLUMNS]
+        )
+    buffer.seek(0)
+
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f'COPY "{SensorMeasurement.__tablename__}" ({", ".join(MEASUREMENT_COLUMNS)}) '
+            "FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def bulk_create_sensor_measurements(
+    readings,
+    resolve_sensor=None,
+    method: str = "executemany",
+    max_retries: int = 3,
+    with_rollups: bool = True,
+) -> BulkIngestResult:
+    """Creates many SensorMeasurement entries in a single transaction.
+
+    ``readings`` is an iterable of measurement dicts or a DataFrame with the
+    same columns. Rows shaped like the ``mqtt_data`` frame (a ``chanel`` column
+    plus payload fields) are expanded into one measurement per field in
+    ``MQTT_FIELD_SENSOR_TYPES``; ``resolve_sensor(chanel, type_name)`` must
+    return ``(id_sensor, id_area)`` for them, or None to reject the field.
+    ``method`` is ``"executemany"`` or ``"copy"`` (PostgreSQL only). Transient
+    connection errors are retried up to ``max_retries`` times. Unless
+    ``with_rollups`` is False the rollup table is updated in the same
+    transaction.
+    """
+    rows, rejected = _prepare_rows(readings, resolve_sensor)
+    result = BulkIngestResult(written=0, rejected=rejected, retried=0)
+    if not rows:
+        return result
+
+    with get_db() as db:
+        use_copy = method == "copy" and db.get_bind().dialect.name == "postgresql"
+        for attempt in range(max_retries + 1):
+            try:
+                if use_copy:
+                    _copy_rows(db, rows)
+                else:
+                    db.execute(insert(SensorMeasurement), rows)
+                if with_rollups:
+                    apply_rollups(db, rows)
+                db.commit()
+                result["written"] = len(rows)
+                return result
+            except Exception as e:
+                db.rollback()
+                if not _is_transient_error(e) or attempt == max_retries:
+                    raise Exception(f"Error bulk creating SensorMeasurements: {e}")
+                result["retried"] += len(rows)
+                time.sleep(0.5 * 2**attempt)
+
+
 def get_sensor_measurement(id_measurement: int):
     """Retrieves a SensorMeasurement entry by ID."""
     with get_db() as db:
-        return db.query(SensorMeasurement).get(id_measurement)
+        return db.scalars(select(SensorMeasurement).where(SensorMeasurement.id_measurement == id_measurement)).first()
 
 
 def get_all_sensor_measurements():
@@ -80,14 +279,109 @@ def get_sensor_measurements_by_area(id_area: int):
         )
 
 
+def _measurement_filters(start, end, id_sensor, id_area):
+    filters = []
+    if start is not None:
+        filters.append(SensorMeasurement.datetime >= start)
+    if end is not None:
+        filters.append(SensorMeasurement.datetime < end)
+    if id_sensor is not None:
+        filters.append(SensorMeasurement.id_sensor == id_sensor)
+    if id_area is not None:
+        filters.append(SensorMeasurement.id_area == id_area)
+    return filters
+
+
+def get_sensor_measurements_in_range(
+    start: datetime.datetime,
+    end: datetime.datetime,
+    id_sensor: int = None,
+    id_area: int = None,
+    limit: int = None,
+):
+    """Retrieves measurements with start <= datetime < end, oldest first."""
+    with get_db() as db:
+        query = (
+            select(SensorMeasurement)
+            .where(*_measurement_filters(start, end, id_sensor, id_area))
+            .order_by(SensorMeasurement.datetime, SensorMeasurement.id_measurement)
+            .limit(limit)
+        )
+        return db.scalars(query).all()
+
+
+def get_sensor_measurements_page(
+    after: tuple = None,
+    limit: int = 1000,
+    start: datetime.datetime = None,
+    end: datetime.datetime = None,
+    id_sensor: int = None,
+    id_area: int = None,
+):
+    """Retrieves one page of measurements ordered by (datetime, id_measurement).
+
+    ``after`` is the cursor returned with the previous page. Returns the page
+    and the cursor for the next one, which is None once there are no more rows.
+    """
+    filters = _measurement_filters(start, end, id_sensor, id_area)
+    if after is not None:
+        after_datetime, after_id = after
+        filters.append(
+            or_(
+                SensorMeasurement.datetime > after_datetime,
+                and_(
+                    SensorMeasurement.datetime == after_datetime,
+                    SensorMeasurement.id_measurement > after_id,
+                ),
+            )
+        )
+    with get_db() as db:
+        query = (
+            select(SensorMeasurement)
+            .where(*filters)
+            .order_by(SensorMeasurement.datetime, SensorMeasurement.id_measurement)
+            .limit(limit)
+        )
+        page = db.scalars(query).all()
+    next_cursor = (page[-1].datetime, page[-1].id_measurement) if len(page) == limit else None
+    return page, next_cursor
+
+
+def iter_sensor_measurements(
+    start: datetime.datetime = None,
+    end: datetime.datetime = None,
+    id_sensor: int = None,
+    id_area: int = None,
+    batch_size: int = 1000,
+):
+    """Streams measurements oldest first, loading ``batch_size`` rows at a time."""
+    with get_db() as db:
+        query = (
+            select(SensorMeasurement)
+            .where(*_measurement_filters(start, end, id_sensor, id_area))
+            .order_by(SensorMeasurement.datetime, SensorMeasurement.id_measurement)
+            .execution_options(yield_per=batch_size)
+        )
+        for measurement in db.scalars(query):
+            yield measurement
+
+
+def _rollup_key(measurement):
+    return (measurement.id_sensor, measurement.id_area, measurement.datetime)
+
+
 def update_sensor_measurement(id_measurement: int, updates: SensorMeasurementUpdate):
-    """Updates a SensorMeasurement entry."""
+    """Updates a SensorMeasurement entry and the rollup buckets it leaves and enters."""
     with get_db() as db:
         try:
-            measurement = db.query(SensorMeasurement).get(id_measurement)
+            measurement = db.scalars(select(SensorMeasurement).where(SensorMeasurement.id_measurement == id_measurement)).first()
             if measurement:
+                old_key, old_value = _rollup_key(measurement), measurement.measurement
                 for key, value in updates.items():
                     setattr(measurement, key, value)
+                if (_rollup_key(measurement), measurement.measurement) != (old_key, old_value):
+                    db.flush()
+                    rebuild_rollup_buckets(db, {old_key, _rollup_key(measurement)})
                 db.commit()
                 return measurement
             else:
@@ -98,12 +392,15 @@ def update_sensor_measurement(id_measurement: int, updates: SensorMeasurementUpd
 
 
 def delete_sensor_measurement(id_measurement: int):
-    """Deletes a SensorMeasurement entry."""
+    """Deletes a SensorMeasurement entry and recomputes the rollup buckets that counted it."""
     with get_db() as db:
         try:
-            measurement = db.query(SensorMeasurement).get(id_measurement)
+            measurement = db.scalars(select(SensorMeasurement).where(SensorMeasurement.id_measurement == id_measurement)).first()
             if measurement:
+                key = _rollup_key(measurement)
                 db.delete(measurement)
+                db.flush()
+                rebuild_rollup_buckets(db, [key])
                 db.commit()
                 return True
             else:
@@ -124,6 +421,14 @@ if __name__ == "__main__":
     )
     print(f"Created Sensor Measurement: {new_measurement}")
 
+    bulk_result = bulk_create_sensor_measurements(
+        [
+            {"id_sensor": 1, "id_area": 1, "measurement": 10.0 + i}
+            for i in range(100)
+        ]
+    )
+    print(f"Bulk created Sensor Measurements: {bulk_result}")
+
     retrieved_measurement = get_sensor_measurement(new_measurement.id_measurement)
     print(f"Retrieved Sensor Measurement: {retrieved_measurement}")
 
@@ -136,6 +441,20 @@ if __name__ == "__main__":
     measurements_area_1 = get_sensor_measurements_by_area(1)
     print(f"Measurements for Area 1: {measurements_area_1}")
 
+    last_day = datetime.datetime.now() - datetime.timedelta(days=1)
+    recent_measurements = get_sensor_measurements_in_range(last_day, datetime.datetime.now())
+    print(f"Measurements in the last day: {len(recent_measurements)}")
+
+    page, cursor = get_sensor_measurements_page(limit=10, id_area=1)
+    while page:
+        print(f"Page of {len(page)} measurements for Area 1, next cursor: {cursor}")
+        if cursor is None:
+            break
+        page, cursor = get_sensor_measurements_page(after=cursor, limit=10, id_area=1)
+
+    streamed = sum(1 for _ in iter_sensor_measurements(id_sensor=1, batch_size=50))
+    print(f"Streamed measurements for Sensor 1: {streamed}")
+
     updated_measurement = update_sensor_measurement(
         new_measurement.id_measurement, {"measurement": 11.0}
     )
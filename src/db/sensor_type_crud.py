@@ -2,6 +2,7 @@ from typing import TypedDict
 from sqlalchemy.exc import SQLAlchemyError
 from db.models import SensorType
 from db.database_session import get_db
+from db.sensor_index import invalidate_sensor_index
 
 
 class SensorTypeUpdate(TypedDict, total=False):
@@ -50,6 +51,7 @@ def update_sensor_type(id_type: int, updates: SensorTypeUpdate):
                 for key, value in updates.items():
                     setattr(sensor_type, key, value)
                 db.commit()
+                invalidate_sensor_index(db)
                 return sensor_type
             else:
                 return None
@@ -66,6 +68,7 @@ def delete_sensor_type(id_type: int):
             if sensor_type:
                 db.delete(sensor_type)
                 db.commit()
+                invalidate_sensor_index(db)
                 return True
             else:
                 return False
@@ -0,0 +1,263 @@
+import paho.mqtt.client as mqtt
+import math
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from mqtt_utilis import MQTT_BROKER, MQTT_PORT, MQTT_USER, MQTT_PASSWORD
+from anomaly_filter import AnomalyFilter, as_payload
+from payload_decoder import PayloadDecoder
+from db.sensor_index import sensor_index
+from db.sensor_measurement_crud import MQTT_FIELD_SENSOR_TYPES
+
+# Feature store settings
+FEATURE_WINDOW_SIZE = int(os.getenv("FEATURE_WINDOW_SIZE", "60"))
+FEATURE_SNAPSHOT_PATH = os.getenv("FEATURE_SNAPSHOT_PATH", "feature_store.npz")
+INITIAL_SLOTS = 64
+
+# Running sums kept per slot: values, squares, times, squared times and time * value
+_SUMS = ["x", "xx", "t", "tt", "tx"]
+
+
+class FeatureStore:
+    """Rolling-window aggregates per (area, sensor type), updated in O(1).
+
+    Each (id_area, type_name) pair owns a slot in preallocated NumPy arrays:
+    a ring buffer with the last ``window`` values and their times, plus
+    running sums that give the window mean, standard deviation and trend
+    without rescanning it. The sums are recomputed from the ring every time
+    it wraps, so floating-point drift never builds up.
+    """
+
+    def __init__(self, window=FEATURE_WINDOW_SIZE, capacity=INITIAL_SLOTS, epoch=None):
+        self.window = window
+        # Times are stored relative to the epoch to keep the squared sums small
+        self.epoch = time.time() if epoch is None else epoch
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._area_slots = {}
+        self._keys = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self._values = np.zeros((capacity, self.window))
+        self._times = np.zeros((capacity, self.window))
+        self._position = np.zeros(capacity, dtype=np.int64)
+        self._count = np.zeros(capacity, dtype=np.int64)
+        self._sums = np.zeros((capacity, len(_SUMS)))
+        self._last = np.full(capacity, np.nan)
+        self._last_time = np.full(capacity, np.nan)
+
+    def _grow(self):
+        capacity = len(self._position)
+        old = (self._values, self._times, self._position, self._count, self._sums, self._last, self._last_time)
+        self._allocate(capacity * 2)
+        for new, current in zip(
+            (self._values, self._times, self._position, self._count, self._sums, self._last, self._last_time), old
+        ):
+            new[:capacity] = current
+
+    def _slot(self, id_area, type_name):
+        key = (int(id_area), type_name)
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = len(self._keys)
+            if slot == len(self._position):
+                self._grow()
+            self._register(key, slot)
+        return slot
+
+    def _register(self, key, slot):
+        self._slots[key] = slot
+        self._area_slots.setdefault(key[0], []).append((key[1], slot))
+        if slot == len(self._keys):
+            self._keys.append(key)
+
+    def update(self, id_area, type_name, value, timestamp=None):
+        """Adds a reading of one sensor type in an area to its window. NaN and infinite values are ignored."""
+        x = float(value)
+        if not math.isfinite(x):
+            return
+        t = (time.time() if timestamp is None else timestamp) - self.epoch
+        with self._lock:
+            slot = self._slot(id_area, type_name)
+            position = self._position[slot]
+            sums = self._sums[slot]
+            if self._count[slot] == self.window:
+                # Drop the value being overwritten from the running sums
+                old_x = self._values[slot, position]
+                old_t = self._times[slot, position]
+                sums -= (old_x, old_x * old_x, old_t, old_t * old_t, old_t * old_x)
+            else:
+                self._count[slot] += 1
+            self._values[slot, position] = x
+            self._times[slot, position] = t
+            sums += (x, x * x, t, t * t, t * x)
+            self._last[slot] = x
+            self._last_time[slot] = t
+
+            position += 1
+            if position == self.window:
+                position = 0
+                self._recompute(slot)
+            self._position[slot] = position
+
+    def _recompute(self, slot):
+        x = self._values[slot, : self._count[slot]]
+        t = self._times[slot, : self._count[slot]]
+        self._sums[slot] = (x.sum(), (x * x).sum(), t.sum(), (t * t).sum(), (t * x).sum())
+
+    def update_reading(self, chanel, reading, timestamp=None):
+        """Adds every known field of an MQTT payload; returns the id_area it belongs to, or None."""
+        id_area = None
+        for field, type_name in MQTT_FIELD_SENSOR_TYPES.items():
+            value = reading.get(field)
+            if value is None:
+                continue
+            entry = sensor_index.get(chanel, type_name)
+            if entry is None:
+                continue
+            id_area = entry.id_area
+            self.update(id_area, type_name, value, timestamp)
+        return id_area
+
+    def aggregates(self):
+        """Returns one row per (id_area, type_name) with last, mean, std, trend per hour and count."""
+        with self._lock:
+            slots = len(self._keys)
+            keys = list(self._keys)
+            count = self._count[:slots].astype(float)
+            sx, sxx, st, stt, stx = self._sums[:slots].T.copy()
+            last = self._last[:slots].copy()
+            last_time = self._last_time[:slots].copy()
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = sx / count
+            std = np.sqrt(np.maximum(sxx / count - mean * mean, 0.0))
+            slope = (count * stx - st * sx) / (count * stt - st * st)
+        frame = pd.DataFrame(
+            {
+                "id_area": [key[0] for key in keys],
+                "type_name": [key[1] for key in keys],
+                "last": last,
+                "mean": mean,
+                "std": std,
+                "trend_per_hour": np.where(np.isfinite(slope), slope * 3600, np.nan),
+                "count": count.astype(int),
+                "last_datetime": pd.to_datetime(last_time + self.epoch, unit="s"),
+            }
+        )
+        return frame
+
+    def readings(self, stat="mean", id_areas=None):
+        """Returns a frame indexed by id_area with one column per SensorType holding ``stat``.
+
+        The shape matches readings_from_measurements, so it can feed
+        build_feature_matrix directly.
+        """
+        frame = self.aggregates()
+        if id_areas is not None:
+            frame = frame[frame["id_area"].isin(list(id_areas))]
+        if frame.empty:
+            return pd.DataFrame(index=pd.Index([], name="id_area"))
+        return frame.pivot_table(index="id_area", columns="type_name", values=stat, aggfunc="mean")
+
+    def area_values(self, id_area, stat="mean"):
+        """Returns {type_name: value} for one area, with ``stat`` "mean" or "last"."""
+        with self._lock:
+            values = {}
+            for type_name, slot in self._area_slots.get(id_area, []):
+                count = self._count[slot]
+                if count:
+                    values[type_name] = float(self._last[slot] if stat == "last" else self._sums[slot, 0] / count)
+            return values
+
+    def snapshot(self, path=FEATURE_SNAPSHOT_PATH):
+        """Writes the store to an .npz file; the file is replaced atomically."""
+        with self._lock:
+            slots = len(self._keys)
+            arrays = {
+                "window": np.array(self.window),
+                "epoch": np.array(self.epoch),
+                "key_area": np.array([key[0] for key in self._keys], dtype=np.int64),
+                "key_type": np.array([key[1] for key in self._keys], dtype=np.str_),
+                "values": self._values[:slots].copy(),
+                "times": self._times[:slots].copy(),
+                "position": self._position[:slots].copy(),
+                "count": self._count[:slots].copy(),
+                "sums": self._sums[:slots].copy(),
+                "last": self._last[:slots].copy(),
+                "last_time": self._last_time[:slots].copy(),
+            }
+        temporary = f"{path}.tmp.npz"
+        np.savez(temporary, **arrays)
+        os.replace(temporary, path)
+
+    @classmethod
+    def restore(cls, path=FEATURE_SNAPSHOT_PATH, window=FEATURE_WINDOW_SIZE):
+        """Loads a store written by ``snapshot``, or returns an empty one if there is none."""
+        if not os.path.exists(path):
+            return cls(window=window)
+        with np.load(path) as data:
+            if int(data["window"]) != window:
+                print(f"Feature snapshot {path} uses another window size; starting empty")
+                return cls(window=window)
+            slots = len(data["key_area"])
+            store = cls(window=window, capacity=max(INITIAL_SLOTS, slots), epoch=float(data["epoch"]))
+            store._values[:slots] = data["values"]
+            store._times[:slots] = data["times"]
+            store._position[:slots] = data["position"]
+            store._count[:slots] = data["count"]
+            store._sums[:slots] = data["sums"]
+            store._last[:slots] = data["last"]
+            store._last_time[:slots] = data["last_time"]
+            keys = [(int(area), str(type_name)) for area, type_name in zip(data["key_area"], data["key_type"])]
+        for slot, key in enumerate(keys):
+            store._register(key, slot)
+        return store
+
+
+def start_feature_subscriber(store, broker=MQTT_BROKER, port=MQTT_PORT, username=MQTT_USER, password=MQTT_PASSWORD):
+    """Subscribes to chanel/# and adds every decoded reading to ``store``, without its spikes."""
+    decoder = PayloadDecoder()
+    anomaly_filter = AnomalyFilter()
+
+    def on_connect(client, userdata, flags, rc):
+        if rc == 0:
+            client.subscribe("chanel/#")
+        else:
+            print(f"Failed to connect, return code {rc}")
+
+    def on_message(client, userdata, msg):
+        reading = decoder.decode(msg.topic, msg.payload)
+        if reading is not None:
+            reading = anomaly_filter.filter(reading)
+        if reading is not None:
+            store.update_reading(msg.topic, as_payload(reading))
+
+    client = mqtt.Client()
+    client.username_pw_set(username, password)
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.tls_set()
+    client.connect(broker, port, 60)
+    client.loop_start()
+    return client
+
+
+if __name__ == "__main__":
+    # Test the functions
+    store = FeatureStore(window=5)
+    for minute in range(8):
+        store.update(1, "K", 100 + minute * 10, timestamp=store.epoch + minute * 60)
+        store.update(1, "Humidity", 50)
+    print(f"Aggregates:\n{store.aggregates()}")
+    print(f"Readings:\n{store.readings()}")
+
+    store.snapshot("feature_store_test.npz")
+    restored = FeatureStore.restore("feature_store_test.npz", window=5)
+    print(f"Restored readings:\n{restored.readings()}")
+    os.remove("feature_store_test.npz")
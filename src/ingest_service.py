@@ -0,0 +1,186 @@
+import paho.mqtt.client as mqtt
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from mqtt_utilis import MQTT_BROKER, MQTT_PORT, MQTT_USER, MQTT_PASSWORD
+from anomaly_filter import AnomalyFilter, as_payload
+from payload_decoder import PayloadDecoder
+from db.sensor_index import sensor_index
+from db.sensor_measurement_crud import bulk_create_sensor_measurements
+
+# Ingestion settings
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "10000"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+# Longest time the MQTT network thread may wait for room in the queue
+INGEST_PUT_TIMEOUT_SECONDS = float(os.getenv("INGEST_PUT_TIMEOUT_SECONDS", "0.05"))
+# Reading.timestamp counts local wall-clock nanoseconds from this naive epoch
+_EPOCH = datetime(1970, 1, 1)
+
+
+class MeasurementIngestService:
+    """Feeds MQTT readings into Sensor_Measurement through a bounded queue.
+
+    The MQTT callback only decodes the payload, removes spikes with an
+    ``AnomalyFilter`` and enqueues the reading; a pool of
+    writer threads drains the queue in batches and persists them with
+    ``bulk_create_sensor_measurements``. When the queue is full the callback
+    waits at most ``put_timeout`` seconds and then drops the reading, so a
+    slow database never stalls the paho network loop.
+    """
+
+    def __init__(
+        self,
+        workers=INGEST_WORKERS,
+        queue_size=INGEST_QUEUE_SIZE,
+        batch_size=INGEST_BATCH_SIZE,
+        put_timeout=INGEST_PUT_TIMEOUT_SECONDS,
+        resolve_sensor=sensor_index.resolve,
+    ):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.put_timeout = put_timeout
+        self.resolve_sensor = resolve_sensor
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self.decoder = PayloadDecoder()
+        self.anomaly_filter = AnomalyFilter()
+
+        # Counters
+        self.enqueued = 0
+        self.dropped = 0
+        self.invalid = 0
+        self.written = 0
+        self.rejected = 0
+        self.retried = 0
+        self.failed_batches = 0
+
+    def submit(self, topic, data):
+        """Queues one decoded payload; returns False if it had to be dropped."""
+        reading = dict(data)
+        reading["chanel"] = topic
+        reading.setdefault("timestamp", datetime.now())
+        try:
+            self._queue.put(reading, timeout=self.put_timeout)
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            return False
+        with self._stats_lock:
+            self.enqueued += 1
+        return True
+
+    def on_message(self, client, userdata, msg):
+        reading = self.decoder.decode(msg.topic, msg.payload)
+        if reading is None:
+            with self._stats_lock:
+                self.invalid += 1
+            return
+        reading = self.anomaly_filter.filter(reading)
+        if reading is not None:
+            payload = as_payload(reading)
+            # Keep the arrival time stamped by the decoder, not the time the queue had room
+            payload["timestamp"] = _EPOCH + timedelta(microseconds=reading.timestamp // 1000)
+            self.submit(msg.topic, payload)
+
+    def on_connect(self, client, userdata, flags, rc):
+        if rc == 0:
+            print(f"Connected successfully to MQTT broker with result code {rc}")
+            client.subscribe("chanel/#")
+        else:
+            print(f"Failed to connect, return code {rc}")
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        try:
+            result = bulk_create_sensor_measurements(batch, resolve_sensor=self.resolve_sensor)
+        except Exception as e:
+            print(f"Error writing {len(batch)} readings: {e}")
+            with self._stats_lock:
+                self.failed_batches += 1
+        else:
+            with self._stats_lock:
+                self.written += result["written"]
+                self.rejected += result["rejected"]
+                self.retried += result["retried"]
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _run_worker(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def start(self):
+        """Starts the writer threads."""
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run_worker, name=f"ingest-writer-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Waits for queued readings to be written and stops the writers."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def stats(self):
+        """Returns a snapshot of the ingestion counters."""
+        with self._stats_lock:
+            return {
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "invalid": self.invalid,
+                "queued": self._queue.qsize(),
+                "written": self.written,
+                "rejected": self.rejected,
+                "retried": self.retried,
+                "failed_batches": self.failed_batches,
+                "anomalies": self.anomaly_filter.stats(),
+            }
+
+
+if __name__ == "__main__":
+    service = MeasurementIngestService()
+    service.start()
+
+    client = mqtt.Client()
+    client.username_pw_set(MQTT_USER, MQTT_PASSWORD)
+    client.on_connect = service.on_connect
+    client.on_message = service.on_message
+    client.tls_set()
+    client.connect(MQTT_BROKER, MQTT_PORT, 60)
+    client.loop_start()
+
+    print("Serviço de ingestão iniciado. Aguardando mensagens MQTT...")
+    try:
+        while True:
+            time.sleep(30)
+            print(f"Ingestão: {service.stats()}")
+    except KeyboardInterrupt:
+        print("\nServiço encerrado pelo usuário.")
+        client.loop_stop()
+        client.disconnect()
+        service.stop()
+        print(f"Ingestão: {service.stats()}")
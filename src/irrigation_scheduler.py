@@ -0,0 +1,342 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from mqtt_utilis import get_publisher
+from db.irrigation_history_crud import create_irrigation_history
+from db.sensor_index import sensor_index
+
+# Scheduler settings
+MAX_VALVES_PER_AREA = int(os.getenv("IRRIGATION_MAX_VALVES_PER_AREA", "2"))
+# Water delivered by one open valve, used to estimate Irrigation_History.water_volume
+VALVE_FLOW_LITERS_PER_MINUTE = float(os.getenv("IRRIGATION_VALVE_FLOW_LPM", "0"))
+# Threads sending valve commands, so a slow broker round-trip never holds up the timer
+VALVE_COMMAND_WORKERS = int(os.getenv("IRRIGATION_VALVE_COMMAND_WORKERS", "4"))
+# Delay before an event is retried while a command of the same job is still in flight
+COMMAND_BUSY_RETRY_SECONDS = 0.2
+STOP_RETRY_SECONDS = 5
+STOP_MAX_RETRIES = 12
+ALERT_LOG_SIZE = 100
+
+_START = "start"
+_STOP = "stop"
+
+
+@dataclass
+class IrrigationJob:
+    id_area: int
+    channels: list
+    start: datetime
+    duration: timedelta
+    id_recommendation: int = None
+    job_id: int = 0
+    status: str = "pending"  # pending, waiting, running, done, cancelled or failed
+    started_at: datetime = None
+    ended_at: datetime = None
+    stop_attempts: int = field(default=0, repr=False)
+    in_flight: bool = field(default=False, repr=False)
+
+
+def channels_for_area(id_area):
+    """Returns the valve channels (c0, c1, ...) of the sensors installed in an area."""
+    channels = []
+    for entry in sensor_index.sensors_by_area(id_area):
+        if entry.channel is None:
+            continue
+        channel = entry.channel.split("/")[-1]
+        if channel not in channels:
+            channels.append(channel)
+    return channels
+
+
+class IrrigationScheduler:
+    """Runs timed irrigation jobs from a single timer thread.
+
+    Start and stop events live in a priority queue ordered by due time, so
+    thousands of jobs cost one thread and a heap entry each. The timer
+    thread only dispatches: valve commands, which wait for the broker's
+    acknowledgement, run on a small pool, one command per job at a time. At most
+    ``max_valves_per_area`` valves are open per area at once; jobs that would
+    exceed it wait in a per-area FIFO until valves close. Every completed run
+    is written to Irrigation_History. A job whose valves do not confirm
+    closing is marked failed and raises an alert; its valves stay counted as
+    open until someone checks them and calls ``acknowledge``.
+    """
+
+    def __init__(
+        self,
+        publisher=None,
+        max_valves_per_area=MAX_VALVES_PER_AREA,
+        flow_lpm=VALVE_FLOW_LITERS_PER_MINUTE,
+        command_workers=VALVE_COMMAND_WORKERS,
+    ):
+        self.publisher = publisher
+        self.max_valves_per_area = max_valves_per_area
+        self.flow_lpm = flow_lpm
+
+        self._condition = threading.Condition()
+        self._events = []
+        self._sequence = itertools.count()
+        self._job_ids = itertools.count(1)
+        self._jobs = {}
+        self._waiting = {}
+        self._open_valves = {}
+        self._unconfirmed = {}  # job_id -> failed job whose valves may still be open
+        self._stop = False
+        self._thread = None
+        # History writes run off the timer thread so a slow commit never delays a valve
+        self._history_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="irrigation-history")
+        self._valve_commands = ThreadPoolExecutor(max_workers=command_workers, thread_name_prefix="irrigation-valves")
+        # Jobs whose valves may have been left open
+        self.alerts = deque(maxlen=ALERT_LOG_SIZE)
+
+        # Counters
+        self.completed = 0
+        self.failed = 0
+
+    def _push(self, when, action, job):
+        heapq.heappush(self._events, (when.timestamp(), next(self._sequence), action, job))
+        self._condition.notify()
+
+    def schedule(self, id_area, channels, start, duration, id_recommendation=None):
+        """Schedules a run of ``channels`` in an area; returns its IrrigationJobs.
+
+        Channels beyond ``max_valves_per_area`` go into further jobs of at most
+        that many valves, which wait in the area's FIFO and run one after the
+        other for the full duration.
+        """
+        channels = list(channels)
+        if not channels:
+            raise ValueError("An irrigation job needs at least one channel")
+        size = self.max_valves_per_area
+        jobs = []
+        with self._condition:
+            for offset in range(0, len(channels), size):
+                job = IrrigationJob(
+                    id_area=id_area,
+                    channels=channels[offset : offset + size],
+                    start=start,
+                    duration=duration,
+                    id_recommendation=id_recommendation,
+                    job_id=next(self._job_ids),
+                )
+                self._jobs[job.job_id] = job
+                self._push(start, _START, job)
+                jobs.append(job)
+        return jobs
+
+    def cancel(self, job_id):
+        """Cancels a pending job, or closes the valves of a running one now."""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in ("done", "cancelled", "failed"):
+                return False
+            if job.status == "running":
+                self._push(datetime.now(), _STOP, job)
+            else:
+                job.status = "cancelled"
+                self._jobs.pop(job_id, None)
+            return True
+
+    def _get_publisher(self):
+        if self.publisher is None:
+            self.publisher = get_publisher()
+        return self.publisher
+
+    def _start_job(self, job):
+        """Opens the valves of a job if the area has room; called with the lock held."""
+        opened = self._open_valves.get(job.id_area, 0)
+        if opened + len(job.channels) > self.max_valves_per_area:
+            if job.status != "waiting":
+                job.status = "waiting"
+                self._waiting.setdefault(job.id_area, deque()).append(job)
+            return False
+        self._open_valves[job.id_area] = opened + len(job.channels)
+        job.status = "running"
+        return True
+
+    def _run_start(self, job):
+        try:
+            results = self._get_publisher().set_valves(job.channels, True)
+        except Exception as e:
+            print(f"Erro ao abrir as válvulas da irrigação {job.job_id}: {e}")
+            with self._condition:
+                if job.status != "running":
+                    return
+                job.status = "failed"
+                self.failed += 1
+                self._release(job)
+            # The command may have reached the board before the error: try to close what it opened
+            try:
+                self._get_publisher().set_valves(job.channels, False)
+            except Exception as e:
+                print(f"Erro ao fechar as válvulas da irrigação {job.job_id}: {e}")
+            return
+        with self._condition:
+            if job.status != "running":
+                return
+            job.started_at = datetime.now()
+            if not any(results.values()):
+                # Nothing opened: free the slot and give up on the job
+                job.status = "failed"
+                self.failed += 1
+                self._release(job)
+                return
+            self._push(job.started_at + job.duration, _STOP, job)
+
+    def _run_stop(self, job):
+        try:
+            results = self._get_publisher().set_valves(job.channels, False)
+        except Exception as e:
+            # Same as a close that was not confirmed: retry, then alert
+            print(f"Erro ao fechar as válvulas da irrigação {job.job_id}: {e}")
+            results = {channel: False for channel in job.channels}
+        with self._condition:
+            if job.status != "running":
+                return
+            if not all(results.values()):
+                if job.stop_attempts < STOP_MAX_RETRIES:
+                    job.stop_attempts += 1
+                    self._push(datetime.now() + timedelta(seconds=STOP_RETRY_SECONDS), _STOP, job)
+                    return
+                # The valves may still be open: keep them counted and raise an alert instead of a history record
+                job.ended_at = datetime.now()
+                job.status = "failed"
+                self.failed += 1
+                self._jobs.pop(job.job_id, None)
+                self._unconfirmed[job.job_id] = job
+                self._alert(job, [channel for channel, closed in results.items() if not closed])
+                return
+            job.ended_at = datetime.now()
+            if job.started_at is None:
+                job.started_at = job.ended_at
+            job.status = "done"
+            self.completed += 1
+            self._release(job)
+        self._history_writer.submit(self._record_history, job)
+
+    def _alert(self, job, channels):
+        """Records a job whose valves did not confirm closing; called with the lock held."""
+        self.alerts.append((job.ended_at, job.id_area, job.job_id, channels))
+        print(
+            f"ALERTA: válvulas {', '.join(channels)} da área {job.id_area} (tarefa {job.job_id}) "
+            f"não confirmaram o fechamento após {job.stop_attempts + 1} tentativas"
+        )
+
+    def acknowledge(self, job_id):
+        """Frees the valves of a failed job once they were checked and closed by hand.
+
+        Returns False when the job is not waiting for an acknowledgement.
+        """
+        with self._condition:
+            job = self._unconfirmed.pop(job_id, None)
+            if job is None:
+                return False
+            self._release(job)
+            return True
+
+    def _release(self, job):
+        """Frees a job's valves and starts the jobs waiting for them; called with the lock held."""
+        self._jobs.pop(job.job_id, None)
+        self._open_valves[job.id_area] -= len(job.channels)
+        waiting = self._waiting.get(job.id_area)
+        while waiting:
+            head = waiting[0]
+            if head.status != "waiting":
+                # Cancelled while it was waiting
+                waiting.popleft()
+                continue
+            if not self._start_job(head):
+                break
+            waiting.popleft()
+            self._push(datetime.now(), _START, head)
+
+    def _record_history(self, job):
+        minutes = (job.ended_at - job.started_at).total_seconds() / 60
+        water_volume = self.flow_lpm * minutes * len(job.channels) if self.flow_lpm else None
+        try:
+            create_irrigation_history(
+                id_area=job.id_area,
+                id_recommendation=job.id_recommendation,
+                start_time=job.started_at.strftime("%Y-%m-%d %H:%M:%S"),
+                end_time=job.ended_at.strftime("%Y-%m-%d %H:%M:%S"),
+                water_volume=water_volume,
+            )
+        except Exception as e:
+            print(f"Erro ao gravar histórico da irrigação {job.job_id}: {e}")
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stop and (not self._events or self._events[0][0] > time.time()):
+                    timeout = self._events[0][0] - time.time() if self._events else None
+                    self._condition.wait(timeout)
+                if self._stop:
+                    return
+                _, _, action, job = heapq.heappop(self._events)
+                if job.status in ("cancelled", "failed", "done"):
+                    continue
+                if job.in_flight:
+                    # A stop requested while the previous command is still being sent
+                    self._push(datetime.now() + timedelta(seconds=COMMAND_BUSY_RETRY_SECONDS), action, job)
+                    continue
+                if action == _START and job.status != "running" and not self._start_job(job):
+                    # Waiting for a valve in the area to close
+                    continue
+                job.in_flight = True
+            try:
+                self._valve_commands.submit(self._send_command, action, job)
+            except RuntimeError:
+                # The interpreter is shutting down
+                return
+
+    def _send_command(self, action, job):
+        try:
+            if action == _START:
+                self._run_start(job)
+            else:
+                self._run_stop(job)
+        except Exception as e:
+            print(f"Erro na irrigação {job.job_id}: {e}")
+        finally:
+            with self._condition:
+                job.in_flight = False
+
+    def start(self):
+        """Starts the timer thread."""
+        if self._thread is None:
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="irrigation-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops the timer thread; valves still open stay open."""
+        with self._condition:
+            self._stop = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._valve_commands.shutdown(wait=True)
+        self._history_writer.shutdown(wait=True)
+
+    def stats(self):
+        """Returns the number of jobs in each state."""
+        with self._condition:
+            statuses = [job.status for job in self._jobs.values()]
+            return {
+                "pending": statuses.count("pending"),
+                "waiting": statuses.count("waiting"),
+                "running": statuses.count("running"),
+                "completed": self.completed,
+                "failed": self.failed,
+                "alerts": len(self.alerts),
+                "unconfirmed": list(self._unconfirmed),
+                "open_valves": dict(self._open_valves),
+            }
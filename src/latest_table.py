@@ -0,0 +1,160 @@
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Column -> dtype of the latest-reading table; payload fields outside it are ignored
+LATEST_SCHEMA = {
+    "chanel": object,
+    "potassiumPercent": np.float64,
+    "phosphorusPercent": np.float64,
+    "temperature": np.float64,
+    "humidity": np.float64,
+    "irrigation": object,
+    "state": object,
+    "timestamp": "datetime64[ns]",
+}
+INITIAL_CAPACITY = 16
+
+
+class LatestTable:
+    """Latest reading per channel in preallocated NumPy columns.
+
+    Every channel owns a row slot found through a topic -> slot dict, and an
+    update writes the new values into that row in place, so a message costs
+    O(1) and allocates nothing once the channel has been seen. ``frame()``
+    and ``to_arrow()`` expose the columns without copying them.
+    """
+
+    def __init__(self, schema=LATEST_SCHEMA, capacity=INITIAL_CAPACITY):
+        self.schema = dict(schema)
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._size = 0
+        self._columns = {name: self._empty(dtype, capacity) for name, dtype in self.schema.items()}
+        self._float_columns = [name for name, dtype in self.schema.items() if dtype is np.float64]
+
+    @staticmethod
+    def _empty(dtype, capacity):
+        if dtype is np.float64:
+            return np.full(capacity, np.nan)
+        if dtype == "datetime64[ns]":
+            return np.full(capacity, np.datetime64("NaT"), dtype=dtype)
+        return np.full(capacity, None, dtype=object)
+
+    def _grow(self):
+        capacity = len(self._columns["chanel"])
+        for name, column in self._columns.items():
+            grown = self._empty(self.schema[name], capacity * 2)
+            grown[:capacity] = column
+            self._columns[name] = grown
+
+    def _slot(self, topic):
+        slot = self._slots.get(topic)
+        if slot is None:
+            slot = self._size
+            if slot == len(self._columns["chanel"]):
+                self._grow()
+            self._slots[topic] = slot
+            self._columns["chanel"][slot] = topic
+            self._size += 1
+        return slot
+
+    def _write(self, topic, reading):
+        slot = self._slot(topic)
+        columns = self._columns
+        for name in self._float_columns:
+            value = reading.get(name)
+            try:
+                columns[name][slot] = np.nan if value is None else value
+            except (TypeError, ValueError):
+                columns[name][slot] = np.nan
+        for name, dtype in self.schema.items():
+            if dtype is object and name != "chanel":
+                columns[name][slot] = reading.get(name)
+        columns["timestamp"][slot] = np.datetime64(reading.get("timestamp") or datetime.now(), "ns")
+
+    def update(self, topic, reading):
+        """Stores a reading as the latest of its channel."""
+        with self._lock:
+            self._write(topic, reading)
+
+    def update_many(self, readings):
+        """Stores a batch of readings that carry their topic in ``chanel``."""
+        with self._lock:
+            for reading in readings:
+                self._write(reading["chanel"], reading)
+
+    def update_records(self, records):
+        """Stores a record_log record array, e.g. a packed batch of decoded readings.
+
+        Values are written column by column; when a channel appears more
+        than once the last record wins.
+        """
+        topics = np.char.decode(np.asarray(records["chanel"]), "utf-8")
+        with self._lock:
+            slots = np.fromiter((self._slot(topic) for topic in topics), dtype=np.intp, count=len(topics))
+            columns = self._columns
+            for name in self._float_columns:
+                if name in records.dtype.names:
+                    columns[name][slots] = records[name]
+            for name, dtype in self.schema.items():
+                if dtype is object and name not in ("chanel", "state"):
+                    columns[name][slots] = None
+            state = np.asarray(records["state"])
+            columns["state"][slots] = np.where(state == 1, "ON", np.where(state == 0, "OFF", None))
+            columns["timestamp"][slots] = np.asarray(records["timestamp"]).view("datetime64[ns]")
+
+    def load_frame(self, frame):
+        """Fills the table from a DataFrame with a ``chanel`` column (e.g. the CSV snapshot)."""
+        frame = frame.drop_duplicates(subset="chanel", keep="last")
+        if "timestamp" in frame.columns:
+            frame = frame.assign(timestamp=pd.to_datetime(frame["timestamp"], errors="coerce"))
+        records = frame.astype(object).where(frame.notna(), None).to_dict("records")
+        self.update_many(records)
+
+    def get(self, topic):
+        """Returns the latest reading of a channel as a dict, or None."""
+        with self._lock:
+            slot = self._slots.get(topic)
+            if slot is None:
+                return None
+            return {name: column[slot] for name, column in self._columns.items()}
+
+    def frame(self):
+        """Returns a DataFrame view over the columns, without copying them.
+
+        The view follows later updates of channels already in it; call
+        ``.copy()`` on it to keep a stable snapshot.
+        """
+        with self._lock:
+            size = self._size
+            columns = {name: column[:size] for name, column in self._columns.items()}
+        return pd.DataFrame(columns, copy=False)
+
+    def to_arrow(self):
+        """Returns the table as a pyarrow Table; numeric columns are not copied."""
+        with self._lock:
+            size = self._size
+            columns = {name: column[:size] for name, column in self._columns.items()}
+        return pa.table(
+            {
+                name: pa.array(column, from_pandas=True) if column.dtype == object else pa.array(column)
+                for name, column in columns.items()
+            }
+        )
+
+    def __len__(self):
+        return self._size
+
+
+if __name__ == "__main__":
+    # Test the functions
+    table = LatestTable()
+    table.update("chanel/c0", {"potassiumPercent": 40, "phosphorusPercent": 55, "temperature": 24.5, "humidity": 60, "state": "ON"})
+    table.update("chanel/c1", {"potassiumPercent": 35, "humidity": 58})
+    table.update("chanel/c0", {"potassiumPercent": 42, "phosphorusPercent": 50, "temperature": 24.7, "humidity": 61, "state": "OFF"})
+    print(f"Latest readings:\n{table.frame()}")
+    print(f"Arrow view:\n{table.to_arrow()}")
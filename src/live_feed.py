@@ -0,0 +1,142 @@
+import paho.mqtt.client as mqtt
+import threading
+import time
+
+from mqtt_utilis import MQTT_BROKER, MQTT_PORT, MQTT_USER, MQTT_PASSWORD
+from anomaly_filter import AnomalyFilter
+from payload_decoder import PayloadDecoder, Reading
+from record_log import MQTT_LOG_DIR, MergedIndexReader
+
+# How often the log index is checked for new readings
+SNAPSHOT_POLL_SECONDS = 0.2
+
+
+class LiveFeed:
+    """In-process publish/subscribe store of the latest reading per channel.
+
+    Every publish bumps a global version number and stamps the channel with
+    it, so a reader that remembers the last version it saw can fetch only the
+    channels that changed since then, or block until something changes.
+    Readings are payload_decoder.Reading tuples, whichever source they come
+    from; record_log.to_records packs a list of them in one call.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._latest = {}
+        self._versions = {}
+        self.version = 0
+
+    def publish(self, channel, reading):
+        """Stores the latest reading of a channel and wakes up waiting readers."""
+        with self._condition:
+            self.version += 1
+            self._latest[channel] = reading
+            self._versions[channel] = self.version
+            self._condition.notify_all()
+
+    def publish_many(self, readings):
+        """Stores several (channel, reading) pairs with a single wake-up."""
+        with self._condition:
+            for channel, reading in readings:
+                self.version += 1
+                self._latest[channel] = reading
+                self._versions[channel] = self.version
+            self._condition.notify_all()
+
+    def publish_records(self, records):
+        """Stores the rows of a record_log record array as Reading tuples."""
+        self.publish_many(
+            (reading.chanel, reading)
+            for reading in (Reading(chanel.decode(), *values) for chanel, *values in records.tolist())
+        )
+
+    def changes_since(self, version):
+        """Returns the current version and the readings of channels updated after ``version``."""
+        with self._condition:
+            changed = {
+                channel: self._latest[channel]
+                for channel, channel_version in self._versions.items()
+                if channel_version > version
+            }
+            return self.version, changed
+
+    def wait_for_changes(self, version, timeout=None):
+        """Blocks until the feed moves past ``version``; returns False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(lambda: self.version > version, timeout)
+
+    def snapshot(self):
+        """Returns the current version and the latest reading of every channel."""
+        return self.changes_since(0)
+
+
+def start_feed_subscriber(feed, broker=MQTT_BROKER, port=MQTT_PORT, username=MQTT_USER, password=MQTT_PASSWORD):
+    """Subscribes to chanel/# and publishes every decoded reading into ``feed``.
+
+    Payloads go through the same schema check and spike filter as the
+    ingester, so malformed messages are counted and dropped, not published.
+    """
+    decoder = PayloadDecoder()
+    anomaly_filter = AnomalyFilter()
+
+    def on_connect(client, userdata, flags, rc):
+        if rc == 0:
+            client.subscribe("chanel/#")
+        else:
+            print(f"Failed to connect, return code {rc}")
+
+    def on_message(client, userdata, msg):
+        reading = decoder.decode(msg.topic, msg.payload)
+        if reading is not None:
+            reading = anomaly_filter.filter(reading)
+        if reading is not None:
+            feed.publish(msg.topic, reading)
+
+    client = mqtt.Client()
+    client.username_pw_set(username, password)
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.tls_set()
+    client.connect(broker, port, 60)
+    client.loop_start()
+    return client
+
+
+def start_snapshot_follower(feed, directory=MQTT_LOG_DIR, interval=SNAPSHOT_POLL_SECONDS):
+    """Publishes the readings the ingester (or its shards) write to the log index into ``feed``.
+
+    A daemon thread checks the index sequence number every ``interval``
+    seconds and copies the slots only when it moved; channels whose
+    timestamp did not change are not republished. The index is read without
+    locks, so the ingester never waits for the dashboard. Errors are logged
+    and the next poll tries again, so the thread never dies.
+    """
+    reader = MergedIndexReader(directory)
+
+    def follow():
+        version = None
+        seen = {}
+        last_error = None
+        while True:
+            try:
+                current = reader.version()
+                result = reader.read() if current is not None and current != version else None
+                if result is not None:
+                    version, records = result
+                    fresh = [seen.get(chanel) != t for chanel, t in zip(records["chanel"], records["timestamp"])]
+                    changed = records[fresh]
+                    if len(changed):
+                        seen.update(zip(changed["chanel"], changed["timestamp"]))
+                        feed.publish_records(changed)
+                last_error = None
+            except Exception as e:
+                # Print a failure once, not on every poll while it lasts
+                if repr(e) != last_error:
+                    print(f"Snapshot follower error: {e}")
+                    last_error = repr(e)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=follow, name="snapshot-follower", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,172 @@
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from db.ml_model_crud import get_all_ml_models, get_ml_model
+
+# Folder holding the pickled classifiers written by scripts/train_model.ipynb
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+# Model loaded when the registry starts and used when no model is requested
+DEFAULT_MODEL = os.getenv("ML_DEFAULT_MODEL", "Neural Network")
+# Memory budget of the loaded models, estimated from the size of their pickles
+MODEL_CACHE_MAX_BYTES = int(os.getenv("ML_MODEL_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+def artifact_name(model_name: str):
+    """Returns the pickle file name of a model, as saved by save_trained_model."""
+    return f"{model_name.replace(' ', '_').lower()}_model.pkl"
+
+
+class ModelRegistry:
+    """Lazily loaded, size-bounded cache of the trained classifiers.
+
+    ``get`` accepts an MLModel row, its id_model or its model_name. Each
+    pickle is read once and kept in an LRU cache; when the loaded models
+    exceed ``max_bytes`` the least recently used ones are dropped. Concurrent
+    requests for a model that is still loading wait for the same load.
+    """
+
+    def __init__(self, models_dir=MODELS_DIR, max_bytes=MODEL_CACHE_MAX_BYTES, default_model=DEFAULT_MODEL):
+        self.models_dir = models_dir
+        self.max_bytes = max_bytes
+        self.default_model = default_model
+
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # model_name -> (model, size in bytes)
+        self._loading = {}  # model_name -> lock held while the pickle is read
+        self._names = {}  # id_model -> model_name, so ids resolve without a query
+        self._bytes = 0
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    def _model_name(self, model):
+        if model is None:
+            return self.default_model
+        if isinstance(model, str):
+            return model
+        if isinstance(model, int):
+            name = self._names.get(model)
+            if name is None:
+                row = get_ml_model(model)
+                if row is None:
+                    raise KeyError(f"MLModel {model} not found")
+                name = self._names[model] = row.model_name
+            return name
+        self._names[model.id_model] = model.model_name
+        return model.model_name
+
+    def artifact_path(self, model):
+        """Returns the path of the pickle behind a model."""
+        return os.path.join(self.models_dir, artifact_name(self._model_name(model)))
+
+    def available(self):
+        """Returns the MLModel rows whose pickle exists in the models folder."""
+        return [row for row in get_all_ml_models() if os.path.exists(self.artifact_path(row))]
+
+    def get(self, model=None):
+        """Returns the loaded classifier of a model, reading its pickle on first use."""
+        name = self._model_name(model)
+        with self._lock:
+            cached = self._cache.get(name)
+            if cached is not None:
+                self._cache.move_to_end(name)
+                self.hits += 1
+                return cached[0]
+            # The lock is kept for the registry's lifetime, so every loader of a name waits on the same one
+            load_lock = self._loading.setdefault(name, threading.Lock())
+
+        with load_lock:
+            # Another thread may have finished loading it while we waited
+            with self._lock:
+                cached = self._cache.get(name)
+                if cached is not None:
+                    self._cache.move_to_end(name)
+                    self.hits += 1
+                    return cached[0]
+                self.misses += 1
+
+            path = os.path.join(self.models_dir, artifact_name(name))
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No artifact for model '{name}': {path}")
+            started = time.perf_counter()
+            with open(path, "rb") as file:
+                classifier = pickle.load(file)
+            elapsed = time.perf_counter() - started
+            size = os.path.getsize(path)
+
+            with self._lock:
+                self.load_seconds += elapsed
+                self._cache[name] = (classifier, size)
+                self._bytes += size
+                self._evict()
+            return classifier
+
+    def _evict(self):
+        # Keep the model just loaded even if it alone exceeds the budget
+        while self._bytes > self.max_bytes and len(self._cache) > 1:
+            _, (_, size) = self._cache.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def warm(self, models=None):
+        """Loads the given models, or the default one, ahead of the first request."""
+        for model in models or [self.default_model]:
+            self.get(model)
+
+    def warm_in_background(self, models=None):
+        """Starts ``warm`` on a daemon thread so startup is not blocked."""
+        thread = threading.Thread(target=self._warm_quietly, args=(models,), name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def _warm_quietly(self, models):
+        try:
+            self.warm(models)
+        except Exception as e:
+            print(f"Error warming ML models: {e}")
+
+    def evict(self, model=None):
+        """Drops a model from the cache, or every model when none is given."""
+        with self._lock:
+            names = [self._model_name(model)] if model is not None else list(self._cache)
+            for name in names:
+                cached = self._cache.pop(name, None)
+                if cached is not None:
+                    self._bytes -= cached[1]
+
+    def stats(self):
+        """Returns the cache counters and the models currently loaded."""
+        with self._lock:
+            return {
+                "loaded": list(self._cache),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "load_ms": round(self.load_seconds * 1000, 2),
+            }
+
+
+model_registry = ModelRegistry()
+
+
+def get_model(model=None):
+    """Returns a loaded classifier from the shared registry."""
+    return model_registry.get(model)
+
+
+if __name__ == "__main__":
+    # Test the functions
+    model_registry.warm()
+    print(f"Default model: {get_model()}")
+
+    for row in model_registry.available():
+        print(f"{row.model_name}: {get_model(row)}")
+    print(f"Registry stats: {model_registry.stats()}")
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import deque
+
+
+class MessageBuffer:
+    """In-memory ring buffer that flushes MQTT messages in batches.
+
+    Messages are appended by the MQTT network thread and handed to
+    ``flush_fn`` by a background thread once ``max_batch`` messages are
+    pending or ``flush_interval`` seconds have passed, whichever comes first.
+    When the buffer is full the oldest pending message is discarded. A batch
+    whose flush fails goes back to the front of the buffer and is retried
+    with the next flush.
+    """
+
+    def __init__(self, flush_fn, max_batch=256, flush_interval=2.0, capacity=10000):
+        self.flush_fn = flush_fn
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.capacity = capacity
+
+        self._buffer = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._flush_requested = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Counters
+        self.received = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self.total_flush_latency = 0.0
+
+    def append(self, item):
+        """Adds a message to the buffer without blocking on I/O."""
+        with self._lock:
+            if len(self._buffer) == self.capacity:
+                self.dropped += 1
+            self._buffer.append(item)
+            self.received += 1
+            backlog = len(self._buffer)
+        if backlog >= self.max_batch:
+            self._flush_requested.set()
+
+    def backlog(self):
+        """Returns the number of messages waiting to be flushed."""
+        with self._lock:
+            return len(self._buffer)
+
+    def flush(self):
+        """Drains the buffer and hands the pending messages to ``flush_fn``."""
+        with self._lock:
+            batch = list(self._buffer)
+            self._buffer.clear()
+        if not batch:
+            return 0
+
+        start = time.perf_counter()
+        try:
+            self.flush_fn(batch)
+        except Exception as e:
+            print(f"Erro ao gravar lote de {len(batch)} mensagens: {e}")
+            with self._lock:
+                self.failed_flushes += 1
+                self._record_latency(time.perf_counter() - start)
+                # Put the batch back ahead of the newer messages, dropping the oldest if it no longer fits
+                overflow = len(batch) + len(self._buffer) - self.capacity
+                if overflow > 0:
+                    self.dropped += overflow
+                    batch = batch[overflow:]
+                self._buffer.extendleft(reversed(batch))
+            return 0
+
+        with self._lock:
+            self._record_latency(time.perf_counter() - start)
+            self.flushes += 1
+            self.flushed += len(batch)
+        return len(batch)
+
+    def _record_latency(self, latency):
+        self.last_flush_latency = latency
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+        self.total_flush_latency += latency
+
+    def stats(self):
+        """Returns a snapshot of the buffer counters."""
+        with self._lock:
+            attempts = self.flushes + self.failed_flushes
+            return {
+                "received": self.received,
+                "flushed": self.flushed,
+                "dropped": self.dropped,
+                "backlog": len(self._buffer),
+                "flushes": self.flushes,
+                "failed_flushes": self.failed_flushes,
+                "last_flush_latency_ms": self.last_flush_latency * 1000,
+                "max_flush_latency_ms": self.max_flush_latency * 1000,
+                "avg_flush_latency_ms": (
+                    self.total_flush_latency / attempts * 1000 if attempts else 0.0
+                ),
+            }
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._flush_requested.wait(self.flush_interval)
+            self._flush_requested.clear()
+            failed = self.failed_flushes
+            self.flush()
+            if self.failed_flushes != failed:
+                # Give the sink time to recover instead of retrying on every new message
+                self._stop.wait(self.flush_interval)
+
+    def start(self):
+        """Starts the background flush thread."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="mqtt-buffer-flush", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops the flush thread and writes whatever is still pending."""
+        self._stop.set()
+        self._flush_requested.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
@@ -1,6 +1,6 @@
 import paho.mqtt.client as mqtt
 import json
-import time
+import threading
 
 # MQTT Credentials
 MQTT_BROKER = "759d2f782c6f48d68eafab33492641f8.s1.eu.hivemq.cloud"
@@ -8,39 +8,114 @@ MQTT_PORT = 8883
 MQTT_USER = "sla"
 MQTT_PASSWORD = "sla"
 
-def activate_irrigation(channel, broker=MQTT_BROKER, port=MQTT_PORT, username=MQTT_USER, password=MQTT_PASSWORD):
-    result_message = ""
+# Irrigation command settings
+COMMAND_QOS = 1
+CONNECT_TIMEOUT_SECONDS = 10
+PUBLISH_TIMEOUT_SECONDS = 5
+
+
+class IrrigationPublisher:
+    """Long-lived MQTT client that publishes irrigation commands.
+
+    The client connects once, keeps its network loop running in the
+    background and reconnects on its own. Publishing is thread-safe, and
+    callers wait for the broker's QoS acknowledgement instead of sleeping.
+    """
+
+    def __init__(self, broker=MQTT_BROKER, port=MQTT_PORT, username=MQTT_USER, password=MQTT_PASSWORD, qos=COMMAND_QOS):
+        self.qos = qos
+        self._connected = threading.Event()
+        self._lock = threading.Lock()
+        self.last_error = None
 
-    def on_connect(client, userdata, flags, rc):
-        nonlocal result_message
+        self._client = mqtt.Client()
+        self._client.username_pw_set(username, password)
+        self._client.on_connect = self._on_connect
+        self._client.on_disconnect = self._on_disconnect
+        self._client.tls_set()  # Enable TLS for secure communication
+        self._client.reconnect_delay_set(min_delay=1, max_delay=30)
+        self._client.connect_async(broker, port, 60)
+        self._client.loop_start()
+
+    def _on_connect(self, client, userdata, flags, rc):
         if rc == 0:
             print(f"Connected successfully to MQTT broker with result code {rc}")
-            # Publish the irrigation activation message
-            message = json.dumps(true)
-            client.publish(f"led/{channel}", message)
-            result_message = f"Irrigation activation message sent to {channel}"
+            self.last_error = None
+            self._connected.set()
         else:
-            result_message = f"Failed to connect, return code {rc}"
+            self.last_error = f"Failed to connect, return code {rc}"
+
+    def _on_disconnect(self, client, userdata, rc):
+        self._connected.clear()
+
+    def wait_until_connected(self, timeout=CONNECT_TIMEOUT_SECONDS):
+        """Blocks until the client is connected; returns False on timeout."""
+        return self._connected.wait(timeout)
+
+    def set_valves(self, channels, state, timeout=PUBLISH_TIMEOUT_SECONDS):
+        """Publishes ``state`` to ``led/<channel>`` for every channel at once.
+
+        All messages are sent before waiting, so the acknowledgements arrive
+        in parallel. Returns a dict mapping each channel to True when the
+        broker acknowledged its message within ``timeout`` seconds.
+        """
+        if not self.wait_until_connected(timeout):
+            return {channel: False for channel in channels}
 
-    def on_publish(client, userdata, mid):
-        nonlocal result_message
-        result_message += "\nMessage published successfully"
-        print("Message published successfully")
-        client.disconnect()
+        message = json.dumps(bool(state))
+        with self._lock:
+            pending = {
+                channel: self._client.publish(f"led/{channel}", message, qos=self.qos)
+                for channel in channels
+            }
 
-    # Setup MQTT Client
-    client = mqtt.Client()
-    client.username_pw_set(username, password)
-    client.on_connect = on_connect
-    client.on_publish = on_publish
-    client.tls_set()  # Enable TLS for secure communication
+        results = {}
+        for channel, info in pending.items():
+            try:
+                info.wait_for_publish(timeout)
+                results[channel] = info.is_published()
+            except (ValueError, RuntimeError) as e:
+                self.last_error = str(e)
+                results[channel] = False
+        return results
 
+    def close(self):
+        """Disconnects the client and stops its network loop."""
+        self._client.disconnect()
+        self._client.loop_stop()
+
+
+_publishers = {}
+_publishers_lock = threading.Lock()
+
+
+def get_publisher(broker=MQTT_BROKER, port=MQTT_PORT, username=MQTT_USER, password=MQTT_PASSWORD):
+    """Returns the shared publisher for a broker, connecting it on first use."""
+    key = (broker, port, username)
+    with _publishers_lock:
+        publisher = _publishers.get(key)
+        if publisher is None:
+            publisher = IrrigationPublisher(broker, port, username, password)
+            _publishers[key] = publisher
+        return publisher
+
+
+def _send_irrigation_command(channel, state, broker, port, username, password):
     try:
-        client.connect(broker, port, 60)
-        client.loop_start()
-        time.sleep(2)  # Wait for the message to be published
-        client.loop_stop()
+        publisher = get_publisher(broker, port, username, password)
+        if not publisher.wait_until_connected():
+            return publisher.last_error or "Failed to connect, timed out waiting for the broker"
+        if publisher.set_valves([channel], state)[channel]:
+            action = "activation" if state else "deactivation"
+            return f"Irrigation {action} message sent to {channel}\nMessage published successfully"
+        return f"Failed to publish irrigation message to {channel}"
     except Exception as e:
-        result_message = f"Error: {str(e)}"
+        return f"Error: {str(e)}"
+
+
+def activate_irrigation(channel, broker=MQTT_BROKER, port=MQTT_PORT, username=MQTT_USER, password=MQTT_PASSWORD):
+    return _send_irrigation_command(channel, True, broker, port, username, password)
+
 
-    return result_message
+def deactivate_irrigation(channel, broker=MQTT_BROKER, port=MQTT_PORT, username=MQTT_USER, password=MQTT_PASSWORD):
+    return _send_irrigation_command(channel, False, broker, port, username, password)
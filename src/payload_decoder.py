@@ -0,0 +1,185 @@
+import json
+import math
+import re
+import time
+from collections import Counter, deque
+from typing import NamedTuple
+
+# Fields of the ESP32 payload (Platformio/src/main.cpp) and their valid ranges
+PAYLOAD_RANGES = {
+    "potassiumPercent": (0.0, 100.0),
+    "phosphorusPercent": (0.0, 100.0),
+    "temperature": (-40.0, 80.0),  # DHT22 range
+    "humidity": (0.0, 100.0),
+}
+_RANGES = tuple(PAYLOAD_RANGES.items())
+STATE_CODES = {"ON": 1, "OFF": 0}
+TOPIC_MAX_BYTES = 32
+DEAD_LETTER_SIZE = 100
+
+# The firmware always serializes the fields in this order; NaN readings come out as null
+_NUMBER = r"(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?|null)"
+_ESP32_PAYLOAD = re.compile(
+    "".join(rf'"{field}":{_NUMBER},' for field in PAYLOAD_RANGES).join(["\\{", r'"state":"(ON|OFF)"\}'])
+)
+
+
+class Reading(NamedTuple):
+    """One decoded payload; the field order matches record_log.RECORD_DTYPE."""
+
+    chanel: str
+    timestamp: int  # local wall-clock time in ns, like datetime.now(); stamped on arrival
+    potassiumPercent: float  # NaN when not reported
+    phosphorusPercent: float
+    temperature: float
+    humidity: float
+    state: int  # 1 = ON, 0 = OFF, -1 = not reported
+
+
+class PayloadRejected(ValueError):
+    """Raised by ``parse`` for a payload that does not fit the schema."""
+
+    def __init__(self, reason, detail=""):
+        super().__init__(f"{reason}: {detail}" if detail else reason)
+        self.reason = reason
+
+
+def _local_time_ns():
+    now = time.time_ns()
+    return now + time.localtime(now // 1_000_000_000).tm_gmtoff * 1_000_000_000
+
+
+def _check_ranges(values):
+    # NaN fails every comparison, hence the ``value == value`` test
+    for value, (field, (low, high)) in zip(values, _RANGES):
+        if not low <= value <= high and value == value:
+            raise PayloadRejected("out_of_range", f"{field}={value}")
+    return values
+
+
+def _parse_object(data):
+    """Validates a decoded JSON object field by field; unknown fields are ignored."""
+    if not isinstance(data, dict):
+        raise PayloadRejected("not_object", type(data).__name__)
+    values = []
+    for field in PAYLOAD_RANGES:
+        value = data.get(field)
+        if value is None:
+            values.append(math.nan)
+            continue
+        # bool is an int subclass, but true/false is never a reading
+        if type(value) not in (int, float):
+            raise PayloadRejected("bad_type", f"{field}={value!r}")
+        try:
+            values.append(float(value))
+        except OverflowError:
+            raise PayloadRejected("out_of_range", f"{field}={value}")
+    _check_ranges(values)
+    state = data.get("state")
+    if state is None:
+        values.append(-1)
+    elif state in STATE_CODES:
+        values.append(STATE_CODES[state])
+    else:
+        raise PayloadRejected("bad_state", repr(state))
+    return values
+
+
+def parse(payload):
+    """Returns the four readings and the state code of a raw payload, or raises PayloadRejected.
+
+    Payloads laid out exactly as the firmware sends them are matched by a
+    pre-compiled pattern; anything else goes through ``json.loads``.
+    """
+    match = _ESP32_PAYLOAD.fullmatch(payload)
+    if match is not None:
+        *numbers, state = match.groups()
+        values = _check_ranges([math.nan if text == "null" else float(text) for text in numbers])
+        values.append(STATE_CODES[state])
+        return values
+    try:
+        data = json.loads(payload)
+    except ValueError as e:
+        raise PayloadRejected("invalid_json", str(e))
+    return _parse_object(data)
+
+
+class PayloadDecoder:
+    """Decodes MQTT payloads into typed Reading tuples.
+
+    Malformed payloads are not raised to the caller: they are counted by
+    reason and the latest ones are kept in a dead-letter queue for
+    inspection. The time spent decoding is accumulated so the cost per
+    message can be reported. Like the MQTT callbacks, a decoder is meant to
+    be used from a single network thread.
+    """
+
+    def __init__(self, dead_letter_size=DEAD_LETTER_SIZE):
+        self.dead_letters = deque(maxlen=dead_letter_size)
+        self.rejected = Counter()
+
+        # Counters
+        self.decoded = 0
+        self.decode_ns = 0
+
+    def decode(self, topic, payload):
+        """Returns a Reading for a raw MQTT payload (bytes or str), or None if it was rejected."""
+        started = time.perf_counter_ns()
+        try:
+            if len(topic) > TOPIC_MAX_BYTES or not topic.isascii():
+                raise PayloadRejected("bad_topic", topic)
+            if isinstance(payload, (bytes, bytearray)):
+                try:
+                    payload = payload.decode()
+                except UnicodeDecodeError as e:
+                    raise PayloadRejected("invalid_utf8", str(e))
+            values = parse(payload)
+        except PayloadRejected as e:
+            self.rejected[e.reason] += 1
+            self.dead_letters.append((topic, payload, str(e)))
+            self.decode_ns += time.perf_counter_ns() - started
+            return None
+        reading = Reading(topic, _local_time_ns(), *values)
+        self.decoded += 1
+        self.decode_ns += time.perf_counter_ns() - started
+        return reading
+
+    def stats(self):
+        """Returns the decode and rejection counters and the mean cost in microseconds per message."""
+        rejected = dict(self.rejected)
+        total = self.decoded + sum(rejected.values())
+        return {
+            "decoded": self.decoded,
+            "rejected": sum(rejected.values()),
+            "rejected_by_reason": rejected,
+            "us_per_message": round(self.decode_ns / total / 1000, 3) if total else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    # Test the functions
+    decoder = PayloadDecoder()
+    samples = [
+        '{"potassiumPercent":42.5,"phosphorusPercent":55,"temperature":24.6,"humidity":61,"state":"ON"}',
+        '{"potassiumPercent":42.5,"phosphorusPercent":55,"temperature":null,"humidity":null,"state":"OFF"}',
+        '{"humidity": 61, "potassiumPercent": 40}',
+        '{"potassiumPercent":420,"phosphorusPercent":55,"temperature":24.6,"humidity":61,"state":"ON"}',
+        '{"potassiumPercent":"x"}',
+        '[1, 2]',
+        "not json",
+    ]
+    for sample in samples:
+        print(decoder.decode("chanel/c0", sample.encode()))
+    print(f"Dead letters: {list(decoder.dead_letters)}")
+
+    count = 100000
+    payload = samples[0].encode()
+    started = time.perf_counter()
+    for _ in range(count):
+        decoder.decode("chanel/c0", payload)
+    print(f"Decoder: {(time.perf_counter() - started) / count * 1e6:.2f} us/message")
+    started = time.perf_counter()
+    for _ in range(count):
+        json.loads(payload.decode())
+    print(f"json.loads alone: {(time.perf_counter() - started) / count * 1e6:.2f} us/message")
+    print(decoder.stats())
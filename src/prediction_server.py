@@ -0,0 +1,295 @@
+import paho.mqtt.client as mqtt
+import bisect
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from mqtt_utilis import MQTT_BROKER, MQTT_PORT, MQTT_USER, MQTT_PASSWORD
+from anomaly_filter import AnomalyFilter, as_payload
+from feature_store import FEATURE_SNAPSHOT_PATH, FeatureStore
+from payload_decoder import PayloadDecoder
+from model_registry import model_registry
+from recommendation_engine import FEATURE_COLUMNS, build_feature_matrix, load_area_context, percent_to_training_units
+from db.sensor_index import sensor_index
+from db.sensor_measurement_crud import MQTT_FIELD_SENSOR_TYPES
+
+# Micro-batching settings
+PREDICT_MAX_WAIT_MS = float(os.getenv("PREDICT_MAX_WAIT_MS", "5"))
+PREDICT_MAX_BATCH = int(os.getenv("PREDICT_MAX_BATCH", "64"))
+PREDICT_WORKERS = int(os.getenv("PREDICT_WORKERS", str(max(2, (os.cpu_count() or 2) // 2))))
+# How long the crop/stage of each area is reused before Harvest is read again
+AREA_CONTEXT_TTL_SECONDS = 300
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, float("inf")]
+LATENCY_WINDOW = 10000
+
+_worker_model = None
+
+
+def _init_worker(model_name):
+    # Runs once in every pool process, so the pickle is read at startup, not per batch
+    global _worker_model
+    _worker_model = model_registry.get(model_name)
+
+
+def _predict_batch(matrix):
+    return _worker_model.predict(pd.DataFrame(matrix, columns=FEATURE_COLUMNS, copy=False))
+
+
+def _histogram(buckets, counts):
+    return {("+Inf" if bound == float("inf") else bound): count for bound, count in zip(buckets, counts)}
+
+
+class PredictionServer:
+    """Low-latency irrigation decisions for single readings.
+
+    Requests are queued and coalesced into micro-batches: a batch is sent as
+    soon as ``max_batch`` requests are waiting or the oldest has waited
+    ``max_wait_ms``. Batches are predicted in a process pool whose workers
+    each hold the model in memory, so several batches run in parallel
+    without contending for the GIL. With a ``feature_store`` each reading
+    is added to it first and the area's window means are scored instead of
+    the raw reading.
+    """
+
+    def __init__(
+        self,
+        model=None,
+        max_wait_ms=PREDICT_MAX_WAIT_MS,
+        max_batch=PREDICT_MAX_BATCH,
+        workers=PREDICT_WORKERS,
+        feature_store=None,
+    ):
+        self.feature_store = feature_store
+        self.model_name = model or model_registry.default_model
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch = max_batch
+        self.workers = workers
+
+        self._requests = queue.Queue()
+        self._pool = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._context = None
+        self._context_loaded_at = 0.0
+
+        # Latest decision per channel, filled by on_message from decoded readings without spikes
+        self.decisions = {}
+        self.decoder = PayloadDecoder()
+        self.anomaly_filter = AnomalyFilter()
+
+        # Metrics
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._latency_counts = [0] * len(LATENCY_BUCKETS_MS)
+        self._batch_buckets = [2**i for i in range(max_batch.bit_length())] + [float("inf")]
+        self._batch_counts = [0] * len(self._batch_buckets)
+        self.requests = 0
+        self.rejected = 0
+        self.filtered = 0
+        self.batches = 0
+        self.failed_batches = 0
+
+    def submit(self, chanel, reading):
+        """Queues a reading of a channel; returns a Future resolving to True when irrigation is needed."""
+        future = Future()
+        if self._stop.is_set():
+            future.set_exception(RuntimeError("PredictionServer is stopped"))
+            return future
+        if self.feature_store is not None:
+            id_area = self.feature_store.update_reading(chanel, reading)
+        else:
+            id_area = sensor_index.area_for_channel(chanel)
+        if id_area is None:
+            with self._stats_lock:
+                self.rejected += 1
+            future.set_exception(KeyError(f"Channel {chanel} is not registered to an area"))
+            return future
+        if self.feature_store is not None:
+            values = self.feature_store.area_values(id_area)
+        else:
+            values = {
+                type_name: reading[field]
+                for field, type_name in MQTT_FIELD_SENSOR_TYPES.items()
+                if reading.get(field) is not None
+            }
+        self._requests.put((id_area, values, future, time.perf_counter()))
+        return future
+
+    def predict(self, chanel, reading, timeout=None):
+        """Returns the decision for a reading, blocking until its batch is predicted."""
+        return self.submit(chanel, reading).result(timeout)
+
+    def _area_context(self):
+        if self._context is None or time.monotonic() - self._context_loaded_at > AREA_CONTEXT_TTL_SECONDS:
+            self._context = load_area_context()
+            self._context_loaded_at = time.monotonic()
+        return self._context
+
+    def _collect(self):
+        """Blocks for the first request, then gathers more until the batch is full or max_wait passes."""
+        try:
+            batch = [self._requests.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = batch[0][3] + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._requests.get(timeout=remaining) if remaining > 0 else self._requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._stop.is_set() and self._requests.empty()):
+            batch = self._collect()
+            if not batch:
+                continue
+            futures = [request[2] for request in batch]
+            try:
+                readings = pd.DataFrame([request[1] for request in batch], index=[request[0] for request in batch])
+                _, matrix = build_feature_matrix(percent_to_training_units(readings), self._area_context())
+                result = self._pool.submit(_predict_batch, matrix)
+            except Exception as e:
+                self._fail(futures, e)
+                continue
+            started = [request[3] for request in batch]
+            result.add_done_callback(lambda done, f=futures, s=started: self._resolve(done, f, s))
+
+    def _fail(self, futures, error):
+        with self._stats_lock:
+            self.failed_batches += 1
+        for future in futures:
+            future.set_exception(error)
+
+    def _resolve(self, done, futures, started):
+        error = done.exception()
+        if error is not None:
+            self._fail(futures, error)
+            return
+        predictions = done.result()
+        finished = time.perf_counter()
+        with self._stats_lock:
+            self.batches += 1
+            self.requests += len(futures)
+            self._batch_counts[bisect.bisect_left(self._batch_buckets, len(futures))] += 1
+            for t in started:
+                latency_ms = (finished - t) * 1000
+                self._latencies.append(latency_ms)
+                self._latency_counts[bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+        for future, prediction in zip(futures, predictions):
+            future.set_result(bool(prediction))
+
+    def on_message(self, client, userdata, msg):
+        reading = self.decoder.decode(msg.topic, msg.payload)
+        if reading is None:
+            with self._stats_lock:
+                self.rejected += 1
+            return
+        reading = self.anomaly_filter.filter(reading)
+        if reading is None:
+            with self._stats_lock:
+                self.filtered += 1
+            return
+        future = self.submit(msg.topic, as_payload(reading))
+        future.add_done_callback(lambda done, chanel=msg.topic: self._store_decision(chanel, done))
+
+    def _store_decision(self, chanel, done):
+        if done.exception() is None:
+            self.decisions[chanel] = done.result()
+
+    def on_connect(self, client, userdata, flags, rc):
+        if rc == 0:
+            print(f"Connected successfully to MQTT broker with result code {rc}")
+            client.subscribe("chanel/#")
+        else:
+            print(f"Failed to connect, return code {rc}")
+
+    def start(self):
+        """Starts the worker processes and the batching thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        # Read the sensor registry here, so the first readings don't query the database on the MQTT network thread
+        sensor_index.load()
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.model_name,),
+        )
+        # Spawn every worker now so the first requests don't pay for process start-up
+        for done in [self._pool.submit(time.sleep, 0) for _ in range(self.workers)]:
+            done.result()
+        self._thread = threading.Thread(target=self._run, name="prediction-batcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Answers the queued requests and shuts the pool down. Later requests fail right away."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        # A request queued while the batcher was exiting would never be answered
+        while True:
+            try:
+                future = self._requests.get_nowait()[2]
+            except queue.Empty:
+                break
+            future.set_exception(RuntimeError("PredictionServer is stopped"))
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def stats(self):
+        """Returns request counters, p50/p99 latency and the latency and batch-size histograms."""
+        with self._stats_lock:
+            latencies = np.fromiter(self._latencies, dtype=float)
+            return {
+                "requests": self.requests,
+                "rejected": self.rejected,
+                "filtered": self.filtered,
+                "queued": self._requests.qsize(),
+                "batches": self.batches,
+                "failed_batches": self.failed_batches,
+                "p50_ms": round(float(np.percentile(latencies, 50)), 3) if latencies.size else None,
+                "p99_ms": round(float(np.percentile(latencies, 99)), 3) if latencies.size else None,
+                "latency_histogram_ms": _histogram(LATENCY_BUCKETS_MS, self._latency_counts),
+                "batch_size_histogram": _histogram(self._batch_buckets, self._batch_counts),
+                "anomalies": self.anomaly_filter.stats(),
+            }
+
+
+if __name__ == "__main__":
+    server = PredictionServer(feature_store=FeatureStore.restore(FEATURE_SNAPSHOT_PATH))
+    server.start()
+
+    client = mqtt.Client()
+    client.username_pw_set(MQTT_USER, MQTT_PASSWORD)
+    client.on_connect = server.on_connect
+    client.on_message = server.on_message
+    client.tls_set()
+    client.connect(MQTT_BROKER, MQTT_PORT, 60)
+    client.loop_start()
+
+    print("Servidor de predição iniciado. Aguardando leituras MQTT...")
+    try:
+        while True:
+            time.sleep(30)
+            print(f"Predição: {server.stats()}")
+            print(f"Decisões: {server.decisions}")
+            server.feature_store.snapshot(FEATURE_SNAPSHOT_PATH)
+    except KeyboardInterrupt:
+        print("\nServiço encerrado pelo usuário.")
+        client.loop_stop()
+        client.disconnect()
+        server.stop()
@@ -0,0 +1,225 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from feature_store import FEATURE_SNAPSHOT_PATH, FeatureStore, start_feature_subscriber
+from model_registry import model_registry
+from db.analytics_queries import fetch_harvests, fetch_rollups
+from db.irrigation_recommendation_crud import bulk_create_irrigation_recommendations
+from db.ml_model_crud import get_all_ml_models
+from db.sensor_index import sensor_index
+from db.sensor_measurement_crud import MQTT_FIELD_SENSOR_TYPES
+
+# Decision cycle settings
+RECOMMENDATION_INTERVAL_SECONDS = float(os.getenv("RECOMMENDATION_INTERVAL_SECONDS", "300"))
+# Only readings newer than this are used to score an area
+RECOMMENDATION_WINDOW_MINUTES = float(os.getenv("RECOMMENDATION_WINDOW_MINUTES", "15"))
+
+# Column order the classifiers were trained with (scripts/train_model.ipynb)
+NUMERIC_FEATURES = ["K", "P", "pH", "Moisture"]
+CROPS = ["Corn", "Soybean", "Wheat"]
+PHENOLOGICAL_STAGES = ["Flowering", "Maturity", "R1", "R6", "V6"]
+FEATURE_COLUMNS = (
+    NUMERIC_FEATURES
+    + [f"Crop_{crop}" for crop in CROPS]
+    + [f"Phenological_Stage_{stage}" for stage in PHENOLOGICAL_STAGES]
+)
+
+# The fitted StandardScaler was not saved with the models, so features are
+# standardized with the mean and standard deviation of the training data
+# (generate_fake_irrigation_data). A missing reading becomes the mean, i.e. 0.
+FEATURE_MEANS = np.array([200.0, 100.0, 6.5, 40.0])
+FEATURE_STDS = np.array([50.0, 30.0, 0.5, 15.0])
+# The sensors report K and P as 0-100 % of their measuring range (potassiumPercent,
+# phosphorusPercent), while the training data holds K in 100-350 mg/kg and P in
+# 50-180 mg/kg. A percentage is mapped linearly onto that range before scoring.
+SENSOR_PERCENT_RANGES = {"K": (100.0, 350.0), "P": (50.0, 180.0)}
+
+
+def readings_from_mqtt_frame(frame):
+    """Averages the latest MQTT readings (the ``mqtt_data`` frame) per area.
+
+    Returns a DataFrame indexed by id_area with a column per SensorType name;
+    channels that are not registered to an area are skipped.
+    """
+    readings = frame.rename(columns=MQTT_FIELD_SENSOR_TYPES)
+    id_area = readings["chanel"].map(sensor_index.area_for_channel)
+    columns = [c for c in MQTT_FIELD_SENSOR_TYPES.values() if c in readings.columns]
+    readings = readings[columns].apply(pd.to_numeric, errors="coerce")
+    return readings.groupby(id_area).mean().rename_axis("id_area")
+
+
+def readings_from_measurements(since=None):
+    """Returns the latest Sensor_Measurement value per area and SensorType.
+
+    Reads the minute rollups instead of raw rows, so the cost depends on the
+    number of sensors, not on how many readings arrived.
+    """
+    since = since or datetime.now() - timedelta(minutes=RECOMMENDATION_WINDOW_MINUTES)
+    rollups = fetch_rollups("minute", start=since.replace(second=0, microsecond=0))
+    if rollups.empty:
+        return pd.DataFrame(index=pd.Index([], name="id_area"))
+    latest = rollups.sort_values("last_datetime").drop_duplicates(["id_area", "type_name"], keep="last")
+    return latest.pivot_table(index="id_area", columns="type_name", values="last_value", aggfunc="mean")
+
+
+def load_area_context():
+    """Returns the crop and phenological stage of the latest harvest of each area."""
+    harvests = fetch_harvests()
+    if harvests.empty:
+        return pd.DataFrame(columns=["crop", "phenological_stage"], index=pd.Index([], name="id_area"))
+    latest = harvests.drop_duplicates("id_area", keep="last").set_index("id_area")
+    return latest[["crop", "phenological_stage"]]
+
+
+def percent_to_training_units(readings):
+    """Returns a copy of sensor ``readings`` with K and P converted from percentages to mg/kg."""
+    readings = readings.copy()
+    for column, (low, high) in SENSOR_PERCENT_RANGES.items():
+        if column in readings.columns:
+            readings[column] = low + readings[column].astype(float) / 100 * (high - low)
+    return readings
+
+
+def _one_hot(matrix, values, categories, offset):
+    codes = pd.Categorical(values, categories=categories).codes
+    rows = np.flatnonzero(codes >= 0)
+    matrix[rows, offset + codes[rows]] = 1.0
+
+
+def build_feature_matrix(readings, context):
+    """Builds the standardized feature matrix for every area in ``readings``.
+
+    Returns ``(id_areas, matrix)`` where row i of the matrix holds the
+    features of ``id_areas[i]`` in FEATURE_COLUMNS order. K and P must be in
+    mg/kg like the training data; pass live sensor readings through
+    ``percent_to_training_units`` first.
+    """
+    id_areas = readings.index.to_numpy()
+    matrix = np.zeros((len(id_areas), len(FEATURE_COLUMNS)))
+
+    numeric = readings.reindex(columns=NUMERIC_FEATURES).to_numpy(dtype=float)
+    numeric = np.where(np.isnan(numeric), FEATURE_MEANS, numeric)
+    matrix[:, : len(NUMERIC_FEATURES)] = (numeric - FEATURE_MEANS) / FEATURE_STDS
+
+    context = context.reindex(id_areas)
+    crop_offset = len(NUMERIC_FEATURES)
+    _one_hot(matrix, context["crop"], CROPS, crop_offset)
+    _one_hot(matrix, context["phenological_stage"], PHENOLOGICAL_STAGES, crop_offset + len(CROPS))
+    return id_areas, matrix
+
+
+class RecommendationEngine:
+    """Scores every area at once and stores the results in bulk.
+
+    Each cycle builds a single feature matrix for all areas and calls
+    ``predict`` once per model over the whole matrix; the recommendations of
+    all models are written to Irrigation_Recommendation in one transaction.
+    ``models`` are ML_Model names or ids and default to the registry's
+    default model. With a ``feature_store`` the window means kept by it are
+    scored instead of querying Sensor_Measurement.
+    """
+
+    def __init__(self, models=None, registry=model_registry, feature_store=None):
+        self.registry = registry
+        self.models = models or [registry.default_model]
+        self.feature_store = feature_store
+        self._model_rows = None
+
+        # Counters
+        self.cycles = 0
+        self.scored = 0
+        self.last_cycle_ms = None
+
+    def _resolve_models(self):
+        if self._model_rows is None:
+            rows = get_all_ml_models()
+            by_name = {row.model_name: row for row in rows}
+            by_id = {row.id_model: row for row in rows}
+            resolved = []
+            for model in self.models:
+                row = by_id.get(model) if isinstance(model, int) else by_name.get(model)
+                if row is None:
+                    raise KeyError(f"MLModel {model} not found")
+                resolved.append(row)
+            self._model_rows = resolved
+        return self._model_rows
+
+    def score(self, readings, context=None):
+        """Returns a DataFrame with id_model, id_area and irrigation_needed for every area and model.
+
+        ``readings`` are sensor readings, with K and P in percent.
+        """
+        context = load_area_context() if context is None else context
+        id_areas, matrix = build_feature_matrix(percent_to_training_units(readings), context)
+        if not len(id_areas):
+            return pd.DataFrame(columns=["id_model", "id_area", "irrigation_needed"])
+
+        # The classifiers were fitted on a DataFrame and warn about bare arrays
+        features = pd.DataFrame(matrix, columns=FEATURE_COLUMNS, copy=False)
+        results = []
+        for row in self._resolve_models():
+            predictions = self.registry.get(row.model_name).predict(features)
+            results.append(
+                pd.DataFrame(
+                    {
+                        "id_model": row.id_model,
+                        "id_area": id_areas.astype(int),
+                        "irrigation_needed": predictions.astype(bool),
+                    }
+                )
+            )
+        return pd.concat(results, ignore_index=True)
+
+    def run_cycle(self, frame=None, since=None, write=True):
+        """Scores the latest readings and writes the recommendations.
+
+        ``frame`` is an ``mqtt_data``-shaped DataFrame; without it the feature
+        store, or else the latest Sensor_Measurement values, are used.
+        Returns the recommendations.
+        """
+        started = time.perf_counter()
+        if frame is not None:
+            readings = readings_from_mqtt_frame(frame)
+        elif self.feature_store is not None:
+            readings = self.feature_store.readings()
+        else:
+            readings = readings_from_measurements(since)
+        recommendations = self.score(readings)
+        if write and not recommendations.empty:
+            bulk_create_irrigation_recommendations(recommendations.to_dict("records"))
+
+        self.cycles += 1
+        self.scored += len(recommendations)
+        self.last_cycle_ms = round((time.perf_counter() - started) * 1000, 2)
+        return recommendations
+
+    def run_forever(self, interval=RECOMMENDATION_INTERVAL_SECONDS):
+        """Runs a decision cycle every ``interval`` seconds."""
+        while True:
+            started = time.monotonic()
+            try:
+                recommendations = self.run_cycle()
+                print(
+                    f"{len(recommendations)} recomendações geradas em {self.last_cycle_ms} ms"
+                )
+            except Exception as e:
+                print(f"Erro no ciclo de recomendação: {e}")
+            if self.feature_store is not None:
+                self.feature_store.snapshot(FEATURE_SNAPSHOT_PATH)
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+if __name__ == "__main__":
+    # The store is restored from its last snapshot and kept current from MQTT
+    store = FeatureStore.restore(FEATURE_SNAPSHOT_PATH)
+    start_feature_subscriber(store)
+    engine = RecommendationEngine(feature_store=store)
+    engine.registry.warm(engine.models)
+    try:
+        engine.run_forever()
+    except KeyboardInterrupt:
+        print("\nServiço encerrado pelo usuário.")
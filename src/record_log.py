@@ -0,0 +1,337 @@
+import glob
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Log settings
+MQTT_LOG_DIR = os.getenv("MQTT_LOG_DIR", "mqtt_log")
+SEGMENT_MAX_BYTES = int(os.getenv("MQTT_LOG_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+MAX_SEGMENTS = int(os.getenv("MQTT_LOG_MAX_SEGMENTS", "16"))
+INDEX_SLOTS = int(os.getenv("MQTT_LOG_INDEX_SLOTS", "256"))
+TOPIC_BYTES = 32
+
+INDEX_FILE = "latest.idx"
+SEGMENT_PATTERN = "segment-*.log"
+# Sharded ingestion (src/sharded_ingest.py) writes one log per shard in these subdirectories
+SHARD_PATTERN = "shard-*"
+
+# Fixed-width record shared by the log segments and the latest-value index
+READING_FIELDS = ["potassiumPercent", "phosphorusPercent", "temperature", "humidity"]
+RECORD_DTYPE = np.dtype(
+    [("chanel", f"S{TOPIC_BYTES}"), ("timestamp", "<i8")]  # timestamp in ns since the epoch
+    + [(field, "<f8") for field in READING_FIELDS]
+    + [("state", "i1")]  # 1 = ON, 0 = OFF, -1 = not reported
+)
+_STATES = {"ON": 1, "OFF": 0}
+
+# The index file starts with this header. ``sequence`` is a seqlock: the writer
+# makes it odd before changing any slot and even again afterwards.
+INDEX_MAGIC = 0x4C544149
+INDEX_HEADER_DTYPE = np.dtype([("magic", "<u4"), ("slots", "<u4"), ("sequence", "<u8")])
+INDEX_READ_RETRIES = 1000
+
+
+def to_records(readings):
+    """Packs readings into a record array.
+
+    ``readings`` are payload_decoder.Reading tuples, which are packed in a
+    single call, or reading dicts with ``chanel`` and ``timestamp``.
+    """
+    if len(readings) and isinstance(readings[0], tuple):
+        return np.array(readings, dtype=RECORD_DTYPE)
+    records = np.zeros(len(readings), dtype=RECORD_DTYPE)
+    for i, reading in enumerate(readings):
+        record = records[i]
+        record["chanel"] = str(reading["chanel"]).encode()[:TOPIC_BYTES]
+        record["timestamp"] = pd.Timestamp(reading.get("timestamp") or datetime.now()).value
+        for field in READING_FIELDS:
+            value = reading.get(field)
+            try:
+                record[field] = np.nan if value is None else value
+            except (TypeError, ValueError):
+                record[field] = np.nan
+        record["state"] = _STATES.get(reading.get("state"), -1)
+    return records
+
+
+def records_to_frame(records):
+    """Converts a record array (or memmap) into a DataFrame shaped like the ``mqtt_data`` table."""
+    state = np.asarray(records["state"])
+    return pd.DataFrame(
+        {
+            "chanel": np.char.decode(np.asarray(records["chanel"]), "utf-8"),
+            **{field: np.asarray(records[field]) for field in READING_FIELDS},
+            "state": np.where(state == 1, "ON", np.where(state == 0, "OFF", None)),
+            "timestamp": pd.to_datetime(np.asarray(records["timestamp"]), unit="ns"),
+        }
+    )
+
+
+def _map(path):
+    """Memory-maps the whole records of a file; returns an empty array for an empty file."""
+    count = os.path.getsize(path) // RECORD_DTYPE.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode="r", shape=(count,))
+
+
+def _map_index(path, mode):
+    """Maps the index file; returns (header, slots) views, or None if it has another layout."""
+    raw = np.memmap(path, dtype=np.uint8, mode=mode)
+    header_size = INDEX_HEADER_DTYPE.itemsize
+    if len(raw) < header_size:
+        return None
+    header = raw[:header_size].view(INDEX_HEADER_DTYPE)
+    slots = int(header["slots"][0])
+    if header["magic"][0] != INDEX_MAGIC or len(raw) != header_size + slots * RECORD_DTYPE.itemsize:
+        return None
+    return header, raw[header_size:].view(RECORD_DTYPE)
+
+
+class LatestIndexReader:
+    """Lock-free reader of the latest-value index written by RecordLog.
+
+    The index is memory-mapped and read under its seqlock: the slots are
+    copied, and the copy is kept only if the sequence number was even and
+    unchanged around it. Readers never block the writer or each other, and
+    ``version()`` lets pollers skip the copy when nothing changed. When the
+    writer replaces the file (a new layout), the new one is mapped and the
+    sequence numbers it reports carry on from the old file's, so pollers
+    still see a change.
+    """
+
+    def __init__(self, directory=MQTT_LOG_DIR):
+        self.path = os.path.join(directory, INDEX_FILE)
+        self._mapped = None
+        self._inode = None
+        self._offset = 0
+
+    def _map(self):
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            inode = None
+        if self._mapped is not None and inode != self._inode:
+            # The file was replaced: carry the sequence on past the old one's
+            self._offset += int(self._mapped[0]["sequence"][0]) + 2
+            self._mapped = self._inode = None
+        if inode is None:
+            return None
+        if self._mapped is None:
+            try:
+                self._mapped = _map_index(self.path, "r")
+            except ValueError:
+                # Created but still empty
+                self._mapped = None
+            self._inode = inode if self._mapped is not None else None
+        return self._mapped
+
+    def version(self):
+        """Returns the index sequence number, or None while there is no index."""
+        mapped = self._map()
+        return None if mapped is None else self._offset + int(mapped[0]["sequence"][0])
+
+    def read(self):
+        """Returns ``(sequence, records)`` with a consistent copy of the used slots, or None."""
+        mapped = self._map()
+        if mapped is None:
+            return None
+        header, index = mapped
+        for attempt in range(INDEX_READ_RETRIES):
+            sequence = int(header["sequence"][0])
+            if sequence % 2 == 0:
+                records = index.copy()
+                if int(header["sequence"][0]) == sequence:
+                    break
+            time.sleep(0 if attempt < 100 else 0.001)
+        else:
+            # The writer stopped mid-update; its next start repairs the sequence
+            sequence = int(header["sequence"][0])
+            records = index.copy()
+        return self._offset + sequence, records[records["chanel"] != b""]
+
+
+class MergedIndexReader:
+    """Reads the index of a log directory and of its shard subdirectories as one.
+
+    Shards that appear later are picked up on the next call. When a channel
+    is in several indexes (e.g. with a shared subscription) its newest
+    record wins. ``version()`` changes whenever any index changes.
+    """
+
+    def __init__(self, directory=MQTT_LOG_DIR):
+        self.directory = directory
+        self._readers = {}
+
+    def _refresh(self):
+        for path in [self.directory] + sorted(glob.glob(os.path.join(self.directory, SHARD_PATTERN))):
+            if path not in self._readers:
+                self._readers[path] = LatestIndexReader(path)
+        return self._readers.values()
+
+    def version(self):
+        """Returns the sum of the index sequence numbers, or None while there is no index."""
+        versions = [version for version in (reader.version() for reader in self._refresh()) if version is not None]
+        return sum(versions) if versions else None
+
+    def read(self):
+        """Returns ``(version, records)`` with the newest record of each channel, or None."""
+        results = [result for result in (reader.read() for reader in self._refresh()) if result is not None]
+        if not results:
+            return None
+        records = np.concatenate([result[1] for result in results])
+        if len(results) > 1:
+            records = records[np.argsort(records["timestamp"], kind="stable")[::-1]]
+            records = records[np.sort(np.unique(records["chanel"], return_index=True)[1])]
+        return sum(result[0] for result in results), records
+
+
+def read_latest(directory=MQTT_LOG_DIR):
+    """Returns the latest reading per channel, from every shard, or None when there is no log."""
+    result = MergedIndexReader(directory).read()
+    return None if result is None else records_to_frame(result[1])
+
+
+def read_log(directory=MQTT_LOG_DIR, since=None):
+    """Returns every logged reading, oldest first, optionally only those after ``since``."""
+    segments = [_map(path) for path in sorted(glob.glob(os.path.join(directory, SEGMENT_PATTERN)))]
+    records = np.concatenate(segments) if segments else np.zeros(0, dtype=RECORD_DTYPE)
+    if since is not None:
+        records = records[records["timestamp"] >= pd.Timestamp(since).value]
+    return records_to_frame(records)
+
+
+class RecordLog:
+    """Append-only binary log of MQTT readings with a latest-value index.
+
+    Readings are packed into fixed-width records and appended to the
+    current segment file, which rolls over at ``segment_max_bytes``; only
+    the newest ``max_segments`` are kept. A separate index file holds the
+    latest record of each channel in a fixed slot. It is memory-mapped and
+    updated in place under a seqlock, so readers in other processes see each
+    append at once without taking any lock (see LatestIndexReader), and the
+    writer never waits for them. Nothing touches the disk until the first
+    append.
+    """
+
+    def __init__(
+        self,
+        directory=MQTT_LOG_DIR,
+        segment_max_bytes=SEGMENT_MAX_BYTES,
+        max_segments=MAX_SEGMENTS,
+        index_slots=INDEX_SLOTS,
+    ):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.max_segments = max_segments
+        self.index_slots = index_slots
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._segment = None
+        self._header = None
+        self._index = None
+        self._slots = None
+
+        # Counters
+        self.appended = 0
+        self.rotations = 0
+        self.unindexed = 0
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        segments = sorted(glob.glob(os.path.join(self.directory, SEGMENT_PATTERN)))
+        self._segment = int(os.path.basename(segments[-1])[8:-4]) if segments else 0
+        self._open_segment()
+
+        path = os.path.join(self.directory, INDEX_FILE)
+        mapped = _map_index(path, "r+") if os.path.exists(path) else None
+        if mapped is None or len(mapped[1]) != self.index_slots:
+            # New index, or one with another layout: start an empty one
+            header = np.zeros(1, dtype=INDEX_HEADER_DTYPE)
+            header["magic"] = INDEX_MAGIC
+            header["slots"] = self.index_slots
+            temporary = path + ".tmp"
+            with open(temporary, "wb") as file:
+                file.write(header.tobytes())
+                file.write(np.zeros(self.index_slots, dtype=RECORD_DTYPE).tobytes())
+            os.replace(temporary, path)
+            mapped = _map_index(path, "r+")
+        self._header, self._index = mapped
+        if self._header["sequence"][0] % 2:
+            # A previous writer stopped mid-update
+            self._header["sequence"] += 1
+        self._slots = {
+            topic: slot for slot, topic in enumerate(self._index["chanel"]) if topic != b""
+        }
+
+    def _open_segment(self):
+        path = os.path.join(self.directory, f"segment-{self._segment:08d}.log")
+        self._file = open(path, "ab")
+        # Drop a partial record left by a crash so records stay aligned
+        extra = self._file.tell() % RECORD_DTYPE.itemsize
+        if extra:
+            self._file.truncate(self._file.tell() - extra)
+            self._file.seek(0, os.SEEK_END)
+
+    def _rotate(self):
+        self._file.close()
+        self._segment += 1
+        self._open_segment()
+        self.rotations += 1
+        segments = sorted(glob.glob(os.path.join(self.directory, SEGMENT_PATTERN)))
+        for path in segments[: max(0, len(segments) - self.max_segments)]:
+            os.remove(path)
+
+    def append(self, readings):
+        """Appends readings (see to_records) or a record array to the log and updates the latest-value index."""
+        records = readings if isinstance(readings, np.ndarray) else to_records(readings)
+        if not len(records):
+            return 0
+        with self._lock:
+            if self._file is None:
+                self._open()
+            self._file.write(records.tobytes())
+            self._file.flush()
+            if self._file.tell() >= self.segment_max_bytes:
+                self._rotate()
+
+            self._header["sequence"] += 1  # odd: readers retry
+            for record in records:
+                slot = self._slots.get(record["chanel"])
+                if slot is None:
+                    if len(self._slots) == self.index_slots:
+                        self.unindexed += 1
+                        continue
+                    slot = self._slots[record["chanel"]] = len(self._slots)
+                self._index[slot] = record
+            self._header["sequence"] += 1  # even: the slots are consistent again
+            self.appended += len(records)
+        return len(records)
+
+    def close(self):
+        """Closes the current segment file and flushes the index to disk."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self._index.flush()
+
+
+if __name__ == "__main__":
+    # Test the functions
+    log = RecordLog("mqtt_log_test")
+    log.append(
+        [
+            {"chanel": "chanel/c0", "potassiumPercent": 40, "phosphorusPercent": 55, "temperature": 24.5, "humidity": 60, "state": "ON"},
+            {"chanel": "chanel/c1", "potassiumPercent": 35, "humidity": 58},
+            {"chanel": "chanel/c0", "potassiumPercent": 42, "phosphorusPercent": 50, "temperature": 24.7, "humidity": 61, "state": "OFF"},
+        ]
+    )
+    log.close()
+    print(f"Latest readings:\n{read_latest('mqtt_log_test')}")
+    print(f"Full log:\n{read_log('mqtt_log_test')}")
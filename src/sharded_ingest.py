@@ -0,0 +1,265 @@
+import paho.mqtt.client as mqtt
+import multiprocessing
+import os
+import signal
+import time
+
+from mqtt_utilis import MQTT_BROKER, MQTT_PORT, MQTT_USER, MQTT_PASSWORD
+from latest_table import LatestTable
+from mqtt_buffer import MessageBuffer
+from anomaly_filter import AnomalyFilter
+from payload_decoder import PayloadDecoder
+from record_log import MQTT_LOG_DIR, RecordLog, read_latest, to_records
+
+# Sharding settings
+INGEST_SHARDS = int(os.getenv("INGEST_SHARDS", str(os.cpu_count() or 2)))
+# "topics": every shard subscribes to its own channels; "shared": all shards join one $share group
+INGEST_SHARD_MODE = os.getenv("INGEST_SHARD_MODE", "topics")
+INGEST_SHARE_GROUP = os.getenv("INGEST_SHARE_GROUP", "farmtech-ingest")
+# Mux channels per board (Platformio/src/main.cpp)
+FIRMWARE_CHANNELS = 16
+
+FLUSH_MAX_MESSAGES = int(os.getenv("MQTT_FLUSH_MAX_MESSAGES", "256"))
+FLUSH_INTERVAL_SECONDS = float(os.getenv("MQTT_FLUSH_INTERVAL_SECONDS", "2.0"))
+BUFFER_CAPACITY = int(os.getenv("MQTT_BUFFER_CAPACITY", "10000"))
+STATS_INTERVAL_SECONDS = 30
+# Shard counters that add up across restarts
+COUNTER_KEYS = ("received", "flushed", "dropped", "decoded", "rejected", "spikes", "filtered", "failed_flushes")
+RESTART_DELAY_SECONDS = 2
+
+
+def shard_topics(shard, shards, mode=INGEST_SHARD_MODE, group=INGEST_SHARE_GROUP):
+    """Returns the topic filters a shard subscribes to.
+
+    In "topics" mode channel ``cN`` belongs to shard ``N % shards``, for the
+    firmware topics (``chanel/cN``) and for any prefix (``chanel/+/cN``).
+    """
+    if mode == "shared":
+        return [f"$share/{group}/chanel/#"]
+    topics = []
+    for channel in range(shard, FIRMWARE_CHANNELS, shards):
+        topics += [f"chanel/c{channel}", f"chanel/+/c{channel}"]
+    return topics
+
+
+def shard_directory(directory, shard):
+    """Log directory of a shard; read_latest() on ``directory`` merges them all."""
+    return os.path.join(directory, f"shard-{shard:02d}")
+
+
+def run_shard(shard, shards, mode, directory, connection, stop, stats_pipe, stats_interval=STATS_INTERVAL_SECONDS):
+    """Body of a shard process: its own MQTT client, decoder, anomaly filter, latest table and log.
+
+    ``stop`` is a shared flag polled by the shard and ``stats_pipe`` the
+    shard's own pipe to the supervisor. Neither takes a lock shared with
+    other shards, so a killed shard cannot deadlock the rest. Ctrl-C reaches
+    the whole process group, so the shard ignores SIGINT and leaves stopping
+    to the supervisor, which lets it flush and close its log.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    decoder = PayloadDecoder()
+    # A channel always lands on the same shard in "topics" mode, so its statistics stay in one place
+    anomaly_filter = AnomalyFilter()
+    latest = LatestTable()
+    log = RecordLog(shard_directory(directory, shard))
+
+    def flush_batch(batch):
+        records = to_records(batch)
+        latest.update_records(records)
+        log.append(records)
+
+    buffer = MessageBuffer(flush_batch, FLUSH_MAX_MESSAGES, FLUSH_INTERVAL_SECONDS, BUFFER_CAPACITY)
+    topics = shard_topics(shard, shards, mode)
+
+    def on_connect(client, userdata, flags, rc):
+        if rc == 0:
+            client.subscribe([(topic, 0) for topic in topics])
+        else:
+            print(f"Shard {shard}: failed to connect, return code {rc}")
+
+    def on_message(client, userdata, msg):
+        reading = decoder.decode(msg.topic, msg.payload)
+        if reading is not None:
+            reading = anomaly_filter.filter(reading)
+        if reading is not None:
+            buffer.append(reading)
+
+    broker, port, username, password, tls = connection
+    client = mqtt.Client()
+    if username:
+        client.username_pw_set(username, password)
+    client.on_connect = on_connect
+    client.on_message = on_message
+    if tls:
+        client.tls_set()
+    client.connect(broker, port, 60)
+    buffer.start()
+    client.loop_start()
+
+    def report():
+        anomalies = anomaly_filter.stats()
+        stats_pipe.send(
+            {
+                **buffer.stats(),
+                **decoder.stats(),
+                "spikes": anomalies["spikes"],
+                "filtered": anomalies["dropped"],
+                "channels": len(latest),
+            }
+        )
+
+    try:
+        last_stats = time.monotonic()
+        while not stop.value:
+            time.sleep(0.5)
+            if time.monotonic() - last_stats >= stats_interval:
+                report()
+                last_stats = time.monotonic()
+    finally:
+        client.loop_stop()
+        client.disconnect()
+        buffer.stop()
+        log.close()
+        report()
+
+
+class ShardSupervisor:
+    """Runs the MQTT ingestion in ``shards`` worker processes.
+
+    Every shard has its own MQTT client, payload decoder, flush buffer and
+    record log (in ``shard-NN`` under ``directory``), so parsing and writing
+    scale across cores instead of sharing one GIL. Shards either subscribe
+    to disjoint channels ("topics" mode) or join a shared subscription the
+    broker balances ("shared" mode). A shard that dies is restarted. The
+    merged latest-value view is read with ``read_latest(directory)``.
+    """
+
+    def __init__(
+        self,
+        shards=INGEST_SHARDS,
+        mode=INGEST_SHARD_MODE,
+        directory=MQTT_LOG_DIR,
+        broker=MQTT_BROKER,
+        port=MQTT_PORT,
+        username=MQTT_USER,
+        password=MQTT_PASSWORD,
+        tls=True,
+        stats_interval=STATS_INTERVAL_SECONDS,
+    ):
+        if mode not in ("topics", "shared"):
+            raise ValueError(f"Unknown shard mode {mode}")
+        # In topics mode a shard without channels would sit idle
+        self.shards = min(shards, FIRMWARE_CHANNELS) if mode == "topics" else shards
+        self.mode = mode
+        self.directory = directory
+        self.connection = (broker, port, username, password, tls)
+        self.stats_interval = stats_interval
+
+        self._context = multiprocessing.get_context("spawn")
+        self._stop = self._context.RawValue("b", 0)
+        self._processes = {}
+        self._pipes = {}
+        self._shard_stats = {}
+        # Counters of the earlier runs of each shard, so totals never go backwards after a restart
+        self._shard_totals = {}
+
+        # Counters
+        self.restarts = 0
+
+    def _start_shard(self, shard):
+        if shard in self._shard_stats:
+            # Fold the counters of the run being replaced into the shard's total
+            previous = self._shard_stats.pop(shard)
+            totals = self._shard_totals.setdefault(shard, dict.fromkeys(COUNTER_KEYS, 0))
+            for key in COUNTER_KEYS:
+                totals[key] += previous[key]
+        receiver, sender = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=run_shard,
+            args=(shard, self.shards, self.mode, self.directory, self.connection, self._stop, sender, self.stats_interval),
+            name=f"ingest-shard-{shard}",
+            daemon=True,
+        )
+        process.start()
+        sender.close()
+        self._processes[shard] = process
+        self._pipes[shard] = receiver
+
+    def start(self):
+        """Starts every shard process."""
+        self._stop.value = 0
+        for shard in range(self.shards):
+            self._start_shard(shard)
+
+    def supervise(self):
+        """Restarts the shards that exited and collects their latest statistics."""
+        self._collect_stats()
+        for shard, process in self._processes.items():
+            if not process.is_alive() and not self._stop.value:
+                print(f"Shard {shard} saiu com código {process.exitcode}; reiniciando")
+                self.restarts += 1
+                time.sleep(RESTART_DELAY_SECONDS)
+                self._start_shard(shard)
+
+    def _collect_stats(self):
+        for shard, pipe in self._pipes.items():
+            try:
+                while pipe.poll():
+                    self._shard_stats[shard] = pipe.recv()
+            except (EOFError, OSError):
+                # The shard exited; its pipe is replaced when it restarts
+                pass
+
+    def stop(self, timeout=30):
+        """Stops the shards after they flush what they hold."""
+        self._stop.value = 1
+        deadline = time.monotonic() + timeout
+        for process in self._processes.values():
+            # Keep draining the statistics so no shard blocks on a full pipe while exiting
+            while process.is_alive() and time.monotonic() < deadline:
+                self._collect_stats()
+                process.join(0.1)
+        self._collect_stats()
+        self._processes = {}
+        self._pipes = {}
+
+    def stats(self):
+        """Returns the totals over all shards and the latest statistics of each one.
+
+        Counters include the earlier runs of restarted shards, up to the last
+        report a shard sent before it died.
+        """
+        per_shard = {}
+        for shard in sorted(self._shard_stats.keys() | self._shard_totals.keys()):
+            stats = dict(self._shard_stats.get(shard, {}))
+            previous = self._shard_totals.get(shard, {})
+            for key in COUNTER_KEYS:
+                stats[key] = stats.get(key, 0) + previous.get(key, 0)
+            per_shard[shard] = stats
+        totals = {key: sum(stats[key] for stats in per_shard.values()) for key in COUNTER_KEYS}
+        return {"shards": self.shards, "restarts": self.restarts, **totals, "per_shard": per_shard}
+
+
+if __name__ == "__main__":
+    supervisor = ShardSupervisor()
+    supervisor.start()
+    print(f"Ingestão com {supervisor.shards} shards (modo {supervisor.mode}). Aguardando mensagens MQTT...")
+    try:
+        last_stats = time.monotonic()
+        while True:
+            time.sleep(1)
+            supervisor.supervise()
+            if time.monotonic() - last_stats >= STATS_INTERVAL_SECONDS:
+                stats = supervisor.stats()
+                print(
+                    f"Shards: recebidas={stats.get('received', 0)} gravadas={stats.get('flushed', 0)} "
+                    f"rejeitadas={stats.get('rejected', 0)} descartadas={stats.get('dropped', 0)} "
+                    f"reinícios={stats['restarts']}"
+                )
+                last_stats = time.monotonic()
+    except KeyboardInterrupt:
+        print("\nServiço encerrado pelo usuário.")
+        supervisor.stop()
+        print(f"Shards: {supervisor.stats()}")
+        latest = read_latest(MQTT_LOG_DIR)
+        print(f"Últimas leituras:\n{latest}")
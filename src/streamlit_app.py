@@ -1,30 +1,29 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from datetime import datetime 
+from datetime import datetime, timedelta
 import re 
-import time
-from filelock import FileLock
 import os
-from mqtt_utilis import activate_irrigation
+from model_registry import model_registry
+from irrigation_scheduler import IrrigationScheduler, channels_for_area
+from live_feed import LiveFeed, start_feed_subscriber, start_snapshot_follower
+from record_log import MQTT_LOG_DIR, MergedIndexReader, records_to_frame, to_records
 from db.planting_area_crud import create_planting_area
-from db.planting_area_crud import get_all_planting_areas
+from db.analytics_queries import fetch_planting_areas, fetch_rollups
 
-import pandas as pd
-from db.planting_area_crud import get_all_planting_areas
-planting_areas = get_all_planting_areas()
-data = [{
-    'id_area': area.id_area,
-    'area_name': area.area_name,
-    'size_hectares': area.size_hectares,
-    'planting_date': area.planting_date
-} for area in planting_areas]
-
-df = pd.DataFrame(data)
+df = fetch_planting_areas()
 #area = df['area_name'].tolist()
 
+# Intervalos de atualização dos painéis
+LIVE_REFRESH_SECONDS = 1
+HISTORY_REFRESH_SECONDS = 60
+
+# Origem do painel em tempo real: "log" lê o índice gravado pelo app.py, "mqtt" assina o broker
+LIVE_FEED_SOURCE = os.getenv("LIVE_FEED_SOURCE", "log")
+
 def main():
     st.title("Bem vindo ao FarmSettings")
+    get_model_registry()
 
     # Lista de itens do menu
     menu_items = [ "Painel de dados", "Cadastrar área", "Alterar área", "Ativar irrigação"]
@@ -42,9 +41,6 @@ def validade_string(string, string_len = 4):
         return False
     return True
 
-planting_areas = get_all_planting_areas()
-df = pd.DataFrame(planting_areas)
-
 def cadastrar_nome_area(value_input=None):
         area_name = st.text_input("Nome da área", value=value_input)
            # Validação do nome da área
@@ -120,61 +116,94 @@ def show_content(choice):
         st.header("Ativar irrigação")
         st.write("Controle de ativação da irrigação.")
         #controle para ativar irrigação
-        area = st.selectbox("Selecione a área", area)
+        areas = dict(zip(df["area_name"], df["id_area"]))
+        area = st.selectbox("Selecione a área", list(areas))
         duracao = st.slider("Duração (minutos)", 10, 200, 30)
         if st.button("Ativar Irrigação"):
             try:
-                result = activate_irrigation("c0")
-                if result:
-                    if "Failed" in result:
-                        st.error(f"Falha na ativação da irrigação: {result}")
-                    else:
-                        st.success(f"Irrigação ativada na {area} por {duracao} minutos")
+                id_area = int(areas[area])
+                channels = channels_for_area(id_area)
+                if not channels:
+                    st.warning(f"Nenhuma válvula cadastrada na {area}.")
                 else:
-                        st.warning("A ativação da irrigação não retornou nenhum resultado.")
+                    # O agendador fecha as válvulas ao fim da duração e grava o histórico
+                    jobs = get_irrigation_scheduler().schedule(
+                        id_area, channels, datetime.now(), timedelta(minutes=duracao)
+                    )
+                    tarefas = ", ".join(str(job.job_id) for job in jobs)
+                    st.success(f"Irrigação ativada na {area} por {duracao} minutos (tarefa {tarefas})")
             except Exception as e:
-                st.error(f"Ocorreu um erro ao tentar ativar a irrigação: {str(e)}")            
+                st.error(f"Ocorreu um erro ao tentar ativar a irrigação: {str(e)}")
     elif choice == "Painel de dados":
-        
-        # Função para carregar os dados
-        def load_data():
-            root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            csv_path = os.path.join(root_dir, 'mqtt_data.csv')
-            lock_file = csv_path + ".lock"
-            
-            with FileLock(lock_file):
-                if os.path.exists(csv_path):
-                    return pd.read_csv(csv_path)
-            return None
-
-        # Criar um placeholder para o conteúdo dinâmico
-        placeholder = st.empty()
-
-        # Loop principal para atualização contínua
-        while True:
-            df = load_data()
-            
-            with placeholder.container():
-                if df is not None:
-                    st.subheader("Dados em tempo real:")
-                    st.dataframe(df)
-
-                #puxar dados históricos
-                #     st.text("Estatísticas Básicas:")
-                #     st.write(df.describe())
-
-                #     if 'temperature' in df.columns:
-                #         st.subheader("Gráfico de Temperatura")
-                #         if 'timestamp' in df.columns:
-                #             df['timestamp'] = pd.to_datetime(df['timestamp'])
-                #             st.line_chart(df.set_index('timestamp')['temperature'])
-                #         else:
-                #             st.error("Coluna 'timestamp' não encontrada no DataFrame.")
-                # else:
-                #     st.error("Arquivo CSV não encontrado ou está vazio.")
-
-
-            time.sleep(5)  # Atualiza a cada 5 segundos
+        live_panel()
+        historical_panel()
+
+
+# Modelos de ML carregados uma única vez por processo, com o modelo padrão pré-carregado
+@st.cache_resource
+def get_model_registry():
+    model_registry.warm_in_background()
+    return model_registry
+
+# Agendador de irrigação compartilhado por todas as sessões
+@st.cache_resource
+def get_irrigation_scheduler():
+    scheduler = IrrigationScheduler()
+    scheduler.start()
+    return scheduler
+
+# Feed compartilhado por todas as sessões, alimentado por uma única thread que
+# acompanha o índice do log (sem locks) ou por um único assinante MQTT
+@st.cache_resource
+def get_live_feed():
+    feed = LiveFeed()
+    if LIVE_FEED_SOURCE == "mqtt":
+        initial = load_log_snapshot()
+        if initial is not None:
+            feed.publish_records(initial[1])
+        start_feed_subscriber(feed)
+    else:
+        start_snapshot_follower(feed, log_dir())
+    return feed
+
+def log_dir():
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(root_dir, MQTT_LOG_DIR)
+
+# Última leitura por canal gravada pelo ingester, lida do índice do log sem parsing
+def load_log_snapshot():
+    return MergedIndexReader(log_dir()).read()
+
+# Atualiza apenas os canais que mudaram desde a última execução desta sessão
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def live_panel():
+    feed = get_live_feed()
+    version = st.session_state.get("live_version", 0)
+    frame = st.session_state.get("live_frame")
+
+    version, changed = feed.changes_since(version)
+    if changed:
+        updates = records_to_frame(to_records(list(changed.values()))).set_index("chanel")
+        frame = updates if frame is None else updates.combine_first(frame)
+        st.session_state["live_frame"] = frame
+    st.session_state["live_version"] = version
+
+    if frame is not None:
+        st.subheader("Dados em tempo real:")
+        st.dataframe(frame.sort_index().reset_index())
+
+# Dados históricos a partir dos rollups horários das últimas 24 horas
+@st.fragment(run_every=HISTORY_REFRESH_SECONDS)
+def historical_panel():
+    stats = fetch_rollups("hour", start=datetime.now() - timedelta(days=1))
+    if not stats.empty:
+        st.text("Estatísticas Básicas (últimas 24 horas):")
+        st.write(stats.groupby("type_name")["mean_value"].describe())
+
+        temperature = stats[stats["type_name"] == "Temperature"]
+        if not temperature.empty:
+            st.subheader("Gráfico de Temperatura")
+            st.line_chart(temperature.pivot_table(index="bucket_start", columns="id_area", values="mean_value"))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+# Modules in src/ import each other (and the db package) by their top-level name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+# Never reach the Postgres of docker-compose.yaml from the tests
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+
+@pytest.fixture
+def sqlite_db(monkeypatch):
+    """Points every CRUD function at a fresh in-memory SQLite database with the full schema."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import StaticPool
+
+    import db.database_session as database_session
+    import db.models  # noqa: F401  (registers the tables on Base)
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    database_session._enable_sqlite_savepoints(engine)
+    database_session.Base.metadata.create_all(engine)
+    monkeypatch.setattr(database_session, "engine", engine)
+    previous_bind = database_session.SessionLocal.kw["bind"]
+    database_session.SessionLocal.configure(bind=engine)
+    yield engine
+    database_session.SessionLocal.configure(bind=previous_bind)
+    engine.dispose()
@@ -0,0 +1,97 @@
+import math
+import types
+
+import pytest
+
+from anomaly_filter import AnomalyFilter, as_payload
+from payload_decoder import Reading
+
+NAN = float("nan")
+
+
+def reading(k=50.0, p=50.0, temperature=25.0, humidity=60.0, state=1, chanel="chanel/c0"):
+    return Reading(chanel, 0, k, p, temperature, humidity, state)
+
+
+def warm(anomaly_filter, count=10, **values):
+    for _ in range(count):
+        assert anomaly_filter.filter(reading(**values)) is not None
+
+
+def test_spike_is_blanked_and_the_rest_of_the_reading_kept():
+    anomaly_filter = AnomalyFilter(warmup=10, threshold=4.0, persistence=3)
+    warm(anomaly_filter)
+
+    filtered = anomaly_filter.filter(reading(k=95.0))
+    assert math.isnan(filtered.potassiumPercent)
+    assert filtered[3:] == (50.0, 25.0, 60.0, 1)
+    assert anomaly_filter.stats()["spikes"] == 1
+    assert anomaly_filter.anomalies[-1] == ("chanel/c0", "potassiumPercent", 95.0, 50.0)
+
+
+def test_no_spikes_are_flagged_during_warmup():
+    anomaly_filter = AnomalyFilter(warmup=10)
+    warm(anomaly_filter, count=3)
+
+    assert anomaly_filter.filter(reading(k=95.0)).potassiumPercent == 95.0
+
+
+def test_reading_with_nothing_left_is_dropped():
+    anomaly_filter = AnomalyFilter(warmup=10)
+    warm(anomaly_filter)
+
+    assert anomaly_filter.filter(reading(k=95.0, p=NAN, temperature=NAN, humidity=NAN)) is None
+    assert anomaly_filter.filter(reading(k=NAN, p=NAN, temperature=NAN, humidity=NAN)) is None
+    stats = anomaly_filter.stats()
+    assert (stats["dropped"], stats["nan_fields"]) == (2, 7)
+
+
+def test_persistent_outliers_are_taken_as_a_change_of_level():
+    anomaly_filter = AnomalyFilter(warmup=10, persistence=3)
+    warm(anomaly_filter)
+
+    assert math.isnan(anomaly_filter.filter(reading(k=90.0)).potassiumPercent)
+    assert math.isnan(anomaly_filter.filter(reading(k=90.0)).potassiumPercent)
+    assert anomaly_filter.filter(reading(k=90.0)).potassiumPercent == 90.0
+    # The mean restarted at the new level, so it is no longer an outlier
+    assert anomaly_filter.filter(reading(k=90.0)).potassiumPercent == 90.0
+    assert anomaly_filter.stats()["level_shifts"] == 1
+
+
+def test_channels_are_tracked_separately():
+    anomaly_filter = AnomalyFilter(warmup=10)
+    warm(anomaly_filter)
+
+    assert anomaly_filter.filter(reading(k=95.0, chanel="chanel/c1")).potassiumPercent == 95.0
+    assert anomaly_filter.stats()["channels"] == 2
+
+
+def test_tag_mode_passes_readings_unchanged():
+    anomaly_filter = AnomalyFilter(warmup=10, action="tag")
+    warm(anomaly_filter)
+
+    spiking = reading(k=95.0)
+    assert anomaly_filter.filter(spiking) is spiking
+    assert anomaly_filter.stats()["spikes"] == 1
+
+
+def test_unknown_action_is_refused():
+    with pytest.raises(ValueError):
+        AnomalyFilter(action="ignore")
+
+
+def test_as_payload_keeps_only_reported_values():
+    assert as_payload(reading(p=NAN, state=-1)) == {"potassiumPercent": 50.0, "temperature": 25.0, "humidity": 60.0}
+    assert as_payload(reading(state=0))["state"] == "OFF"
+
+
+def test_prediction_server_counts_filtered_readings_apart_from_rejected_payloads():
+    from prediction_server import PredictionServer
+
+    server = PredictionServer(workers=1)
+    empty = b'{"potassiumPercent":null,"phosphorusPercent":null,"temperature":null,"humidity":null,"state":"ON"}'
+    server.on_message(None, None, types.SimpleNamespace(topic="chanel/c0", payload=b"[1, 2]"))
+    server.on_message(None, None, types.SimpleNamespace(topic="chanel/c0", payload=empty))
+
+    stats = server.stats()
+    assert (stats["rejected"], stats["filtered"]) == (1, 1)
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+import feature_store
+from db.sensor_index import SensorEntry
+from feature_store import FeatureStore
+
+
+def fill(store, values, start=0.0, step=60.0):
+    for i, value in enumerate(values):
+        store.update(1, "K", value, timestamp=start + i * step)
+
+
+def test_window_statistics_match_numpy_after_the_ring_wraps():
+    store = FeatureStore(window=5, epoch=0.0)
+    values = [3.0, 8.0, 1.0, 9.0, 4.0, 7.0, 2.0, 6.0]
+    fill(store, values)
+
+    row = store.aggregates().iloc[0]
+    window = np.array(values[-5:])
+    times = np.arange(len(values))[-5:] * 60.0
+    assert row["count"] == 5
+    assert row["last"] == 6.0
+    assert row["mean"] == pytest.approx(window.mean())
+    assert row["std"] == pytest.approx(window.std())
+    assert row["trend_per_hour"] == pytest.approx(np.polyfit(times, window, 1)[0] * 3600)
+
+
+@pytest.mark.parametrize("bad", [float("nan"), float("inf"), float("-inf")])
+def test_non_finite_values_are_ignored(bad):
+    store = FeatureStore(window=5, epoch=0.0)
+    fill(store, [10.0, 20.0])
+    store.update(1, "K", bad, timestamp=500.0)
+
+    row = store.aggregates().iloc[0]
+    assert (row["count"], row["last"], row["mean"]) == (2, 20.0, 15.0)
+
+
+def test_area_values_returns_the_mean_or_the_last_value():
+    store = FeatureStore(window=5, epoch=0.0)
+    fill(store, [10.0, 20.0])
+    store.update(1, "Humidity", 40.0, timestamp=0.0)
+
+    assert store.area_values(1) == {"K": 15.0, "Humidity": 40.0}
+    assert store.area_values(1, stat="last") == {"K": 20.0, "Humidity": 40.0}
+    assert store.area_values(2) == {}
+
+
+def test_update_reading_resolves_the_area_of_each_field(monkeypatch):
+    entries = {("chanel/c0", "K"): SensorEntry(1, 3, 1, "K", "Area 3", "chanel/c0")}
+    monkeypatch.setattr(feature_store.sensor_index, "get", lambda chanel, type_name: entries.get((chanel, type_name)))
+    store = FeatureStore(window=5, epoch=0.0)
+
+    assert store.update_reading("chanel/c0", {"potassiumPercent": 42.0, "humidity": 50.0}, timestamp=0.0) == 3
+    assert store.update_reading("chanel/c9", {"potassiumPercent": 1.0}) is None
+    assert store.area_values(3) == {"K": 42.0}
+
+
+def test_snapshot_and_restore_keep_the_windows(tmp_path):
+    path = str(tmp_path / "features.npz")
+    store = FeatureStore(window=5, epoch=0.0)
+    fill(store, [3.0, 8.0, 1.0, 9.0, 4.0, 7.0])
+    store.snapshot(path)
+
+    restored = FeatureStore.restore(path, window=5)
+    # Later updates continue the same ring
+    fill(store, [5.0], start=600.0)
+    fill(restored, [5.0], start=600.0)
+    assert restored.aggregates().equals(store.aggregates())
+    assert FeatureStore.restore(path, window=10).aggregates().empty
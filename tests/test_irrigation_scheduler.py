@@ -0,0 +1,159 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import irrigation_scheduler
+from irrigation_scheduler import IrrigationScheduler
+
+SHORT = timedelta(seconds=0.05)
+
+
+class FakePublisher:
+    """Records valve commands; ``open_ok``/``close_ok`` set the acknowledgement, an exception is raised."""
+
+    def __init__(self, open_ok=True, close_ok=True):
+        self.open_ok = open_ok
+        self.close_ok = close_ok
+        self.commands = []
+        self.open_now = set()
+        self.max_open = 0
+        self._lock = threading.Lock()
+
+    def set_valves(self, channels, state):
+        with self._lock:
+            self.commands.append((tuple(channels), state))
+            outcome = self.open_ok if state else self.close_ok
+            if isinstance(outcome, Exception):
+                raise outcome
+            if state and outcome:
+                self.open_now.update(channels)
+            elif not state and outcome:
+                self.open_now.difference_update(channels)
+            self.max_open = max(self.max_open, len(self.open_now))
+            return {channel: outcome for channel in channels}
+
+
+def wait_until(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def history(monkeypatch):
+    records = []
+    monkeypatch.setattr(irrigation_scheduler, "create_irrigation_history", lambda **kwargs: records.append(kwargs))
+    monkeypatch.setattr(irrigation_scheduler, "STOP_RETRY_SECONDS", 0.02)
+    monkeypatch.setattr(irrigation_scheduler, "STOP_MAX_RETRIES", 2)
+    return records
+
+
+@pytest.fixture
+def make_scheduler():
+    schedulers = []
+
+    def make(publisher, **kwargs):
+        scheduler = IrrigationScheduler(publisher=publisher, **kwargs)
+        scheduler.start()
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in schedulers:
+        scheduler.stop()
+
+
+def test_job_opens_then_closes_its_valves_and_records_history(history, make_scheduler):
+    publisher = FakePublisher()
+    scheduler = make_scheduler(publisher)
+
+    (job,) = scheduler.schedule(1, ["c0", "c1"], datetime.now(), SHORT, id_recommendation=7)
+
+    assert wait_until(lambda: job.status == "done")
+    assert publisher.commands == [(("c0", "c1"), True), (("c0", "c1"), False)]
+    assert job.ended_at - job.started_at >= SHORT
+    assert wait_until(lambda: len(history) == 1)
+    assert (history[0]["id_area"], history[0]["id_recommendation"]) == (1, 7)
+    stats = scheduler.stats()
+    assert (stats["completed"], stats["failed"], stats["open_valves"]) == (1, 0, {1: 0})
+
+
+def test_area_with_more_channels_than_the_cap_runs_in_groups(history, make_scheduler):
+    publisher = FakePublisher()
+    scheduler = make_scheduler(publisher, max_valves_per_area=2)
+
+    jobs = scheduler.schedule(1, ["c0", "c1", "c2", "c3", "c4"], datetime.now(), SHORT)
+
+    assert [job.channels for job in jobs] == [["c0", "c1"], ["c2", "c3"], ["c4"]]
+    assert wait_until(lambda: all(job.status == "done" for job in jobs))
+    assert publisher.max_open == 2
+    assert scheduler.stats()["completed"] == 3
+
+
+def test_cancelled_pending_job_sends_no_command(history, make_scheduler):
+    publisher = FakePublisher()
+    scheduler = make_scheduler(publisher)
+
+    (job,) = scheduler.schedule(1, ["c0"], datetime.now() + timedelta(seconds=60), SHORT)
+
+    assert scheduler.cancel(job.job_id)
+    assert job.status == "cancelled"
+    assert not scheduler.cancel(job.job_id)
+    assert publisher.commands == []
+
+
+def test_cancelling_a_running_job_closes_its_valves_now(history, make_scheduler):
+    publisher = FakePublisher()
+    scheduler = make_scheduler(publisher)
+
+    (job,) = scheduler.schedule(1, ["c0"], datetime.now(), timedelta(seconds=60))
+    assert wait_until(lambda: job.started_at is not None)
+    assert scheduler.cancel(job.job_id)
+
+    assert wait_until(lambda: job.status == "done")
+    assert publisher.commands[-1] == (("c0",), False)
+
+
+@pytest.mark.parametrize("open_ok", [False, OSError("broker down")], ids=["not-opened", "error"])
+def test_failed_open_fails_the_job_and_frees_the_area(history, make_scheduler, open_ok):
+    publisher = FakePublisher(open_ok=open_ok)
+    scheduler = make_scheduler(publisher, max_valves_per_area=1)
+
+    first, second = scheduler.schedule(1, ["c0", "c1"], datetime.now(), SHORT)
+
+    assert wait_until(lambda: first.status == "failed" and second.status == "failed")
+    stats = scheduler.stats()
+    assert (stats["failed"], stats["open_valves"]) == (2, {1: 0})
+    if isinstance(open_ok, Exception):
+        # A close is still attempted in case the open reached the board
+        assert (("c0",), False) in publisher.commands
+    assert history == []
+
+
+@pytest.mark.parametrize("close_ok", [False, OSError("broker down")], ids=["not-closed", "error"])
+def test_unconfirmed_close_alerts_and_blocks_the_area_until_acknowledged(history, make_scheduler, close_ok):
+    publisher = FakePublisher(close_ok=close_ok)
+    scheduler = make_scheduler(publisher, max_valves_per_area=1)
+
+    (stuck,) = scheduler.schedule(1, ["c0"], datetime.now(), SHORT)
+    assert wait_until(lambda: stuck.status == "failed")
+    # One command plus STOP_MAX_RETRIES retries
+    assert publisher.commands.count((("c0",), False)) == 3
+    assert [alert[2] for alert in scheduler.alerts] == [stuck.job_id]
+
+    (waiting,) = scheduler.schedule(1, ["c1"], datetime.now(), SHORT)
+    time.sleep(0.1)
+    assert waiting.status == "waiting"
+    assert scheduler.stats()["unconfirmed"] == [stuck.job_id]
+
+    publisher.close_ok = True
+    assert scheduler.acknowledge(stuck.job_id)
+    assert not scheduler.acknowledge(stuck.job_id)
+    assert wait_until(lambda: waiting.status == "done")
+    assert scheduler.stats()["open_valves"] == {1: 0}
+    assert wait_until(lambda: len(history) == 1)
@@ -0,0 +1,51 @@
+import types
+
+import live_feed
+from live_feed import LiveFeed
+from payload_decoder import Reading
+from record_log import to_records
+
+FIRMWARE_PAYLOAD = b'{"potassiumPercent":42.5,"phosphorusPercent":55,"temperature":24.6,"humidity":61,"state":"ON"}'
+
+
+def reading(chanel, timestamp=1):
+    return Reading(chanel, timestamp, 1.0, 2.0, 3.0, 4.0, 1)
+
+
+def test_changes_since_returns_only_channels_updated_after_a_version():
+    feed = LiveFeed()
+    feed.publish("chanel/c0", reading("chanel/c0"))
+    version, _ = feed.snapshot()
+    feed.publish_many([("chanel/c1", reading("chanel/c1")), ("chanel/c0", reading("chanel/c0", 2))])
+
+    latest, changed = feed.changes_since(version)
+    assert latest == version + 2
+    assert changed == {"chanel/c1": reading("chanel/c1"), "chanel/c0": reading("chanel/c0", 2)}
+    assert not feed.wait_for_changes(latest, timeout=0.01)
+
+
+def test_records_are_published_as_reading_tuples():
+    feed = LiveFeed()
+    feed.publish_records(to_records([reading("chanel/c0"), reading("chanel/c1")]))
+
+    _, latest = feed.snapshot()
+    assert latest == {"chanel/c0": reading("chanel/c0"), "chanel/c1": reading("chanel/c1")}
+
+
+class FakeClient:
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+def test_mqtt_subscriber_drops_payloads_that_are_not_readings(monkeypatch):
+    monkeypatch.setattr(live_feed.mqtt, "Client", FakeClient)
+    feed = LiveFeed()
+    client = live_feed.start_feed_subscriber(feed)
+
+    for payload in [b"[1, 2]", b'"text"', b"null", b"\xff", FIRMWARE_PAYLOAD]:
+        client.on_message(client, None, types.SimpleNamespace(topic="chanel/c0", payload=payload))
+
+    version, latest = feed.snapshot()
+    assert version == 1
+    assert isinstance(latest["chanel/c0"], Reading)
+    assert latest["chanel/c0"].potassiumPercent == 42.5
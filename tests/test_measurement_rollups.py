@@ -0,0 +1,80 @@
+import datetime
+
+import pytest
+
+import db.measurement_rollup_crud as rollup_crud
+from db.database_session import get_db
+from db.measurement_rollup_crud import aggregate_rollups, apply_rollups, backfill_rollups, get_rollups
+from db.sensor_measurement_crud import (
+    bulk_create_sensor_measurements,
+    delete_sensor_measurement,
+    get_sensor_measurements_by_sensor,
+    update_sensor_measurement,
+)
+
+START = datetime.datetime(2025, 1, 1, 10, 0, 5)
+
+
+def measurement(value, seconds, id_sensor=1):
+    return {"id_sensor": id_sensor, "id_area": 1, "measurement": value, "datetime": START + datetime.timedelta(seconds=seconds)}
+
+
+def buckets(granularity):
+    return [
+        (r.bucket_start, r.min_value, r.max_value, r.sum_value, r.count, r.last_value)
+        for r in get_rollups(granularity, id_sensor=1)
+    ]
+
+
+def test_aggregate_builds_minute_hour_and_day_buckets():
+    rollups = aggregate_rollups([measurement(5.0, 0), measurement(9.0, 70), measurement(None, 80)])
+
+    by_granularity = {}
+    for rollup in rollups:
+        by_granularity.setdefault(rollup["granularity"], []).append(rollup)
+    assert [r["count"] for r in by_granularity["minute"]] == [1, 1]
+    (hour,) = by_granularity["hour"]
+    assert (hour["min_value"], hour["max_value"], hour["sum_value"], hour["count"], hour["last_value"]) == (5.0, 9.0, 14.0, 2, 9.0)
+    assert by_granularity["day"][0]["bucket_start"] == datetime.datetime(2025, 1, 1)
+
+
+def test_rows_come_out_in_primary_key_order():
+    rollups = aggregate_rollups([measurement(1.0, 0, id_sensor=2), measurement(1.0, 0, id_sensor=1)])
+
+    keys = [(r["granularity"], r["bucket_start"], r["id_sensor"], r["id_area"]) for r in rollups]
+    assert keys == sorted(keys)
+
+
+@pytest.mark.parametrize("upsert", [True, False], ids=["upsert", "row-by-row"])
+def test_batches_merge_into_the_same_bucket(sqlite_db, monkeypatch, upsert):
+    if not upsert:
+        # Take the path used by dialects without INSERT ... ON CONFLICT
+        monkeypatch.delitem(rollup_crud._UPSERT_INSERTS, "sqlite")
+    bulk_create_sensor_measurements([measurement(5.0, 0)])
+    # An older reading arriving late must not replace the last value
+    bulk_create_sensor_measurements([measurement(9.0, 20), measurement(2.0, 10)])
+    bulk_create_sensor_measurements([measurement(3.0, 15)])
+
+    assert buckets("minute") == [(datetime.datetime(2025, 1, 1, 10, 0), 2.0, 9.0, 19.0, 4, 9.0)]
+
+
+def test_update_and_delete_leave_the_same_rollups_as_a_backfill(sqlite_db):
+    bulk_create_sensor_measurements([measurement(5.0, 0), measurement(50.0, 10), measurement(7.0, 20)])
+    first, second, third = get_sensor_measurements_by_sensor(1)
+
+    update_sensor_measurement(second.id_measurement, {"measurement": 6.0})
+    update_sensor_measurement(third.id_measurement, {"datetime": START + datetime.timedelta(minutes=1)})
+    delete_sensor_measurement(first.id_measurement)
+    incremental = {granularity: buckets(granularity) for granularity in ("minute", "hour", "day")}
+
+    backfill_rollups()
+    assert {granularity: buckets(granularity) for granularity in ("minute", "hour", "day")} == incremental
+    assert incremental["minute"] == [
+        (datetime.datetime(2025, 1, 1, 10, 0), 6.0, 6.0, 6.0, 1, 6.0),
+        (datetime.datetime(2025, 1, 1, 10, 1), 7.0, 7.0, 7.0, 1, 7.0),
+    ]
+
+
+def test_apply_rollups_returns_zero_without_measurements(sqlite_db):
+    with get_db() as db:
+        assert apply_rollups(db, [measurement(None, 0)]) == 0
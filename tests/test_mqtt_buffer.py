@@ -0,0 +1,77 @@
+from mqtt_buffer import MessageBuffer
+
+
+def test_flush_hands_pending_messages_in_order():
+    flushed = []
+    buffer = MessageBuffer(flushed.extend, max_batch=10)
+    for i in range(3):
+        buffer.append(i)
+
+    assert buffer.flush() == 3
+    assert flushed == [0, 1, 2]
+    assert buffer.backlog() == 0
+    stats = buffer.stats()
+    assert (stats["received"], stats["flushed"], stats["flushes"]) == (3, 3, 1)
+
+
+def test_full_buffer_drops_the_oldest_message():
+    flushed = []
+    buffer = MessageBuffer(flushed.extend, capacity=3)
+    for i in range(5):
+        buffer.append(i)
+
+    buffer.flush()
+    assert flushed == [2, 3, 4]
+    assert buffer.stats()["dropped"] == 2
+
+
+def test_failed_flush_puts_the_batch_back_ahead_of_newer_messages():
+    flushed = []
+    fail = [True]
+
+    def flush_fn(batch):
+        if fail[0]:
+            raise OSError("disk full")
+        flushed.extend(batch)
+
+    buffer = MessageBuffer(flush_fn)
+    buffer.append("a")
+    buffer.append("b")
+    assert buffer.flush() == 0
+    buffer.append("c")
+
+    fail[0] = False
+    assert buffer.flush() == 3
+    assert flushed == ["a", "b", "c"]
+    stats = buffer.stats()
+    assert (stats["failed_flushes"], stats["flushes"], stats["dropped"]) == (1, 1, 0)
+
+
+def test_requeued_batch_that_no_longer_fits_counts_the_overflow_as_dropped():
+    buffer = MessageBuffer(lambda batch: None, capacity=3)
+    for item in "abc":
+        buffer.append(item)
+
+    def fail_and_refill(batch):
+        # New messages arrive while the failing flush is running
+        buffer.append("d")
+        buffer.append("e")
+        raise OSError("disk full")
+
+    buffer.flush_fn = fail_and_refill
+    buffer.flush()
+    assert buffer.stats()["dropped"] == 2
+
+    flushed = []
+    buffer.flush_fn = flushed.extend
+    buffer.flush()
+    assert flushed == ["c", "d", "e"]
+
+
+def test_stop_writes_whatever_is_still_pending():
+    flushed = []
+    buffer = MessageBuffer(flushed.extend, max_batch=1000, flush_interval=0.01)
+    buffer.start()
+    buffer.append("last")
+    buffer.stop()
+    assert flushed == ["last"]
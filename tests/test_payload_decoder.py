@@ -0,0 +1,74 @@
+import json
+import math
+
+import pytest
+
+from payload_decoder import PayloadDecoder, PayloadRejected, Reading, parse
+
+FIRMWARE_PAYLOAD = '{"potassiumPercent":42.5,"phosphorusPercent":55,"temperature":-4.5e0,"humidity":61,"state":"ON"}'
+
+
+def same_values(left, right):
+    return all(a == b or (math.isnan(a) and math.isnan(b)) for a, b in zip(left, right))
+
+
+def test_firmware_layout_and_json_path_agree():
+    reordered = json.dumps(dict(reversed(list(json.loads(FIRMWARE_PAYLOAD).items()))))
+
+    assert parse(FIRMWARE_PAYLOAD) == [42.5, 55.0, -4.5, 61.0, 1]
+    assert parse(reordered) == parse(FIRMWARE_PAYLOAD)
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        '{"potassiumPercent":null,"phosphorusPercent":55,"temperature":null,"humidity":61,"state":"OFF"}',
+        '{"phosphorusPercent": 55, "humidity": 61, "state": "OFF"}',
+    ],
+    ids=["firmware-null", "missing"],
+)
+def test_null_and_missing_fields_become_nan(payload):
+    assert same_values(parse(payload), [math.nan, 55.0, math.nan, 61.0, 0])
+
+
+def test_missing_state_is_not_reported():
+    assert parse('{"humidity": 61}')[-1] == -1
+
+
+@pytest.mark.parametrize(
+    "payload, reason",
+    [
+        ("not json", "invalid_json"),
+        ("[1, 2]", "not_object"),
+        ("null", "not_object"),
+        ('"text"', "not_object"),
+        ('{"potassiumPercent": "42"}', "bad_type"),
+        ('{"potassiumPercent": true}', "bad_type"),
+        ('{"potassiumPercent":420,"phosphorusPercent":55,"temperature":24.6,"humidity":61,"state":"ON"}', "out_of_range"),
+        ('{"temperature": 1e400}', "out_of_range"),
+        ('{"humidity": 61, "state": "MAYBE"}', "bad_state"),
+    ],
+)
+def test_invalid_payloads_are_rejected_with_a_reason(payload, reason):
+    with pytest.raises(PayloadRejected) as error:
+        parse(payload)
+    assert error.value.reason == reason
+
+
+def test_decoder_returns_readings_and_counts_rejections():
+    decoder = PayloadDecoder(dead_letter_size=2)
+
+    reading = decoder.decode("chanel/c0", FIRMWARE_PAYLOAD.encode())
+    assert isinstance(reading, Reading)
+    assert (reading.chanel, reading.potassiumPercent, reading.state) == ("chanel/c0", 42.5, 1)
+    assert reading.timestamp > 0
+
+    assert decoder.decode("chanel/c0", b"\xff") is None
+    assert decoder.decode("chanel/" + "c" * 40, FIRMWARE_PAYLOAD) is None
+    assert decoder.decode("chanel/c0", b"[1, 2]") is None
+
+    stats = decoder.stats()
+    assert stats["decoded"] == 1
+    assert stats["rejected_by_reason"] == {"invalid_utf8": 1, "bad_topic": 1, "not_object": 1}
+    # Only the latest rejections are kept
+    assert [letter[1] for letter in decoder.dead_letters] == [FIRMWARE_PAYLOAD, "[1, 2]"]
@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+
+from payload_decoder import Reading
+from record_log import (
+    INDEX_FILE,
+    RECORD_DTYPE,
+    SEGMENT_PATTERN,
+    LatestIndexReader,
+    MergedIndexReader,
+    RecordLog,
+    _map_index,
+    read_latest,
+    read_log,
+)
+
+
+def reading(chanel, timestamp, k=1.0):
+    return Reading(chanel, timestamp, k, 2.0, 3.0, 4.0, 1)
+
+
+def test_index_holds_the_latest_record_per_channel(tmp_path):
+    log = RecordLog(str(tmp_path))
+    reader = LatestIndexReader(str(tmp_path))
+    assert reader.read() is None
+
+    log.append([reading("chanel/c0", 1), reading("chanel/c1", 2)])
+    first = reader.version()
+    log.append([reading("chanel/c0", 3, k=9.0)])
+
+    version, records = reader.read()
+    assert version == reader.version() == first + 2
+    assert sorted(zip(records["chanel"], records["timestamp"], records["potassiumPercent"])) == [
+        (b"chanel/c0", 3, 9.0),
+        (b"chanel/c1", 2, 1.0),
+    ]
+    assert list(read_log(str(tmp_path))["timestamp"].astype("int64")) == [1, 2, 3]
+    log.close()
+
+
+def test_reader_waits_while_the_writer_is_mid_update(tmp_path):
+    log = RecordLog(str(tmp_path))
+    log.append([reading("chanel/c0", 1)])
+    header, index = _map_index(os.path.join(str(tmp_path), INDEX_FILE), "r+")
+    reader = LatestIndexReader(str(tmp_path))
+
+    # Half-written update: the sequence is odd and the slot is being changed
+    header["sequence"] += 1
+    index[0]["timestamp"] = 5
+    results = []
+    thread = threading.Thread(target=lambda: results.append(reader.read()))
+    thread.start()
+    time.sleep(0.05)
+    assert thread.is_alive()
+
+    index[0]["potassiumPercent"] = 7.0
+    header["sequence"] += 1
+    thread.join(5)
+    version, records = results[0]
+    assert version % 2 == 0
+    assert (records[0]["timestamp"], records[0]["potassiumPercent"]) == (5, 7.0)
+    log.close()
+
+
+def test_version_keeps_moving_when_the_index_file_is_replaced(tmp_path):
+    log = RecordLog(str(tmp_path), index_slots=4)
+    log.append([reading("chanel/c0", 1)])
+    log.close()
+    reader = LatestIndexReader(str(tmp_path))
+    before = reader.version()
+
+    # A writer with another layout starts a new index file
+    replacement = RecordLog(str(tmp_path), index_slots=8)
+    replacement.append([reading("chanel/c1", 2)])
+
+    version, records = reader.read()
+    assert version > before
+    assert list(records["chanel"]) == [b"chanel/c1"]
+    replacement.close()
+
+
+def test_shard_indexes_are_merged_newest_first(tmp_path):
+    shards = [RecordLog(str(tmp_path / f"shard-{i:02d}")) for i in range(2)]
+    shards[0].append([reading("chanel/c0", 5, k=1.0), reading("chanel/c1", 1)])
+    shards[1].append([reading("chanel/c0", 9, k=2.0)])
+
+    _, records = MergedIndexReader(str(tmp_path)).read()
+    assert sorted(zip(records["chanel"], records["potassiumPercent"])) == [(b"chanel/c0", 2.0), (b"chanel/c1", 1.0)]
+    assert len(read_latest(str(tmp_path))) == 2
+    for shard in shards:
+        shard.close()
+
+
+def test_old_segments_are_removed_after_rotation(tmp_path):
+    log = RecordLog(str(tmp_path), segment_max_bytes=RECORD_DTYPE.itemsize * 2, max_segments=2)
+    for timestamp in range(10):
+        log.append([reading("chanel/c0", timestamp)])
+    log.close()
+
+    assert len(list(tmp_path.glob(SEGMENT_PATTERN))) == 2
+    assert list(read_log(str(tmp_path))["timestamp"].astype("int64")) == [8, 9]
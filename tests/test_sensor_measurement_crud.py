@@ -0,0 +1,63 @@
+import datetime
+
+import pandas as pd
+
+from db.sensor_measurement_crud import (
+    bulk_create_sensor_measurements,
+    get_sensor_measurements_by_sensor,
+)
+
+# Channel -> (id_sensor, id_area) per SensorType, like sensor_index.resolve
+SENSORS = {("chanel/c0", "K"): (1, 1), ("chanel/c0", "P"): (2, 1), ("chanel/c0", "Temperature"): (3, 1)}
+
+
+def resolve(chanel, type_name):
+    return SENSORS.get((chanel, type_name))
+
+
+def test_mqtt_rows_expand_into_one_measurement_per_known_field(sqlite_db):
+    moment = datetime.datetime(2025, 1, 1, 10, 0, 0)
+    reading = {"chanel": "chanel/c0", "potassiumPercent": 40.0, "phosphorusPercent": 30.0, "timestamp": moment}
+
+    result = bulk_create_sensor_measurements([reading], resolve_sensor=resolve)
+
+    assert result["written"] == 2
+    assert result["rejected"] == 0
+    assert [(m.measurement, m.datetime) for m in get_sensor_measurements_by_sensor(1)] == [(40.0, moment)]
+    assert [m.measurement for m in get_sensor_measurements_by_sensor(2)] == [30.0]
+
+
+def test_null_field_is_skipped_like_a_missing_one(sqlite_db):
+    with_null = {"chanel": "chanel/c0", "potassiumPercent": 40.0, "temperature": None}
+    without = {"chanel": "chanel/c0", "potassiumPercent": 41.0}
+
+    result = bulk_create_sensor_measurements([with_null, without], resolve_sensor=resolve)
+
+    assert result["written"] == 2
+    assert result["rejected"] == 0
+    assert get_sensor_measurements_by_sensor(3) == []
+
+
+def test_unregistered_fields_and_invalid_rows_are_rejected(sqlite_db):
+    readings = [
+        # Humidity has no sensor on this channel
+        {"chanel": "chanel/c0", "potassiumPercent": 40.0, "humidity": 50.0},
+        {"id_sensor": 1, "id_area": 1, "measurement": float("nan")},
+        {"id_sensor": "x", "id_area": 1, "measurement": 1.0},
+    ]
+
+    result = bulk_create_sensor_measurements(readings, resolve_sensor=resolve)
+
+    assert result["written"] == 1
+    assert result["rejected"] == 3
+
+
+def test_dataframe_input_is_written_like_dicts(sqlite_db):
+    frame = pd.DataFrame(
+        {"id_sensor": [1, 1], "id_area": [1, 1], "measurement": [1.5, 2.5], "datetime": ["2025-01-01 10:00", "2025-01-01 10:01"]}
+    )
+
+    result = bulk_create_sensor_measurements(frame)
+
+    assert result["written"] == 2
+    assert sorted(m.measurement for m in get_sensor_measurements_by_sensor(1)) == [1.5, 2.5]